@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+CREAR_INDICES = """
+CREATE INDEX IF NOT EXISTS material_name_trgm_idx
+    ON catalog_material USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS material_sku_trgm_idx
+    ON catalog_material USING gin (sku gin_trgm_ops);
+"""
+
+BORRAR_INDICES = """
+DROP INDEX IF EXISTS material_name_trgm_idx;
+DROP INDEX IF EXISTS material_sku_trgm_idx;
+"""
+
+
+def crear_indices(apps, schema_editor):
+    """Índices trigram para buscar materiales por nombre o SKU (solo PostgreSQL)"""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREAR_INDICES)
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(BORRAR_INDICES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_category_and_migrate_data"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -9,6 +9,10 @@ from django.contrib import messages
 from .forms import MaterialSupplierForm
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.core.paginator import Paginator
+from projects.material_index import buscar_materiales
+
+MATERIALES_POR_PAGINA = 50
 
 @login_required
 def material_list(request):
@@ -19,14 +23,20 @@ def material_list(request):
     )
     materials = (
         Material.objects
-        .select_related("unit")
+        .select_related("unit", "category")
         .prefetch_related(prefetch)
         .order_by("name")
     )
-    if q:
-        materials = materials.filter(Q(name__icontains=q) | Q(sku__icontains=q))
+    # Con búsqueda: índices trigram y orden por similitud en PostgreSQL
+    materials = buscar_materiales(materials, q)
+
+    page = Paginator(materials, MATERIALES_POR_PAGINA).get_page(request.GET.get("page"))
 
-    return render(request, "catalog/material_list.html", {"materials": materials, "q": q})
+    return render(
+        request,
+        "catalog/material_list.html",
+        {"materials": page.object_list, "page_obj": page, "q": q},
+    )
 
 @login_required
 def material_create(request):
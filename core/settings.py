@@ -165,6 +165,36 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# ===== CACHÉ =====
+# Las cachés de la aplicación (precios, plantilla del presupuesto, KPIs,
+# índice de materiales, conteos, tablero) se invalidan con contadores que
+# viven aquí (projects.versioning). Con varios workers la caché debe ser
+# compartida para que un cambio hecho en uno llegue a los demás: en
+# producción definir REDIS_URL (check --deploy lo exige). Sin REDIS_URL
+# (desarrollo, un solo proceso) se usa la caché en memoria.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# ===== ALERTAS DE STOCK BAJO =====
+# Umbrales del índice de alertas (projects.stock_alerts):
+# - material: stock global <= presentación × PORCENTAJE_PRESENTACION / 100
+# - proyecto: stock asignado < STOCK_PROYECTO_MINIMO
+STOCK_ALERTAS = {
+    "PORCENTAJE_PRESENTACION": 10,
+    "STOCK_PROYECTO_MINIMO": 10,
+}
+
 # ===== CONFIGURACIÓN DE AWS S3 PARA IMÁGENES =====
 # Las imágenes se guardarán en AWS S3 (almacenamiento en la nube)
 # Esto permite que las imágenes sean accesibles desde cualquier computador
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dashboard"
+
+    def ready(self):
+        # Registrar receptores de señales (invalidación de los KPIs en caché)
+        from . import signals  # noqa: F401
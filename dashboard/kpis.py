@@ -1,94 +1,166 @@
 """Helper functions to compute dashboard KPI aggregates.
 
-This module exposes two functions:
-- compute_kpis: pure-Python function that works on plain iterables of dict-like objects
+This module exposes:
+- load_kpi_columns / sweep_kpis: columnar (NumPy) core that loads budgets, spend,
+  stock and presentation once and evaluates many thresholds in one vectorized call
+- compute_kpis: single-threshold wrapper over the columnar core that works on plain
+  iterables of dict-like objects
 - compute_kpis_from_django: convenience wrapper that accepts Django QuerySets for projects and materials
 
 Keeping numeric logic here makes it easy to unit-test without DB and to reuse in views.
 """
-from typing import Iterable, Dict, Any
+from typing import Iterable, Dict, Any, NamedTuple, Sequence
 
+import numpy as np
 
-def compute_kpis(projects: Iterable[Dict[str, Any]], materials: Iterable[Dict[str, Any]],
-                 material_threshold: float = 10.0, desviacion_threshold: float = 10.0) -> Dict[str, Any]:
-    """Compute KPI-like aggregates from simple lists of dict-like objects.
 
-    projects: iterable of dicts with keys: presupuesto, presupuesto_gastado, id, name
-    materials: iterable of dicts with keys: stock, presentation_qty
-    Returns dict with porcentaje_avance, resumen_financiero, materiales (filtered), proyectos (deviations)
+class KpiColumns(NamedTuple):
+    """Project and material rows plus their numeric columns as float arrays."""
+    projects: list
+    presupuesto: np.ndarray
+    gastado: np.ndarray
+    materials: list
+    stock: np.ndarray
+    presentation_qty: np.ndarray
+
+
+def _column(rows, key) -> np.ndarray:
+    return np.fromiter(
+        (float(r.get(key) or 0) for r in rows), dtype=float, count=len(rows)
+    )
+
+
+def load_kpi_columns(projects: Iterable[Dict[str, Any]],
+                     materials: Iterable[Dict[str, Any]]) -> KpiColumns:
+    """Load dict-like rows into columns once, for any number of threshold sweeps.
+
+    projects: dicts with keys: presupuesto, presupuesto_gastado, id, name
+    materials: dicts with keys: stock, presentation_qty
+    """
+    projects = list(projects)
+    materials = list(materials)
+    return KpiColumns(
+        projects=projects,
+        presupuesto=_column(projects, 'presupuesto'),
+        gastado=_column(projects, 'presupuesto_gastado'),
+        materials=materials,
+        stock=_column(materials, 'stock'),
+        presentation_qty=_column(materials, 'presentation_qty'),
+    )
+
+
+def sweep_kpis(columns: KpiColumns, material_thresholds: Sequence[float],
+               desviacion_thresholds: Sequence[float]) -> Dict[str, Any]:
+    """Evaluate every threshold in one vectorized pass.
+
+    Returns porcentaje_avance, resumen_financiero, the per-project ``porcentaje``
+    array (NaN where there is no budget) and, aligned with the given thresholds:
+    - materiales_por_umbral: index arrays of materials with
+      stock <= presentation_qty * (t/100)
+    - proyectos_por_umbral: index arrays of projects with abs(porcentaje - 100) >= t
     """
-    total_presupuesto = 0.0
-    total_gastado = 0.0
-
-    proyectos_list = list(projects)
-    for p in proyectos_list:
-        presupuesto = p.get('presupuesto') or 0.0
-        gastado = p.get('presupuesto_gastado') or 0.0
-        # Ensure numeric types are floats for aggregation
-        presupuesto_f = float(presupuesto)
-        gastado_f = float(gastado)
-        total_presupuesto += presupuesto_f
-        total_gastado += gastado_f
+    material_t = np.asarray(material_thresholds, dtype=float).reshape(-1, 1)
+    desviacion_t = np.asarray(desviacion_thresholds, dtype=float).reshape(-1, 1)
 
+    total_presupuesto = float(columns.presupuesto.sum())
+    total_gastado = float(columns.gastado.sum())
     porcentaje_avance = 0.0
-    if total_presupuesto and total_presupuesto > 0:
+    if total_presupuesto > 0:
         porcentaje_avance = (total_gastado / total_presupuesto) * 100
 
-    # materiales bajo stock: stock <= presentation_qty * (threshold/100)
-    materiales_bajo = []
-    for m in materials:
-        stock = float(m.get('stock', 0))
-        pres = float(m.get('presentation_qty', 0))
-        if stock <= pres * (material_threshold / 100.0):
-            materiales_bajo.append(m)
-
-    proyectos_desviacion = []
-    for p in proyectos_list:
-        presupuesto = p.get('presupuesto') or 0.0
-        gastado = p.get('presupuesto_gastado') or 0.0
-        porcentaje = None
-        # Work with floats to avoid mixing Decimal and float
-        presupuesto_f = float(presupuesto)
-        gastado_f = float(gastado)
-        if presupuesto_f and presupuesto_f > 0:
-            porcentaje = (gastado_f / presupuesto_f) * 100
-            if abs(porcentaje - 100) >= desviacion_threshold:
-                proyectos_desviacion.append({
-                    'id': p.get('id'),
-                    'name': p.get('name'),
-                    'presupuesto': presupuesto_f,
-                    'gastado': gastado_f,
-                    'porcentaje': porcentaje,
-                })
+    # (umbrales × materiales): stock bajo para cada umbral
+    bajo = columns.stock <= columns.presentation_qty * (material_t / 100.0)
+
+    # (umbrales × proyectos): desviación para cada umbral, solo con presupuesto > 0
+    con_presupuesto = columns.presupuesto > 0
+    porcentaje = np.full(len(columns.projects), np.nan)
+    np.divide(
+        columns.gastado, columns.presupuesto, out=porcentaje, where=con_presupuesto
+    )
+    porcentaje *= 100
+    desviacion = np.abs(np.nan_to_num(porcentaje) - 100)
+    desviado = con_presupuesto & (desviacion >= desviacion_t)
 
     return {
         'porcentaje_avance': round(porcentaje_avance, 2),
         'resumen_financiero': {
-            'total_presupuesto': float(total_presupuesto),
-            'total_gastado': float(total_gastado),
+            'total_presupuesto': total_presupuesto,
+            'total_gastado': total_gastado,
         },
-        'materiales': materiales_bajo,
-        'proyectos': proyectos_desviacion,
+        'porcentaje': porcentaje,
+        'materiales_por_umbral': [np.flatnonzero(row) for row in bajo],
+        'proyectos_por_umbral': [np.flatnonzero(row) for row in desviado],
     }
 
 
-def compute_kpis_from_django(projects_qs, materials_qs, material_threshold: float = 10.0, desviacion_threshold: float = 10.0):
-    """Compute KPIs when given Django QuerySets for projects and materials.
+def deviation_row(columns: KpiColumns, i: int) -> Dict[str, Any]:
+    """Deviation entry for project ``i``, as in ``compute_kpis()['proyectos']``."""
+    p = columns.projects[i]
+    presupuesto = float(columns.presupuesto[i])
+    gastado = float(columns.gastado[i])
+    return {
+        'id': p.get('id'),
+        'name': p.get('name'),
+        'presupuesto': presupuesto,
+        'gastado': gastado,
+        'porcentaje': (gastado / presupuesto) * 100,
+    }
 
-    Returns the same shaped dict as compute_kpis.
+
+def compute_kpis(projects: Iterable[Dict[str, Any]], materials: Iterable[Dict[str, Any]],
+                 material_threshold: float = 10.0, desviacion_threshold: float = 10.0) -> Dict[str, Any]:
+    """Compute KPI-like aggregates from simple lists of dict-like objects.
+
+    projects: iterable of dicts with keys: presupuesto, presupuesto_gastado, id, name
+    materials: iterable of dicts with keys: stock, presentation_qty
+    Returns dict with porcentaje_avance, resumen_financiero, materiales (filtered), proyectos (deviations)
+    """
+    columns = load_kpi_columns(projects, materials)
+    sweep = sweep_kpis(columns, [material_threshold], [desviacion_threshold])
+
+    return {
+        'porcentaje_avance': sweep['porcentaje_avance'],
+        'resumen_financiero': sweep['resumen_financiero'],
+        'materiales': [columns.materials[i] for i in sweep['materiales_por_umbral'][0]],
+        'proyectos': [
+            deviation_row(columns, i) for i in sweep['proyectos_por_umbral'][0]
+        ],
+    }
+
+
+def _gasto_proyecto(p) -> float:
+    """Gasto real de un proyecto.
+
+    Usa primero la anotación ``gasto_calculado`` de
+    ``Project.objects.with_spend()`` (calculada para todos los proyectos en una
+    consulta), luego el libro de gasto mantenido y por último el campo heredado
+    ``presupuesto_gastado``.
+    """
+    for attr in ('gasto_calculado', 'presupuesto_gastado_calculado'):
+        value = getattr(p, attr, None)
+        if value is not None:
+            return float(value)
+    return float(getattr(p, 'presupuesto_gastado', 0) or 0)
+
+
+def kpi_rows_from_django(projects_qs, materials_qs):
+    """Plain project and material rows (as expected by load_kpi_columns) from QuerySets.
+
+    Pass ``Project.objects.with_spend()`` querysets so spend is read from the
+    annotation instead of being computed per project.
     """
-    # Build plain structures for reuse of compute_kpis logic
     proyectos = []
     for p in projects_qs:
         proyectos.append({
             'id': getattr(p, 'id', None),
             'name': getattr(p, 'name', ''),
             'presupuesto': float(getattr(p, 'presupuesto', 0) or 0),
-            # Prefer the computed property if available (sums entradas/consumos)
-            'presupuesto_gastado': float(getattr(p, 'presupuesto_gastado_calculado', None) if getattr(p, 'presupuesto_gastado_calculado', None) is not None else getattr(p, 'presupuesto_gastado', 0) or 0),
+            'presupuesto_gastado': _gasto_proyecto(p),
         })
 
     materiales = []
+    if hasattr(materials_qs, 'select_related'):
+        materials_qs = materials_qs.select_related('unit')
     for m in materials_qs:
         materiales.append({
             'id': getattr(m, 'id', None),
@@ -99,4 +171,15 @@ def compute_kpis_from_django(projects_qs, materials_qs, material_threshold: floa
             'unit': getattr(getattr(m, 'unit', None), 'symbol', '') if getattr(m, 'unit', None) else '',
         })
 
+    return proyectos, materiales
+
+
+def compute_kpis_from_django(projects_qs, materials_qs, material_threshold: float = 10.0, desviacion_threshold: float = 10.0):
+    """Compute KPIs when given Django QuerySets for projects and materials.
+
+    Pass ``Project.objects.with_spend()`` querysets so spend is read from the
+    annotation instead of being computed per project.
+    Returns the same shaped dict as compute_kpis.
+    """
+    proyectos, materiales = kpi_rows_from_django(projects_qs, materials_qs)
     return compute_kpis(proyectos, materiales, material_threshold=material_threshold, desviacion_threshold=desviacion_threshold)
@@ -0,0 +1,113 @@
+"""
+KPIs del dashboard en vivo (Server-Sent Events).
+
+``kpis_stream`` mantiene abierta una respuesta ``text/event-stream`` por
+jefe conectado. En lugar de consultar cada cierto tiempo, cada conexión
+espera en ``notifier`` a que cambie la versión de los KPIs
+(``dashboard.services.VERSION_KEY``):
+
+- Las escrituras del mismo proceso despiertan a las conexiones en el acto
+  (``KpiNotifier.notify``, llamado desde ``invalidate_kpis``).
+- Cada ``POLL_SECONDS`` la conexión vuelve a leer la versión. Los cambios de
+  otros procesos solo se ven así si la caché es compartida (Redis con
+  ``REDIS_URL``; ``check --deploy`` lo exige, ver ``projects.checks``). Con
+  la caché local por defecto cada proceso solo ve sus propias escrituras.
+
+Cada conexión ocupa un hilo del servidor mientras está abierta, así que se
+cierra a los ``MAX_SECONDS`` y el navegador reconecta solo (``EventSource``)
+enviando ``Last-Event-ID``: si la versión no cambió no se reenvía nada.
+
+Al despertar, el payload se lee de ``get_kpis``: la primera conexión lo
+calcula y las demás lo toman de la caché, así que diez jefes mirando el
+dashboard cuestan un cálculo por cambio. A cada cliente solo se le envían
+las claves que cambiaron desde lo último que recibió.
+"""
+import json
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from projects.versioning import get_version
+
+from .services import VERSION_KEY, get_kpis
+
+POLL_SECONDS = 15  # relectura de la versión (cambios de otros procesos) y latido
+MAX_SECONDS = 60  # libera el hilo; el navegador reconecta con Last-Event-ID
+RETRY_MS = 3000
+
+# Claves de get_kpis que se envían al navegador
+CAMPOS = ("porcentaje_avance", "resumen_financiero", "materiales", "proyectos")
+
+
+class KpiNotifier:
+    """Despierta a las conexiones SSE del proceso cuando cambian los KPIs."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+
+    def notify(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, version, timeout):
+        """
+        Espera hasta ``timeout`` segundos a que la versión deje de ser
+        ``version`` y devuelve la versión vigente. Solo ``notify`` (escrituras
+        de este proceso) la despierta antes de tiempo; los cambios de otros
+        procesos se ven al vencer ``timeout`` si la caché es compartida.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: get_version(VERSION_KEY) != version, timeout
+            )
+        return get_version(VERSION_KEY)
+
+
+notifier = KpiNotifier()
+
+
+def _evento(data, version=None, event="kpis"):
+    lineas = [f"event: {event}"]
+    if version is not None:
+        lineas.append(f"id: {version}")
+    lineas.append("data: " + json.dumps(data, cls=DjangoJSONEncoder))
+    return "\n".join(lineas) + "\n\n"
+
+
+def eventos_kpis(filtros, ultima_version=None, max_seconds=MAX_SECONDS,
+                 poll_seconds=POLL_SECONDS):
+    """
+    Generador de eventos SSE para un cliente.
+
+    El primer evento trae el payload completo salvo que ``ultima_version``
+    (``Last-Event-ID`` del navegador) ya sea la vigente; los siguientes solo
+    las claves que cambiaron. Sin cambios se envía un comentario de latido.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+
+    enviado = {}
+    version = get_version(VERSION_KEY)
+    if str(version) != str(ultima_version or ""):
+        payload = get_kpis(**filtros)
+        enviado = {campo: payload[campo] for campo in CAMPOS}
+        yield _evento({"version": version, "cambios": enviado}, version)
+
+    fin = time.monotonic() + max_seconds
+    while time.monotonic() < fin:
+        restante = max(fin - time.monotonic(), 0)
+        nueva = notifier.wait(version, min(poll_seconds, restante))
+        if nueva == version:
+            yield ": ping\n\n"
+            continue
+
+        version = nueva
+        payload = get_kpis(**filtros)
+        cambios = {
+            campo: payload[campo]
+            for campo in CAMPOS
+            if enviado.get(campo) != payload[campo]
+        }
+        if cambios:
+            enviado.update(cambios)
+            yield _evento({"version": version, "cambios": cambios}, version)
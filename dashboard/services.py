@@ -0,0 +1,301 @@
+"""
+Servicio de KPIs del dashboard del Jefe.
+
+``kpis`` (HTML) y ``kpis_data`` (JSON) leen el mismo payload de
+``get_kpis``: se calcula una vez por combinación de filtros y se guarda en la
+caché de Django. La clave incluye la versión ``VERSION_KEY``
+(``projects.versioning``), que se incrementa al escribir proyectos, compras,
+consumos o materiales (ver ``dashboard.signals``); ``CACHE_TIMEOUT`` acota
+la vigencia de lo que cambie por actualizaciones en bloque que no emiten
+señales.
+"""
+import hashlib
+import threading
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+
+from projects.rollup import kpis_periodo
+from projects.stock_alerts import alertas_stock, umbrales as umbrales_stock
+from projects.versioning import bump_version, get_version
+
+from .kpis import (
+    compute_kpis_from_django,
+    deviation_row,
+    kpi_rows_from_django,
+    load_kpi_columns,
+    sweep_kpis,
+)
+
+VERSION_KEY = "dashboard_kpis"
+CACHE_TIMEOUT = 300  # segundos
+MAX_ALERTAS_STOCK = 50  # el resto se pagina en dashboard:alertas_stock
+MAX_UMBRALES = 200  # por barrido
+
+# Un candado por clave de caché: solo esperan las peticiones con los mismos
+# filtros; ``_candados_lock`` protege el diccionario
+_candados = {}
+_candados_lock = threading.Lock()
+
+
+def filtros_kpis(params):
+    """
+    Normaliza los filtros del dashboard desde ``request.GET``; valores
+    inválidos vuelven al valor por defecto.
+    """
+    def _float(name, default):
+        try:
+            return float(params.get(name, default))
+        except (TypeError, ValueError):
+            return float(default)
+
+    try:
+        proyecto_id = int(params.get("proyecto") or 0) or None
+    except ValueError:
+        proyecto_id = None
+
+    return {
+        "proyecto_id": proyecto_id,
+        "fecha_desde": params.get("fecha_desde") or None,
+        "fecha_hasta": params.get("fecha_hasta") or None,
+        "material_threshold": _float("material_threshold", 10),
+        "desviacion_threshold": _float("desviacion_threshold", 10),
+    }
+
+
+def proyectos_kpis(proyecto_id=None, fecha_desde=None, fecha_hasta=None):
+    """Proyectos activos (ni futuros ni terminados) que entran en los KPIs."""
+    from projects.models import Project
+
+    proyectos = Project.objects.filter(~Q(estado__in=["futuro", "terminado"]))
+    if proyecto_id:
+        proyectos = proyectos.filter(id=proyecto_id)
+    if fecha_desde:
+        proyectos = proyectos.filter(fecha_creacion__gte=fecha_desde)
+    if fecha_hasta:
+        proyectos = proyectos.filter(fecha_creacion__lte=fecha_hasta)
+    return proyectos
+
+
+def calcular_kpis(proyecto_id=None, fecha_desde=None, fecha_hasta=None,
+                  material_threshold=10.0, desviacion_threshold=10.0):
+    """
+    Calcula el payload completo sin caché::
+
+        {"porcentaje_avance", "resumen_financiero": {total_presupuesto,
+         total_gastado, saldo, gastado_periodo, consumido_periodo},
+         "proyectos": [...desviaciones],
+         "materiales": [...bajo stock global], "materiales_bajo_10": [...],
+         "alertas_stock_total", "proyectos_filtro": [{id, name}]}
+
+    Solo estructuras simples (números, textos, listas y dicts), para poder
+    guardarlo en cualquier backend de caché y serializarlo a JSON.
+    """
+    from catalog.models import Material
+    from projects.models import AlertaStock
+
+    proyectos = proyectos_kpis(proyecto_id, fecha_desde, fecha_hasta)
+    porcentaje_alertas, _ = umbrales_stock()
+    if Decimal(str(material_threshold)) == porcentaje_alertas:
+        # Umbral por defecto: solo los materiales con alerta global en el
+        # índice, sin recorrer el resto del catálogo
+        materiales = Material.objects.filter(
+            Exists(
+                AlertaStock.objects.filter(
+                    material=OuterRef("pk"), proyecto__isnull=True
+                )
+            )
+        )
+    else:
+        materiales = Material.objects.filter(
+            stock__lte=F("presentation_qty") * (material_threshold / 100.0)
+        )
+    payload = compute_kpis_from_django(
+        proyectos.with_spend(),
+        materiales,
+        material_threshold=material_threshold,
+        desviacion_threshold=desviacion_threshold,
+    )
+
+    resumen = payload["resumen_financiero"]
+    resumen["saldo"] = resumen["total_presupuesto"] - resumen["total_gastado"]
+
+    # Movimientos dentro del período (resumen diario), para los proyectos
+    # activos sin importar su fecha de creación
+    periodo = kpis_periodo(proyectos_kpis(proyecto_id), fecha_desde, fecha_hasta)
+    resumen["gastado_periodo"] = float(periodo["costo_compras"])
+    resumen["consumido_periodo"] = float(periodo["costo_consumos"])
+
+    # Stock bajo por proyecto (índice de alertas): las más recientes y el total
+    stock_bajo = alertas_stock(proyecto_id, nivel="proyecto")
+    payload["materiales_bajo_10"] = [
+        alerta_dict(alerta) for alerta in stock_bajo[:MAX_ALERTAS_STOCK]
+    ]
+    payload["alertas_stock_total"] = stock_bajo.count()
+
+    # Opciones del selector de proyecto: los mismos proyectos activos
+    payload["proyectos_filtro"] = list(
+        proyectos_kpis().order_by("-fecha_creacion").values("id", "name")
+    )
+    return payload
+
+
+def alerta_dict(alerta):
+    """Fila de ``AlertaStock`` (con su select_related) lista para JSON."""
+    material = alerta.material
+    return {
+        "id": alerta.pk,
+        "material_id": material.pk,
+        "material": material.name,
+        "proyecto_id": alerta.proyecto_id,
+        "proyecto": alerta.proyecto.name if alerta.proyecto else "",
+        "stock": material.stock,
+        "stock_proyecto": (
+            alerta.proyecto_material.stock_proyecto
+            if alerta.proyecto_material
+            else None
+        ),
+        "unidad": material.unit.name if material.unit else "",
+        "fecha": alerta.fecha,
+    }
+
+
+def umbrales(valor):
+    """
+    Lista de umbrales desde ``"5,10,20"``; ignora valores inválidos,
+    elimina repetidos y limita a ``MAX_UMBRALES``.
+    """
+    resultado = []
+    for parte in (valor or "").split(","):
+        try:
+            umbral = float(parte)
+        except ValueError:
+            continue
+        if umbral not in resultado:
+            resultado.append(umbral)
+    return resultado[:MAX_UMBRALES]
+
+
+def calcular_barrido(proyecto_id=None, fecha_desde=None, fecha_hasta=None,
+                     material_thresholds=(), desviacion_thresholds=()):
+    """
+    Evalúa varios umbrales de stock y desviación en una sola pasada
+    (``dashboard.kpis.sweep_kpis``), para mover los controles del dashboard
+    sin volver a consultar::
+
+        {"umbrales_material": [...], "umbrales_desviacion": [...],
+         "materiales": [...], "proyectos": [...],
+         "materiales_por_umbral": [[id, ...], ...],
+         "proyectos_por_umbral": [[id, ...], ...]}
+
+    ``materiales`` y ``proyectos`` traen una vez cada fila que aparece en
+    algún umbral; las listas ``*_por_umbral`` van alineadas con los umbrales.
+    """
+    from catalog.models import Material
+
+    material_thresholds = list(material_thresholds)
+    desviacion_thresholds = list(desviacion_thresholds)
+
+    # Solo pueden salir materiales bajo el mayor umbral pedido
+    materiales = Material.objects.none()
+    if material_thresholds:
+        materiales = Material.objects.filter(
+            stock__lte=F("presentation_qty") * (max(material_thresholds) / 100.0)
+        )
+    proyectos, materiales = kpi_rows_from_django(
+        proyectos_kpis(proyecto_id, fecha_desde, fecha_hasta).with_spend(), materiales
+    )
+    columns = load_kpi_columns(proyectos, materiales)
+    barrido = sweep_kpis(columns, material_thresholds, desviacion_thresholds)
+
+    por_material = barrido["materiales_por_umbral"]
+    por_proyecto = barrido["proyectos_por_umbral"]
+    indices_materiales = sorted({int(i) for fila in por_material for i in fila})
+    indices_proyectos = sorted({int(i) for fila in por_proyecto for i in fila})
+    return {
+        "umbrales_material": material_thresholds,
+        "umbrales_desviacion": desviacion_thresholds,
+        "materiales": [columns.materials[i] for i in indices_materiales],
+        "proyectos": [deviation_row(columns, i) for i in indices_proyectos],
+        "materiales_por_umbral": [
+            [columns.materials[i]["id"] for i in fila] for fila in por_material
+        ],
+        "proyectos_por_umbral": [
+            [columns.projects[i]["id"] for i in fila] for fila in por_proyecto
+        ],
+    }
+
+
+def _cache_key(version, filtros):
+    firma = repr(sorted(filtros.items())).encode()
+    return f"dashboard:kpis:{version}:{hashlib.md5(firma).hexdigest()}"
+
+
+def _candado(key):
+    """Candado de ``key``; descarta los de versiones anteriores al crear uno."""
+    with _candados_lock:
+        candado = _candados.get(key)
+        if candado is None:
+            version = key.split(":")[2]
+            for vieja in [k for k in _candados if k.split(":")[2] != version]:
+                del _candados[vieja]
+            candado = _candados[key] = threading.Lock()
+        return candado
+
+
+def get_kpis(**filtros):
+    """
+    Payload de ``calcular_kpis`` para los filtros dados, desde la caché si
+    ya se calculó con la versión vigente de los datos.
+    """
+    filtros = {**filtros_kpis({}), **filtros}
+    key = _cache_key(get_version(VERSION_KEY), filtros)
+    payload = cache.get(key)
+    if payload is None:
+        # Una sola petición del proceso calcula cada combinación de filtros; las
+        # que llegan a la vez (p. ej. varias conexiones en vivo tras un cambio)
+        # esperan y leen la caché, sin bloquear las de otros filtros
+        with _candado(key):
+            payload = cache.get(key)
+            if payload is None:
+                payload = calcular_kpis(**filtros)
+                cache.set(key, payload, CACHE_TIMEOUT)
+    return payload
+
+
+def get_barrido(material_thresholds, desviacion_thresholds, **filtros):
+    """``calcular_barrido`` con la misma caché versionada que ``get_kpis``."""
+    filtros = {
+        "proyecto_id": filtros.get("proyecto_id"),
+        "fecha_desde": filtros.get("fecha_desde"),
+        "fecha_hasta": filtros.get("fecha_hasta"),
+        "material_thresholds": tuple(material_thresholds),
+        "desviacion_thresholds": tuple(desviacion_thresholds),
+    }
+    key = _cache_key(get_version(VERSION_KEY), {"barrido": True, **filtros})
+    payload = cache.get(key)
+    if payload is None:
+        payload = calcular_barrido(**filtros)
+        cache.set(key, payload, CACHE_TIMEOUT)
+    return payload
+
+
+def invalidate_kpis():
+    """
+    Marca como obsoletos todos los KPIs en caché y avisa a las conexiones en
+    vivo (``dashboard.live``) cuando la escritura queda confirmada.
+
+    Se incrementa la versión de inmediato y otra vez al confirmar: lo que otra
+    petición haya calculado mientras la transacción seguía abierta tampoco
+    se reutiliza.
+    """
+    from .live import notifier
+
+    def confirmar():
+        bump_version(VERSION_KEY)
+        notifier.notify()
+
+    bump_version(VERSION_KEY)
+    transaction.on_commit(confirmar)
@@ -0,0 +1,42 @@
+"""
+Receptores de señales del app dashboard.
+
+Invalidan los KPIs en caché (``dashboard.services``) cuando cambian los
+datos con los que se calculan.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.models import Material, MaterialSupplier
+from projects.models import (
+    ConsumoMaterial,
+    EntradaMaterial,
+    Project,
+    ProyectoMaterial,
+    proyectos_actualizados_en_bloque,
+)
+
+from .services import invalidate_kpis
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=EntradaMaterial)
+@receiver(post_delete, sender=EntradaMaterial)
+@receiver(post_save, sender=ConsumoMaterial)
+@receiver(post_delete, sender=ConsumoMaterial)
+@receiver(post_save, sender=ProyectoMaterial)
+@receiver(post_delete, sender=ProyectoMaterial)
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+@receiver(post_save, sender=MaterialSupplier)
+@receiver(post_delete, sender=MaterialSupplier)
+def kpi_data_changed(sender, **kwargs):
+    """Cambió un proyecto, una compra, un consumo, el stock o un material."""
+    invalidate_kpis()
+
+
+@receiver(proyectos_actualizados_en_bloque)
+def kpi_data_changed_en_bloque(sender, **kwargs):
+    """Presupuestos o precios de proyectos escritos en bloque."""
+    invalidate_kpis()
@@ -207,3 +207,178 @@ class SafeDashboardTests(TestCase):
         # Usamos el threshold por defecto: 10%
         response = self.client.get(reverse('dashboard:kpis'))
         self.assertContains(response, 'Proyecto Seguro')
+
+
+class KpiServiceTests(TestCase):
+    """El payload de KPIs se calcula una vez y se invalida con las escrituras."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from projects.tests.test_ledger import crear_material
+        from projects.tests.test_pricing import crear_proyecto
+
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username='kpiadmin', email='kpi@example.com', password='kpi123'
+        )
+        self.client = Client()
+        self.client.login(username='kpiadmin', password='kpi123')
+        self.project = crear_proyecto(
+            self.user, name='Proyecto KPI', presupuesto=1000000, estado='en_proceso'
+        )
+        self.material = crear_material(
+            'KPI-1', 'Cemento', 1000, stock=1, presentation_qty=100
+        )
+
+    def test_html_y_json_comparten_el_payload_en_cache(self):
+        self.client.get(reverse('dashboard:kpis'))
+        # Solo sesión y usuario: los KPIs salen de la caché
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dashboard:kpis_data'))
+        data = response.json()
+        self.assertEqual(data['resumen_financiero']['total_presupuesto'], 1000000.0)
+        self.assertEqual([m['sku'] for m in data['materiales']], ['KPI-1'])
+
+    def test_escrituras_invalidan(self):
+        self.client.get(reverse('dashboard:kpis_data'))
+        self.material.stock = 500
+        self.material.save()
+
+        data = self.client.get(reverse('dashboard:kpis_data')).json()
+        self.assertEqual(data['materiales'], [])
+
+    def test_etag_responde_304_sin_cambios(self):
+        etag = self.client.get(reverse('dashboard:kpis_data'))['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('dashboard:kpis_data'), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        self.material.stock = 500
+        self.material.save()
+        response = self.client.get(
+            reverse('dashboard:kpis_data'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_un_candado_por_clave(self):
+        from dashboard.services import _candado, _candados, _cache_key
+
+        a = _cache_key(1, {'proyecto_id': 1})
+        b = _cache_key(1, {'proyecto_id': 2})
+        self.assertIs(_candado(a), _candado(a))
+        self.assertIsNot(_candado(a), _candado(b))
+        # Con otro filtro ocupado, get_kpis no espera
+        with _candado(b):
+            data = self.client.get(reverse('dashboard:kpis_data')).json()
+        self.assertIn('resumen_financiero', data)
+        # Los candados de versiones anteriores se descartan
+        _candado(_cache_key(2, {'proyecto_id': 1}))
+        self.assertNotIn(a, _candados)
+
+    def test_barrido_de_umbrales_en_una_respuesta(self):
+        data = self.client.get(
+            reverse('dashboard:kpis_data'),
+            {'material_thresholds': '0.5,1,50', 'desviacion_thresholds': '50,150'},
+        ).json()
+        barrido = data['barrido']
+        self.assertEqual(barrido['umbrales_material'], [0.5, 1.0, 50.0])
+        self.assertEqual(
+            barrido['materiales_por_umbral'],
+            [[], [self.material.pk], [self.material.pk]],
+        )
+        # Sin gasto: desviación del 100%
+        self.assertEqual(barrido['proyectos_por_umbral'], [[self.project.pk], []])
+
+    def test_umbral_por_defecto_solo_carga_materiales_con_alerta(self):
+        from unittest import mock
+
+        from dashboard import services
+        from projects.tests.test_ledger import crear_material
+
+        for i in range(3):
+            crear_material(
+                f'OK-{i}', f'Sano {i}', 1000, stock=500, presentation_qty=100
+            )
+        with mock.patch.object(
+            services, 'compute_kpis_from_django',
+            wraps=services.compute_kpis_from_django,
+        ) as compute:
+            payload = services.calcular_kpis()
+        # Los materiales sanos no tienen fila en el índice y no se cargan
+        materiales = compute.call_args.args[1]
+        self.assertEqual([m.pk for m in materiales], [self.material.pk])
+        self.assertEqual([m['sku'] for m in payload['materiales']], ['KPI-1'])
+
+
+class KpiStreamTests(TestCase):
+    """El stream SSE envía el payload al conectar y luego solo los cambios."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from projects.tests.test_ledger import crear_material
+        from projects.tests.test_pricing import crear_proyecto
+
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username='sseadmin', email='sse@example.com', password='sse123'
+        )
+        self.project = crear_proyecto(
+            self.user, name='Proyecto SSE', presupuesto=1000000, estado='en_proceso'
+        )
+        self.material = crear_material(
+            'SSE-1', 'Arena', 1000, stock=500, presentation_qty=100
+        )
+
+    def _datos(self, evento):
+        import json
+        linea = [l for l in evento.splitlines() if l.startswith('data: ')][0]
+        return json.loads(linea[len('data: '):])
+
+    def test_payload_inicial_y_deltas(self):
+        from dashboard.live import eventos_kpis
+        from dashboard.services import filtros_kpis
+
+        eventos = eventos_kpis(filtros_kpis({}), poll_seconds=0, max_seconds=60)
+        self.assertTrue(next(eventos).startswith('retry:'))
+        inicial = self._datos(next(eventos))
+        self.assertEqual(inicial['cambios']['materiales'], [])
+        self.assertIn('resumen_financiero', inicial['cambios'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.material.stock = 1
+            self.material.save()
+        delta = self._datos(next(eventos))
+        # Solo cambió el stock: el resumen financiero no se reenvía
+        self.assertEqual(list(delta['cambios']), ['materiales'])
+        self.assertEqual(delta['cambios']['materiales'][0]['sku'], 'SSE-1')
+
+    def test_reconexion_al_dia_no_reenvia(self):
+        from dashboard.live import eventos_kpis
+        from dashboard.services import VERSION_KEY, filtros_kpis
+        from projects.versioning import get_version
+
+        eventos = eventos_kpis(
+            filtros_kpis({}), ultima_version=str(get_version(VERSION_KEY)),
+            poll_seconds=0, max_seconds=60,
+        )
+        next(eventos)
+        self.assertEqual(next(eventos), ': ping\n\n')
+
+    def test_endpoint(self):
+        from functools import partial
+        from unittest import mock
+
+        from dashboard.live import eventos_kpis
+
+        self.client.force_login(self.user)
+        # Un stream que termina tras el payload inicial: se lee completo sin
+        # cerrar la respuesta (cerrarla cierra la conexión a la BD del test)
+        corto = partial(eventos_kpis, max_seconds=0)
+        with mock.patch('dashboard.views.eventos_kpis', corto):
+            response = self.client.get(reverse('dashboard:kpis_stream'))
+            contenido = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(contenido.startswith(b'retry:'))
+        self.assertIn(b'event: kpis', contenido)
@@ -4,7 +4,7 @@ These tests reimplement the numeric parts of `kpis_data` using plain Python
 structures so they can run with `python -m unittest` without touching Django.
 """
 import unittest
-from dashboard.kpis import compute_kpis
+from dashboard.kpis import compute_kpis, load_kpi_columns, sweep_kpis
 
 
 class TestKpisNoDB(unittest.TestCase):
@@ -47,6 +47,31 @@ class TestKpisNoDB(unittest.TestCase):
         self.assertEqual(len(res['proyectos']), 1)
         self.assertEqual(res['proyectos'][0]['id'], 1)
 
+    def test_sweep_returns_expected_ids_per_threshold(self):
+        projects = [
+            {'id': 1, 'name': 'P1', 'presupuesto': 1000.0, 'presupuesto_gastado': 2000.0},
+            {'id': 2, 'name': 'P2', 'presupuesto': 1000.0, 'presupuesto_gastado': 950.0},
+            {'id': 3, 'name': 'P3', 'presupuesto': 0, 'presupuesto_gastado': 10.0},
+        ]
+        materials = [
+            {'id': 1, 'stock': 1.0, 'presentation_qty': 100.0},
+            {'id': 2, 'stock': 15.0, 'presentation_qty': 100.0},
+            {'id': 3, 'stock': 50.0, 'presentation_qty': 100.0},
+        ]
+        columns = load_kpi_columns(projects, materials)
+        sweep = sweep_kpis(columns, [1.0, 10.0, 20.0, 60.0], [1.0, 5.0, 10.0, 150.0])
+
+        # stock <= presentation_qty * t/100, bounds included
+        material_ids = [
+            [materials[i]['id'] for i in idx] for idx in sweep['materiales_por_umbral']
+        ]
+        self.assertEqual(material_ids, [[1], [1], [1, 2], [1, 2, 3]])
+        # P1 deviates 100%, P2 5% (bound included); P3 has no budget and never counts
+        project_ids = [
+            [projects[i]['id'] for i in idx] for idx in sweep['proyectos_por_umbral']
+        ]
+        self.assertEqual(project_ids, [[1, 2], [1, 2], [1], []])
+
 
 if __name__ == '__main__':
     unittest.main()
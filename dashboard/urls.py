@@ -8,6 +8,9 @@ urlpatterns = [
     path("jefe/", views.home_jefe, name="home_jefe"),
     path("jefe/kpis/", views.kpis, name="kpis"),
     path("jefe/kpis/data/", views.kpis_data, name="kpis_data"),
+    path("jefe/kpis/stream/", views.kpis_stream, name="kpis_stream"),
+    path("jefe/alertas-stock/", views.alertas_stock, name="alertas_stock"),
+    path("jefe/kpis/etapas/", views.etapas_matrix, name="etapas_matrix"),
     path("constructor/", views.home_constructor, name="home_constructor"),
     path("comercial/", views.home_comercial, name="home_comercial"),
 ]
@@ -2,16 +2,23 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from users.models import User
-from django.conf import settings
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField, Q
 from projects.models import Project
-from catalog.models import Material
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_GET
-from django.http import JsonResponse
-from decimal import Decimal
-from .kpis import compute_kpis_from_django
-from projects.models import ProyectoMaterial
+from django.http import JsonResponse, StreamingHttpResponse
+from .live import eventos_kpis
+from .services import (
+    VERSION_KEY,
+    alerta_dict,
+    filtros_kpis,
+    get_barrido,
+    get_kpis,
+    umbrales,
+)
+from projects.etags import etag_por_version
+from django.core.paginator import Paginator
+from projects.stock_alerts import alertas_stock as alertas_stock_qs
+from projects.utils import get_matriz_etapas
 
 
 @login_required
@@ -43,112 +50,30 @@ def home_jefe(request):
 def kpis(request):
     """Devuelve los KPIs básicos que se muestran en el dashboard del Jefe.
 
-    KPIs calculados:
-    - porcentaje_avance: porcentaje medio del presupuesto gastado sobre presupuesto entre proyectos activos
+    KPIs calculados (``dashboard.services.get_kpis``, compartido con kpis_data):
+    - porcentaje_avance: porcentaje del presupuesto gastado sobre presupuesto
+      entre proyectos activos
     - materiales_bajo_stock: lista de materiales cuyo stock global <= umbral (query param o 10 por defecto)
     - proyectos_desviacion: proyectos donde la desviación (gastado/presupuesto) supera el umbral (default 10%)
     - resumen_financiero: sumas consolidadas de presupuesto y gastado
     """
-    # Umbrales configurables via query params
-    try:
-        material_threshold = float(request.GET.get("material_threshold", 10))
-    except ValueError:
-        material_threshold = 10.0
-
-    try:
-        desviacion_threshold = float(request.GET.get("desviacion_threshold", 10))
-    except ValueError:
-        desviacion_threshold = 10.0
-
-    # === FILTROS ===
-    proyecto_id = request.GET.get("proyecto")
-    fecha_desde = request.GET.get("fecha_desde")
-    fecha_hasta = request.GET.get("fecha_hasta")
-
-    # Base queryset de proyectos (excluye futuros)
-    proyectos = Project.objects.filter(~Q(estado="futuro"))
-
-    # Aplicar filtro por proyecto específico
-    if proyecto_id:
-        proyectos = proyectos.filter(id=proyecto_id)
-
-    # Aplicar filtro por período (fecha de creación del proyecto)
-    if fecha_desde:
-        proyectos = proyectos.filter(fecha_creacion__gte=fecha_desde)
-    if fecha_hasta:
-        proyectos = proyectos.filter(fecha_creacion__lte=fecha_hasta)
-
-    # Resumen financiero consolidado
-    # Use the stored presupuesto field for total_presupuesto but prefer the computed
-    # presupuesto_gastado_calculado per project to reflect entradas/consumos.
-    resumen = proyectos.aggregate(
-        total_presupuesto=Sum("presupuesto"),
-    )
-
-    total_presupuesto = resumen.get("total_presupuesto") or 0
-    # Sum calculated spent per project to reflect actual entradas/consumos
-    total_gastado = 0
-    for p in proyectos:
-        try:
-            total_gastado += float(getattr(p, 'presupuesto_gastado_calculado', None) or getattr(p, 'presupuesto_gastado', 0) or 0)
-        except Exception:
-            # fallback to the DB field if any issue
-            total_gastado += float(getattr(p, 'presupuesto_gastado', 0) or 0)
-            
-    total_presupuesto = Decimal(total_presupuesto)
-    total_gastado = Decimal(total_gastado)
-    saldo = total_presupuesto - total_gastado
-
-    porcentaje_avance = 0
-    if total_presupuesto and total_gastado > 0:
-        porcentaje_avance = (total_gastado / total_presupuesto) * 100
-
-    # Materiales con stock bajo (porcentaje de presentation_qty)
-    materiales_bajo = Material.objects.filter(stock__lte=F('presentation_qty') * (material_threshold/100.0))
-    
-    # Materiales con stock < 10 por proyecto
-    materiales_bajo_10 = ProyectoMaterial.objects.filter(stock_proyecto__lt=10)
-    
-    # Filtrar materiales bajo stock por proyecto si aplica
-    if proyecto_id:
-        materiales_bajo_10 = materiales_bajo_10.filter(proyecto_id=proyecto_id)
-
-    # Proyectos con desviación significativa
-    proyectos_desviacion = []
-    for p in proyectos:
-        if p.presupuesto and p.presupuesto > 0:
-            # porcentaje = (p.presupuesto_gastado / p.presupuesto) * 100
-            gasto_real = getattr(p, 'presupuesto_gastado_calculado', None) or p.presupuesto_gastado
-            porcentaje = (gasto_real / p.presupuesto) * 100
-            if abs(porcentaje - 100) >= desviacion_threshold:
-                proyectos_desviacion.append({
-                    "id": p.id,
-                    "name": p.name,
-                    "presupuesto": p.presupuesto,
-                    "gastado": p.presupuesto_gastado_calculado,
-                    "porcentaje": porcentaje,
-                })
-
-    # Obtener lista de proyectos para el dropdown de filtros (solo activos y en progreso)
-    todos_proyectos = Project.objects.filter(~Q(estado="futuro")).order_by('-fecha_creacion')
+    filtros = filtros_kpis(request.GET)
+    payload = get_kpis(**filtros)
 
     context = {
-        "porcentaje_avance": round(porcentaje_avance, 2),
-        "materiales_bajo_stock": materiales_bajo[:20],
-        "materiales_bajo_10": materiales_bajo_10,
-        "proyectos_desviacion": proyectos_desviacion,
-        "resumen_financiero": {
-            "total_presupuesto": total_presupuesto,
-            "total_gastado": total_gastado,
-            "saldo": saldo,
-        },
-        "desviacion_threshold": desviacion_threshold,
-        "material_threshold": material_threshold,
+        "porcentaje_avance": payload["porcentaje_avance"],
+        "materiales_bajo_stock": payload["materiales"][:20],
+        "materiales_bajo_10": payload["materiales_bajo_10"],
+        "alertas_stock_total": payload["alertas_stock_total"],
+        "proyectos_desviacion": payload["proyectos"],
+        "resumen_financiero": payload["resumen_financiero"],
+        "desviacion_threshold": filtros["desviacion_threshold"],
+        "material_threshold": filtros["material_threshold"],
         # Filtros
-        "todos_proyectos": todos_proyectos,
-        "proyecto_filter": proyecto_id,
-        "fecha_desde_filter": fecha_desde,
-        "fecha_hasta_filter": fecha_hasta,
+        "todos_proyectos": payload["proyectos_filtro"],
+        "proyecto_filter": request.GET.get("proyecto"),
+        "fecha_desde_filter": filtros["fecha_desde"],
+        "fecha_hasta_filter": filtros["fecha_hasta"],
     }
 
     return render(request, "dashboard/home_jefe.html", context)
@@ -156,52 +81,117 @@ def kpis(request):
 
 @login_required
 @require_GET
+@etag_por_version(lambda request: [VERSION_KEY])
 def kpis_data(request):
     """Endpoint JSON que devuelve los KPIs para consumo por frontend (Chart.js).
 
-    Devuelve:
+    Devuelve (mismo payload en caché que kpis()):
     - porcentaje_avance
-    - resumen_financiero (total_presupuesto, total_gastado)
+    - resumen_financiero (total_presupuesto, total_gastado, saldo)
     - materiales: lista de {id, sku, name, stock, unit}
     - proyectos: lista de {id, name, presupuesto, gastado, porcentaje}
+    - barrido (opcional): conjuntos de materiales y proyectos para varios
+      umbrales a la vez (ver ``dashboard.services.calcular_barrido``)
     """
-    try:
-        material_threshold = float(request.GET.get("material_threshold", 10))
-    except ValueError:
-        material_threshold = 10.0
+    filtros = filtros_kpis(request.GET)
+    payload = get_kpis(**filtros)
+    data = {
+        "porcentaje_avance": payload["porcentaje_avance"],
+        "resumen_financiero": payload["resumen_financiero"],
+        "materiales": payload["materiales"],
+        "proyectos": payload["proyectos"],
+    }
+
+    # Barrido de umbrales para los controles deslizantes:
+    # ?material_thresholds=5,10,20&desviacion_thresholds=5,10,30
+    material_thresholds = umbrales(request.GET.get("material_thresholds"))
+    desviacion_thresholds = umbrales(request.GET.get("desviacion_thresholds"))
+    if material_thresholds or desviacion_thresholds:
+        data["barrido"] = get_barrido(
+            material_thresholds, desviacion_thresholds, **filtros
+        )
 
+    return JsonResponse(data)
+
+
+@login_required
+@require_GET
+def kpis_stream(request):
+    """Stream SSE con los KPIs del dashboard (ver ``dashboard.live``).
+
+    Acepta los mismos filtros que kpis_data. Envía el payload completo al
+    conectar y luego solo las claves que cambian tras una compra, un consumo o
+    un cambio de proyecto.
+    """
+    response = StreamingHttpResponse(
+        eventos_kpis(
+            filtros_kpis(request.GET),
+            ultima_version=request.headers.get("Last-Event-ID"),
+        ),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # sin buffer en nginx
+    return response
+
+
+@login_required
+@require_GET
+def alertas_stock(request):
+    """Endpoint JSON paginado con el índice de alertas de stock bajo.
+
+    Parámetros: ``nivel`` (``global`` o ``proyecto``; por defecto ambos),
+    ``proyecto`` y ``page``. Cada página se lee con una consulta
+    (``select_related`` de material, unidad, proyecto y stock asignado) más
+    el conteo del paginador.
+    """
+    nivel = request.GET.get("nivel")
+    if nivel not in ("global", "proyecto"):
+        nivel = None
     try:
-        desviacion_threshold = float(request.GET.get("desviacion_threshold", 10))
+        proyecto_id = int(request.GET.get("proyecto") or 0) or None
     except ValueError:
-        desviacion_threshold = 10.0
+        proyecto_id = None
 
-    # === APLICAR MISMOS FILTROS QUE EN kpis() ===
+    paginator = Paginator(alertas_stock_qs(proyecto_id, nivel), 50)
+    page = paginator.get_page(request.GET.get("page"))
+    return JsonResponse({
+        "alertas": [alerta_dict(alerta) for alerta in page],
+        "page": page.number,
+        "num_pages": paginator.num_pages,
+        "total": paginator.count,
+    })
+
+
+@login_required
+@require_GET
+def etapas_matrix(request):
+    """Endpoint JSON con la matriz etapas × proyectos del portafolio.
+
+    Devuelve por cada sección (etapa) del presupuesto y cada proyecto activo
+    el presupuesto planificado, el gasto ejecutado, el porcentaje y el estado.
+    Acepta los mismos filtros que ``kpis`` (proyecto, fecha_desde, fecha_hasta)
+    y además ``estado``; por defecto solo incluye proyectos en proceso.
+    """
+    estado = request.GET.get("estado")
     proyecto_id = request.GET.get("proyecto")
     fecha_desde = request.GET.get("fecha_desde")
     fecha_hasta = request.GET.get("fecha_hasta")
 
-    # Base queryset de proyectos
-    proyectos_qs = Project.objects.filter(~Q(estado__in=["futuro", "terminado"]))
-    
-    # Aplicar filtros
+    valid_estados = {value for value, _ in Project.ESTADO_CHOICES}
+    if estado in valid_estados:
+        proyectos = Project.objects.filter(estado=estado)
+    else:
+        proyectos = Project.objects.filter(estado="en_proceso")
+
     if proyecto_id:
-        proyectos_qs = proyectos_qs.filter(id=proyecto_id)
+        proyectos = proyectos.filter(id=proyecto_id)
     if fecha_desde:
-        proyectos_qs = proyectos_qs.filter(fecha_creacion__gte=fecha_desde)
+        proyectos = proyectos.filter(fecha_creacion__gte=fecha_desde)
     if fecha_hasta:
-        proyectos_qs = proyectos_qs.filter(fecha_creacion__lte=fecha_hasta)
-    
-    # Materiales bajo stock
-    materiales_qs = Material.objects.filter(stock__lte=F('presentation_qty') * (material_threshold/100.0))
-
-    payload = compute_kpis_from_django(proyectos_qs, materiales_qs, material_threshold=material_threshold, desviacion_threshold=desviacion_threshold)
-
-    # round floats for JSON safety where applicable
-    payload['porcentaje_avance'] = round(float(payload.get('porcentaje_avance', 0)), 2)
-    payload['resumen_financiero']['total_presupuesto'] = float(payload['resumen_financiero']['total_presupuesto'])
-    payload['resumen_financiero']['total_gastado'] = float(payload['resumen_financiero']['total_gastado'])
+        proyectos = proyectos.filter(fecha_creacion__lte=fecha_hasta)
 
-    return JsonResponse(payload)
+    return JsonResponse(get_matriz_etapas(proyectos.order_by("name")))
 
 
 @login_required
@@ -192,14 +192,8 @@ class ProjectAdmin(admin.ModelAdmin):
 
     def recalculate_budgets(self, request, queryset):
         """Acción para recalcular presupuestos de proyectos seleccionados"""
-        updated = 0
-        for project in queryset:
-            # Calcular campos heredados
-            project.calculate_legacy_fields()
-            # Calcular presupuesto
-            project.presupuesto = project.calculate_detailed_budget()
-            project.save()
-            updated += 1
+        # Campos heredados + presupuesto final en bloque (bulk_update por lotes)
+        updated = queryset.recalculate_budgets(legacy_fields=True)
 
         self.message_user(
             request,
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "projects"
+
+    def ready(self):
+        # Registrar receptores de señales (invalidación de cachés) y las
+        # comprobaciones del sistema
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,125 @@
+"""
+Listado de compras y stock del tablero de un proyecto (``project_board``).
+
+El tablero muestra solo el resumen de cada material comprado (cantidades,
+stock y costo): ``construir_tablero`` lo arma con tres consultas agregadas
+(compras, consumos y materiales), así que su costo depende del número de
+materiales y no del de movimientos. Las compras y consumos de un material se
+piden por páginas al desplegarlo (``compras_material``,
+``consumos_material`` y la vista ``tablero_movimientos``).
+
+``get_tablero`` guarda el resumen en la caché de Django por proyecto. La
+clave incluye las versiones de ``projects.etags``: la del proyecto (se
+incrementa al guardar o eliminar sus compras y consumos) y la del catálogo
+(materiales, proveedores y precios), así que cualquier cambio que altere el
+tablero lo reconstruye en la siguiente lectura.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from .etags import CATALOGO_KEY, version_proyecto
+from .ledger import costo_entradas
+from .versioning import get_version
+
+CACHE_TIMEOUT = 600  # segundos
+POR_PAGINA = 20  # movimientos por página al desplegar un material
+
+
+def construir_tablero(project):
+    """
+    Resumen por material de las compras de ``project``, en orden alfabético.
+
+    Cada grupo trae ``material``, ``compras`` y ``consumos`` (cuántos hay),
+    ``cantidad_total``, ``cantidad_consumida``, ``stock_proyecto`` y
+    ``costo_total`` (compras valoradas al precio del proveedor o, si no hay,
+    al costo unitario del material).
+    """
+    from catalog.models import Material
+
+    from .models import ConsumoMaterial
+
+    filas = (
+        costo_entradas(project.entradas.order_by())
+        .values("material_id")
+        .annotate(
+            compras=Count("id"),
+            cantidad_total=Sum("cantidad"),
+            costo_total=Sum("costo"),
+        )
+    )
+    compras = {fila["material_id"]: fila for fila in filas}
+    if not compras:
+        return []
+
+    filas = (
+        ConsumoMaterial.objects.filter(proyecto=project, material_id__in=compras)
+        .order_by()
+        .values("material_id")
+        .annotate(consumos=Count("id"), cantidad_consumida=Sum("cantidad_consumida"))
+    )
+    consumos = {fila["material_id"]: fila for fila in filas}
+
+    grupos = []
+    materiales = (
+        Material.objects.filter(pk__in=compras)
+        .select_related("unit")
+        .order_by("name", "id")
+    )
+    for material in materiales:
+        compra = compras[material.pk]
+        consumo = consumos.get(material.pk, {})
+        cantidad_consumida = consumo.get("cantidad_consumida") or 0
+        grupos.append({
+            "material": material,
+            "compras": compra["compras"],
+            "consumos": consumo.get("consumos", 0),
+            "cantidad_total": compra["cantidad_total"],
+            "cantidad_consumida": cantidad_consumida,
+            # Stock = total comprado - total consumido
+            "stock_proyecto": compra["cantidad_total"] - cantidad_consumida,
+            "costo_total": compra["costo_total"] or Decimal("0"),
+        })
+    return grupos
+
+
+def compras_material(project, material_id):
+    """
+    Compras de un material en ``project``, la más reciente primero, con
+    ``precio_unitario`` y ``costo`` anotados.
+    """
+    return costo_entradas(
+        project.entradas.filter(material_id=material_id).select_related(
+            "material", "proveedor"
+        )
+    ).order_by("-fecha_ingreso", "-id")
+
+
+def consumos_material(project, material_id):
+    """Consumos de un material en ``project``, el más reciente primero."""
+    from .models import ConsumoMaterial
+
+    return (
+        ConsumoMaterial.objects.filter(proyecto=project, material_id=material_id)
+        .select_related("material__unit", "registrado_por")
+        .order_by("-fecha_consumo", "-id")
+    )
+
+
+def _cache_key(project_id):
+    return "projects:tablero:{}:{}:{}".format(
+        project_id,
+        get_version(version_proyecto(project_id)),
+        get_version(CATALOGO_KEY),
+    )
+
+
+def get_tablero(project):
+    """``construir_tablero`` desde la caché si el proyecto y el catálogo no cambian."""
+    key = _cache_key(project.pk)
+    grupos = cache.get(key)
+    if grupos is None:
+        grupos = construir_tablero(project)
+        cache.set(key, grupos, CACHE_TIMEOUT)
+    return grupos
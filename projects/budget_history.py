@@ -0,0 +1,230 @@
+"""
+Historial del presupuesto detallado.
+
+``ProjectBudgetItem`` solo guarda el valor vigente de cada ítem. Para poder
+responder "¿cuál era el presupuesto el día X?" cada cambio se agrega a
+``ProjectBudgetChange`` (nunca se edita ni se borra), con el estado del ítem
+después del cambio. Las ediciones en bloque escriben sus cambios con un solo
+``bulk_create``.
+
+Para no repasar todo el historial, ``ProjectBudgetCheckpoint`` guarda cada
+cierto tiempo el estado completo del proyecto (comando
+``budget_checkpoints``). El presupuesto en una fecha se reconstruye con el
+punto de control más cercano anterior más los cambios posteriores a él.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+_estado = threading.local()
+
+
+def registrar_cambios(items, eliminado=False, fecha=None):
+    """
+    Agrega al historial el estado de ``items`` (ProjectBudgetItem o cualquier
+    objeto con ``project_id``, ``budget_item_id``, ``quantity``,
+    ``unit_price`` y ``total_price``). Con ``eliminado=True`` registra que
+    los ítems se quitaron del presupuesto.
+    """
+    from .models import ProjectBudgetChange
+
+    fecha = fecha or timezone.now()
+    cambios = [
+        ProjectBudgetChange(
+            project_id=item.project_id,
+            budget_item_id=item.budget_item_id,
+            quantity=Decimal("0") if eliminado else item.quantity,
+            unit_price=item.unit_price,
+            total_price=Decimal("0") if eliminado else item.total_price,
+            eliminado=eliminado,
+            fecha=fecha,
+        )
+        for item in items
+    ]
+    if not cambios:
+        return
+
+    pendientes = getattr(_estado, "pendientes", None)
+    if pendientes is not None:
+        pendientes.extend(cambios)
+    else:
+        ProjectBudgetChange.objects.bulk_create(cambios, batch_size=500)
+
+
+@contextmanager
+def cambios_diferidos():
+    """
+    Acumula los cambios registrados durante una edición en bloque (p. ej. un
+    ciclo de ``ProjectBudgetItem.save``) y los escribe con un solo
+    ``bulk_create`` al salir.
+    """
+    from .models import ProjectBudgetChange
+
+    if getattr(_estado, "pendientes", None) is not None:
+        # Anidado: el contexto externo se encarga de escribir
+        yield
+        return
+
+    _estado.pendientes = []
+    try:
+        yield
+        pendientes = _estado.pendientes
+    finally:
+        _estado.pendientes = None
+
+    ProjectBudgetChange.objects.bulk_create(pendientes, batch_size=500)
+
+
+def _reconstruir(project_id, fecha):
+    """
+    Estado del presupuesto en ``fecha``: ``({budget_item_id: (cantidad,
+    precio_unitario, precio_total)}, id del último cambio aplicado)``.
+    """
+    from .models import ProjectBudgetChange, ProjectBudgetCheckpoint
+
+    checkpoint = (
+        ProjectBudgetCheckpoint.objects.filter(project_id=project_id, fecha__lte=fecha)
+        .order_by("-fecha", "-id")
+        .first()
+    )
+    items = {}
+    ultimo = 0
+    if checkpoint is not None:
+        ultimo = checkpoint.ultimo_cambio_id
+        items = {
+            int(budget_item_id): tuple(Decimal(valor) for valor in valores)
+            for budget_item_id, valores in checkpoint.items.items()
+        }
+
+    cola = (
+        ProjectBudgetChange.objects.filter(
+            project_id=project_id, fecha__lte=fecha, id__gt=ultimo
+        )
+        .order_by("id")
+        .values_list(
+            "id", "budget_item_id", "quantity", "unit_price", "total_price", "eliminado"
+        )
+    )
+    for cambio_id, budget_item_id, quantity, unit_price, total_price, eliminado in cola:
+        if eliminado:
+            items.pop(budget_item_id, None)
+        else:
+            items[budget_item_id] = (quantity, unit_price, total_price)
+        ultimo = cambio_id
+    return items, ultimo
+
+
+def presupuesto_en(project, fecha):
+    """
+    Ítems del presupuesto detallado de ``project`` vigentes en ``fecha``:
+    ``{budget_item_id: (cantidad, precio_unitario, precio_total)}``.
+
+    Dos consultas: el punto de control más cercano y la cola de cambios.
+    """
+    items, _ = _reconstruir(project.pk, fecha)
+    return items
+
+
+def crear_checkpoint(project_id, fecha=None):
+    """Guarda el estado completo del presupuesto del proyecto en ``fecha``."""
+    from .models import ProjectBudgetCheckpoint
+
+    fecha = fecha or timezone.now()
+    items, ultimo = _reconstruir(project_id, fecha)
+    return ProjectBudgetCheckpoint.objects.create(
+        project_id=project_id,
+        fecha=fecha,
+        ultimo_cambio_id=ultimo,
+        items={
+            str(budget_item_id): [str(valor) for valor in valores]
+            for budget_item_id, valores in items.items()
+        },
+        total=sum((valores[2] for valores in items.values()), Decimal("0")),
+    )
+
+
+def proyectos_con_cambios(min_cambios=1):
+    """
+    Proyectos con al menos ``min_cambios`` cambios posteriores a su último
+    punto de control, anotados con ``cambios_pendientes``.
+    """
+    from .models import Project, ProjectBudgetCheckpoint
+
+    ultimo_checkpoint = (
+        ProjectBudgetCheckpoint.objects.filter(project_id=OuterRef("pk"))
+        .order_by("-ultimo_cambio_id")
+        .values("ultimo_cambio_id")[:1]
+    )
+    return (
+        Project.objects.annotate(ultimo_cambio=Coalesce(Subquery(ultimo_checkpoint), 0))
+        .annotate(
+            cambios_pendientes=Count(
+                "budget_changes",
+                filter=Q(budget_changes__id__gt=F("ultimo_cambio")),
+            )
+        )
+        .filter(cambios_pendientes__gte=min_cambios)
+    )
+
+
+def diff_presupuesto(project, desde, hasta):
+    """
+    Diferencia del presupuesto detallado entre dos fechas, para órdenes de
+    cambio del cliente::
+
+        {"total_desde": Decimal, "total_hasta": Decimal, "diferencia": Decimal,
+         "items": [{"budget_item_id", "seccion", "descripcion", "unidad",
+                    "cantidad_desde", "cantidad_hasta", "precio_desde",
+                    "precio_hasta", "total_desde", "total_hasta",
+                    "diferencia"}, ...]}
+
+    Solo incluye los ítems que cambiaron, en el orden del presupuesto.
+    """
+    from .models import BudgetItem
+
+    antes = presupuesto_en(project, desde)
+    despues = presupuesto_en(project, hasta)
+    vacio = (Decimal("0"), None, Decimal("0"))
+
+    cambiados = [
+        budget_item_id
+        for budget_item_id in antes.keys() | despues.keys()
+        if antes.get(budget_item_id) != despues.get(budget_item_id)
+    ]
+    budget_items = BudgetItem.objects.select_related("section").in_bulk(cambiados)
+
+    filas = []
+    for budget_item_id in cambiados:
+        cantidad_desde, precio_desde, total_desde = antes.get(budget_item_id, vacio)
+        cantidad_hasta, precio_hasta, total_hasta = despues.get(budget_item_id, vacio)
+        budget_item = budget_items.get(budget_item_id)
+        orden = (
+            (budget_item.section.order, budget_item.order) if budget_item else (9999, 0)
+        )
+        filas.append((orden, budget_item_id, {
+            "budget_item_id": budget_item_id,
+            "seccion": budget_item.section.name if budget_item else "",
+            "descripcion": budget_item.description if budget_item else "Ítem eliminado",
+            "unidad": budget_item.unit if budget_item else "",
+            "cantidad_desde": cantidad_desde,
+            "cantidad_hasta": cantidad_hasta,
+            "precio_desde": precio_desde,
+            "precio_hasta": precio_hasta,
+            "total_desde": total_desde,
+            "total_hasta": total_hasta,
+            "diferencia": total_hasta - total_desde,
+        }))
+    filas.sort(key=lambda fila: fila[:2])
+
+    total_desde = sum((valores[2] for valores in antes.values()), Decimal("0"))
+    total_hasta = sum((valores[2] for valores in despues.values()), Decimal("0"))
+    return {
+        "total_desde": total_desde,
+        "total_hasta": total_hasta,
+        "diferencia": total_hasta - total_desde,
+        "items": [fila for _, _, fila in filas],
+    }
@@ -0,0 +1,122 @@
+"""
+Plantilla global del presupuesto detallado en memoria del proceso.
+
+Las secciones plantilla (``BudgetSection`` sin proyecto) y sus ``BudgetItem``
+se leen en casi todas las vistas del presupuesto, pero solo cambian cuando un
+JEFE edita precios, ítems o el porcentaje de administración. Se leen una vez,
+se guardan como un árbol inmutable (``BudgetTemplate``) y se reconstruyen
+cuando cambia la versión (ver ``projects.signals``) o caduca la copia, igual
+que la tabla de precios de ``projects.pricing``.
+"""
+from decimal import Decimal
+from types import MappingProxyType
+from typing import NamedTuple
+
+from .versioning import CopiaLocal, bump_version
+
+VERSION_KEY = "budget_template"
+
+
+class TemplateItem(NamedTuple):
+    id: int
+    section_id: int
+    code: str
+    description: str
+    unit: str
+    unit_price: Decimal
+    order: int
+    is_active: bool
+
+
+class TemplateSection(NamedTuple):
+    id: int
+    name: str
+    order: int
+    description: str
+    is_percentage: bool
+    percentage_value: Decimal
+    items: tuple  # todos los TemplateItem, ordenados
+    active_items: tuple  # solo los activos
+
+
+class BudgetTemplate(NamedTuple):
+    version: int
+    sections: tuple  # TemplateSection ordenadas por ``order``
+    by_id: MappingProxyType  # section_id -> TemplateSection
+    by_order: MappingProxyType  # order -> TemplateSection
+
+    def section(self, order):
+        """Sección plantilla con ese orden, o ``None``."""
+        return self.by_order.get(order)
+
+
+def build_budget_template(sections, items, version=0):
+    """
+    Arma el árbol a partir de las secciones plantilla y sus ítems (ya
+    ordenados); separado de la lectura para poder probarlo sin BD.
+    """
+    items_by_section = {}
+    for item in items:
+        items_by_section.setdefault(item.section_id, []).append(
+            TemplateItem(
+                id=item.id,
+                section_id=item.section_id,
+                code=item.code,
+                description=item.description,
+                unit=item.unit,
+                unit_price=item.unit_price,
+                order=item.order,
+                is_active=item.is_active,
+            )
+        )
+
+    nodes = tuple(
+        TemplateSection(
+            id=section.id,
+            name=section.name,
+            order=section.order,
+            description=section.description,
+            is_percentage=section.is_percentage,
+            percentage_value=section.percentage_value,
+            items=tuple(items_by_section.get(section.id, ())),
+            active_items=tuple(
+                item for item in items_by_section.get(section.id, ()) if item.is_active
+            ),
+        )
+        for section in sections
+    )
+    return BudgetTemplate(
+        version=version,
+        sections=nodes,
+        by_id=MappingProxyType({node.id: node for node in nodes}),
+        by_order=MappingProxyType({node.order: node for node in nodes}),
+    )
+
+
+_copia = CopiaLocal(VERSION_KEY)
+
+
+def _leer(version):
+    from .models import BudgetItem, BudgetSection
+
+    sections = list(
+        BudgetSection.objects.filter(project__isnull=True).order_by("order")
+    )
+    items = BudgetItem.objects.filter(section__project__isnull=True).order_by(
+        "section__order", "order"
+    )
+    return build_budget_template(sections, items, version=version)
+
+
+def get_budget_template():
+    """
+    Devuelve la plantilla vigente.
+
+    Solo consulta la BD cuando la versión cambió o la copia caducó.
+    """
+    return _copia.get(_leer)
+
+
+def invalidate_budget_template():
+    """Marca la plantilla como obsoleta; se relee en la próxima petición."""
+    bump_version(VERSION_KEY)
@@ -0,0 +1,31 @@
+"""
+Comprobaciones del sistema del app projects (``manage.py check``).
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends de caché que no se comparten entre procesos
+CACHES_LOCALES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def cache_compartida(app_configs, **kwargs):
+    """
+    En producción la caché por defecto debe ser compartida: guarda los
+    contadores con los que cada worker invalida sus copias de precios,
+    plantillas y KPIs (``projects.versioning``).
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in CACHES_LOCALES:
+        return [
+            Error(
+                "La caché por defecto es local al proceso: los cambios de precios "
+                "y datos hechos en un worker no invalidan las copias de los demás.",
+                hint="Defina REDIS_URL para usar una caché compartida.",
+                id="projects.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,75 @@
+"""
+GET condicional (ETag) para los endpoints JSON que el navegador consulta
+una y otra vez (calendario de consumos, gráficos, buscador de materiales).
+
+Cada respuesta depende de una o más versiones de ``projects.versioning``:
+
+- ``proyecto:<id>``: datos de un proyecto (el proyecto, sus compras,
+  consumos y stock asignado).
+- ``CATALOGO_KEY``: materiales, unidades, proveedores y precios.
+
+Los receptores de ``projects.signals`` las incrementan al escribir. La ETag
+se arma con esas versiones y la URL completa, sin tocar la base de datos: si
+coincide con ``If-None-Match`` se responde 304 antes de ejecutar la vista.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .versioning import bump_version, get_version
+
+CATALOGO_KEY = "catalogo"
+
+
+def version_proyecto(project_id):
+    """Nombre de la versión de los datos de un proyecto."""
+    return f"proyecto:{project_id}"
+
+
+def invalidar_versiones(*nombres):
+    """
+    Incrementa las versiones ``nombres`` ahora y otra vez al confirmar la
+    transacción: una respuesta calculada con datos aún sin confirmar no queda
+    asociada a la versión final.
+    """
+    def confirmar():
+        for nombre in nombres:
+            bump_version(nombre)
+
+    confirmar()
+    transaction.on_commit(confirmar)
+
+
+def etag_por_version(versiones):
+    """
+    Decorador de vistas GET: ``versiones(request, *args, **kwargs)`` devuelve
+    los nombres de versión de los que depende la respuesta.
+
+    La fecha del día entra en la ETag para las vistas que calculan períodos
+    relativos a hoy. La respuesta se marca ``private, no-cache`` para que el
+    navegador la revalide en cada consulta.
+    """
+    def etag(request, *args, **kwargs):
+        nombres = versiones(request, *args, **kwargs)
+        firma = "|".join(
+            [request.get_full_path(), date.today().isoformat()]
+            + [f"{nombre}={get_version(nombre)}" for nombre in nombres]
+        )
+        return '"%s"' % hashlib.md5(firma.encode()).hexdigest()
+
+    def decorator(view):
+        condicional = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = condicional(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
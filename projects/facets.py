@@ -0,0 +1,123 @@
+"""
+Conteos por faceta para los filtros del listado de proyectos.
+
+``contar_facetas`` devuelve, para los filtros actuales, cuántos proyectos
+hay en cada valor de cada faceta (estado, trabajadores, creador, ubicación,
+rango de presupuesto y año de creación) en una sola consulta: un
+``UNION ALL`` de una agregación por faceta (equivale a ``GROUPING SETS`` y
+funciona también en SQLite). Cada faceta se cuenta sin su propio filtro,
+para que "En proceso (42)" siga visible con otro estado seleccionado.
+
+``get_facetas`` guarda el resultado en la caché de Django por combinación de
+filtros; la clave incluye la versión ``VERSION_KEY``, que se incrementa al
+guardar o eliminar un proyecto o cambiar sus trabajadores
+(``projects.signals``).
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, ExtractYear, Lower
+
+from .listing import RANGOS_TRABAJADORES, filtrar_proyectos
+from .versioning import bump_version, get_version
+
+VERSION_KEY = "project_facets"
+CACHE_TIMEOUT = 300  # segundos
+
+# Rangos de presupuesto: (valor, etiqueta, mínimo, máximo)
+RANGOS_PRESUPUESTO = (
+    ("0-100M", "Hasta $100M", None, 100_000_000),
+    ("100M-500M", "$100M - $500M", 100_000_000, 500_000_000),
+    ("500M-1000M", "$500M - $1.000M", 500_000_000, 1_000_000_000),
+    ("1000M+", "Más de $1.000M", 1_000_000_000, None),
+)
+
+
+def _rango_trabajadores():
+    casos = []
+    for valor, (minimo, maximo) in RANGOS_TRABAJADORES.items():
+        condicion = Q(worker_count__gte=minimo)
+        if maximo is not None:
+            condicion &= Q(worker_count__lte=maximo)
+        casos.append(When(condicion, then=Value(valor)))
+    return Case(*casos, output_field=CharField())
+
+
+def _rango_presupuesto():
+    casos = []
+    for valor, _, minimo, maximo in RANGOS_PRESUPUESTO:
+        condicion = Q()
+        if minimo is not None:
+            condicion &= Q(presupuesto__gte=minimo)
+        if maximo is not None:
+            condicion &= Q(presupuesto__lt=maximo)
+        casos.append(When(condicion, then=Value(valor)))
+    return Case(
+        *casos, default=Value(RANGOS_PRESUPUESTO[0][0]), output_field=CharField()
+    )
+
+
+# Faceta → (expresión del valor, filtros que se ignoran al contarla,
+#           anotar trabajadores)
+FACETAS = {
+    "estado": (lambda: Cast("estado", CharField()), ("estado",), False),
+    "trabajadores": (_rango_trabajadores, ("trabajadores",), True),
+    "creador": (lambda: Cast("creado_por_id", CharField()), ("creador",), False),
+    "ubicacion": (lambda: Lower("ubicacion_proyecto"), ("ciudad",), False),
+    "presupuesto": (_rango_presupuesto, ("presupuesto_min", "presupuesto_max"), False),
+    "anio": (
+        lambda: Cast(
+            ExtractYear("fecha_creacion", output_field=IntegerField()), CharField()
+        ),
+        ("fecha_desde", "fecha_hasta"),
+        False,
+    ),
+}
+
+
+def contar_facetas(filtros):
+    """
+    ``{faceta: {valor: total}}`` para los filtros dados (de
+    ``projects.listing.filtros_lista``), en una consulta.
+    """
+    from .models import Project
+
+    partes = []
+    for faceta, (valor, excluir, con_trabajadores) in FACETAS.items():
+        projects = filtrar_proyectos(Project.objects.all(), filtros, excluir=excluir)
+        if con_trabajadores:
+            # Su propio filtro se ignora, así que aún no está anotado
+            projects = projects.with_worker_count()
+        partes.append(
+            projects.order_by()
+            .annotate(faceta=Value(faceta, output_field=CharField()), valor=valor())
+            .values("faceta", "valor")
+            .annotate(total=Count("id"))
+        )
+
+    conteos = {faceta: {} for faceta in FACETAS}
+    for fila in partes[0].union(*partes[1:], all=True):
+        if fila["valor"] is not None:
+            conteos[fila["faceta"]][fila["valor"]] = fila["total"]
+    return conteos
+
+
+def _cache_key(version, filtros):
+    firma = repr(sorted(filtros.items())).encode()
+    return f"projects:facetas:{version}:{hashlib.md5(firma).hexdigest()}"
+
+
+def get_facetas(filtros):
+    """``contar_facetas`` desde la caché si ya se calculó con la versión vigente."""
+    key = _cache_key(get_version(VERSION_KEY), filtros)
+    conteos = cache.get(key)
+    if conteos is None:
+        conteos = contar_facetas(filtros)
+        cache.set(key, conteos, CACHE_TIMEOUT)
+    return conteos
+
+
+def invalidate_facetas():
+    """Marca como obsoletos todos los conteos en caché."""
+    bump_version(VERSION_KEY)
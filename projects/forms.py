@@ -818,32 +818,40 @@ class BudgetItemForm(forms.ModelForm):
 class BudgetSectionForm(forms.Form):
     """
     Formulario para manejar una sección completa del presupuesto
+
+    ``items`` y ``project_items`` permiten pasar los ítems ya cargados (ver
+    ``BudgetSectionFormSet``); si no se pasan se consultan para esta sección.
     """
-    def __init__(self, section, project=None, *args, **kwargs):
+    def __init__(self, section, project=None, *args, items=None, project_items=None,
+                 **kwargs):
         super().__init__(*args, **kwargs)
         self.section = section
         self.project = project
         
         # Obtener ítems de la sección
-        items = BudgetItem.objects.filter(section=section, is_active=True).order_by('order')
+        if items is None:
+            items = BudgetItem.objects.filter(
+                section=section, is_active=True
+            ).order_by('order')
         
-        for item in items:
-            # Para proyectos existentes, obtener datos guardados
+        # Para proyectos existentes, obtener datos guardados
+        if project_items is None:
+            project_items = {}
             if project and project.pk:
-                try:
-                    project_item = ProjectBudgetItem.objects.get(
-                        project=project,
-                        budget_item=item
+                project_items = {
+                    project_item.budget_item_id: project_item
+                    for project_item in ProjectBudgetItem.objects.filter(
+                        project=project, budget_item__in=items
                     )
-                    initial_quantity = project_item.quantity
-                    initial_price = project_item.unit_price
-                except ProjectBudgetItem.DoesNotExist:
-                    initial_quantity = 0
-                    initial_price = item.unit_price
+                }
+        
+        for item in items:
+            project_item = project_items.get(item.id)
+            if project_item:
+                initial_quantity = project_item.quantity
             else:
                 # Para proyectos nuevos, usar valores por defecto
                 initial_quantity = 0
-                initial_price = item.unit_price
             
             # Crear solo campos de cantidad (los precios son fijos)
             self.fields[f'quantity_{item.id}'] = forms.DecimalField(
@@ -860,45 +868,125 @@ class BudgetSectionForm(forms.Form):
                 })
             )
     
+    def cantidades(self):
+        """Cantidades validadas del formulario: ``{budget_item_id: Decimal}``"""
+        from decimal import Decimal
+        
+        # Crear/actualizar siempre, incluso con cantidad 0
+        return {
+            int(field_name.replace('quantity_', '')): (
+                value if value is not None else Decimal('0')
+            )
+            for field_name, value in self.cleaned_data.items()
+            if field_name.startswith('quantity_')
+        }
+    
     def save(self, project):
         """Guardar los datos del formulario en el proyecto"""
+        from .utils import guardar_cantidades_presupuesto
+        
         if not project:
             return
-            
-        items_saved = 0
-        for field_name, value in self.cleaned_data.items():
-            if field_name.startswith('quantity_'):
-                item_id = field_name.replace('quantity_', '')
-                try:
-                    item = BudgetItem.objects.get(id=item_id)
-                    # Para el formulario de creación, usar el precio del ítem por defecto
-                    # Los precios se envían como campos hidden, no editables
-                    unit_price = item.unit_price
-                    
-                    # Crear/actualizar siempre, incluso con cantidad 0
-                    quantity_value = value if value is not None else 0
-                    
-                    project_item, created = ProjectBudgetItem.objects.get_or_create(
-                        project=project,
-                        budget_item=item,
-                        defaults={
-                            'quantity': quantity_value,
-                            'unit_price': unit_price
-                        }
-                    )
-                    
-                    if not created:
-                        project_item.quantity = quantity_value
-                        project_item.unit_price = unit_price
-                        project_item.save()
-                    
-                    items_saved += 1
-                    print(f"DEBUG: Guardado {item.code} - Cantidad: {quantity_value} - Precio: ${unit_price}")
-                        
-                except BudgetItem.DoesNotExist:
-                    continue
         
-        print(f"DEBUG: Total ítems guardados en sección {self.section.name}: {items_saved}")
+        # Los precios se toman del ítem (se envían como campos hidden, no editables)
+        guardar_cantidades_presupuesto(project, self.cantidades())
+
+
+class BudgetSectionFormSet:
+    """
+    Construye los BudgetSectionForm de varias secciones con los datos
+    pre-cargados en tres consultas (secciones, ítems activos e ítems del
+    proyecto) y los guarda con una sola escritura en bloque. Sin ``sections``
+    usa la plantilla global en memoria (``projects.budget_template``).
+
+    Se itera como ``[{"section": ..., "items": [...], "form": ...,
+    "filas": [{"item": ..., "campo": BoundField}, ...]}, ...]``; ``filas``
+    permite a la plantilla mostrar el valor enviado y los errores de cada
+    cantidad.
+    """
+    def __init__(self, sections=None, project=None, data=None):
+        self.project = project
+        
+        if sections is None:
+            # Secciones plantilla e ítems activos desde la caché en memoria
+            from .budget_template import get_budget_template
+            self.sections = list(get_budget_template().sections)
+            items_by_section = {
+                section.id: list(section.active_items) for section in self.sections
+            }
+        else:
+            self.sections = list(sections)
+            items_by_section = {}
+            for item in BudgetItem.objects.filter(
+                section__in=self.sections, is_active=True
+            ).order_by('order'):
+                items_by_section.setdefault(item.section_id, []).append(item)
+        
+        project_items = {}
+        if project and project.pk:
+            project_items = {
+                project_item.budget_item_id: project_item
+                for project_item in ProjectBudgetItem.objects.filter(project=project)
+            }
+        
+        self.forms = []
+        for section in self.sections:
+            items = items_by_section.get(section.id, [])
+            form = BudgetSectionForm(
+                section, project, data, items=items, project_items=project_items
+            )
+            self.forms.append({
+                "section": section,
+                "items": items,
+                "form": form,
+                "filas": [
+                    {"item": item, "campo": form[f"quantity_{item.id}"]}
+                    for item in items
+                ],
+            })
+    
+    def __iter__(self):
+        return iter(self.forms)
+    
+    def __len__(self):
+        return len(self.forms)
+    
+    def is_valid(self):
+        """``True`` si todas las secciones son válidas."""
+        return all([entry["form"].is_valid() for entry in self.forms])
+    
+    @property
+    def errors(self):
+        """
+        Errores de las cantidades: ``[(sección, ítem, mensaje), ...]`` en el
+        orden del formulario.
+        """
+        errores = []
+        for entry in self.forms:
+            for fila in entry["filas"]:
+                for mensaje in fila["campo"].errors:
+                    errores.append((entry["section"], fila["item"], mensaje))
+        return errores
+    
+    def save(self, project):
+        """
+        Guarda las cantidades de todas las secciones en una sola escritura.
+        Devuelve el número de secciones procesadas; llamar antes a
+        ``is_valid()``, como en un formset de Django.
+        """
+        from .utils import guardar_cantidades_presupuesto
+        
+        if not self.is_valid():
+            raise ValueError(
+                "No se pueden guardar las cantidades: hay secciones con errores"
+            )
+        
+        cantidades = {}
+        for entry in self.forms:
+            cantidades.update(entry["form"].cantidades())
+        
+        guardar_cantidades_presupuesto(project, cantidades)
+        return len(self.forms)
 
 
 class BudgetManagementForm(forms.ModelForm):
@@ -0,0 +1,208 @@
+"""
+Libro de gasto en materiales (denormalizado).
+
+El gasto de un proyecto es la suma de sus compras (EntradaMaterial) valoradas
+al precio del proveedor, o al ``unit_cost`` del material si el proveedor no
+tiene precio registrado. En lugar de recalcularlo en cada lectura se mantiene
+acumulado en:
+
+- ``ProyectoMaterial.gasto_acumulado``: gasto por proyecto y material
+- ``Project.gasto_materiales``: gasto total del proyecto
+
+``EntradaMaterial.save``/``delete`` aplican los deltas dentro de su
+transacción. Cuando cambia un precio (MaterialSupplier o ``unit_cost``) se
+reconstruyen las filas del material afectado, y ``rebuild_spend_ledger``
+(comando ``reconcile_spend_ledger``) recalcula todo desde cero e informa la
+desviación encontrada.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce
+
+MONEY = DecimalField(max_digits=15, decimal_places=2)
+CENTAVOS = Decimal("0.01")
+
+
+def _redondear(valor):
+    return (valor or Decimal("0")).quantize(CENTAVOS)
+
+
+def precio_entrada_subquery():
+    """
+    Precio unitario de una compra dentro de un queryset de EntradaMaterial:
+    el del proveedor para ese material, con respaldo en ``Material.unit_cost``.
+    """
+    from catalog.models import MaterialSupplier
+
+    supplier_price = MaterialSupplier.objects.filter(
+        material_id=OuterRef("material_id"),
+        supplier_id=OuterRef("proveedor_id"),
+    ).values("price")[:1]
+
+    return Coalesce(
+        Subquery(supplier_price), F("material__unit_cost"), output_field=MONEY
+    )
+
+
+def costo_entradas(queryset):
+    """Anota ``costo`` (cantidad × precio unitario) en un queryset de entradas."""
+    return queryset.annotate(
+        precio_unitario=precio_entrada_subquery(),
+        costo=ExpressionWrapper(
+            F("cantidad") * F("precio_unitario"), output_field=MONEY
+        ),
+    )
+
+
+def costo_entrada(material_id, proveedor_id, cantidad):
+    """Costo de una compra individual con los precios vigentes."""
+    from catalog.models import Material, MaterialSupplier
+
+    precio = (
+        MaterialSupplier.objects.filter(
+            material_id=material_id, supplier_id=proveedor_id
+        )
+        .values_list("price", flat=True)
+        .first()
+    )
+    if precio is None:
+        precio = (
+            Material.objects.filter(pk=material_id)
+            .values_list("unit_cost", flat=True)
+            .first()
+        )
+    return Decimal(cantidad) * (precio or Decimal("0"))
+
+
+def aplicar_gasto(proyecto_id, material_id, monto):
+    """Suma ``monto`` (puede ser negativo) al gasto del proyecto y del material."""
+    from .models import Project, ProyectoMaterial
+
+    if not monto:
+        return
+    ProyectoMaterial.objects.filter(
+        proyecto_id=proyecto_id, material_id=material_id
+    ).update(gasto_acumulado=F("gasto_acumulado") + monto)
+    Project.objects.filter(pk=proyecto_id).update(
+        gasto_materiales=F("gasto_materiales") + monto
+    )
+
+
+def rebuild_spend_ledger(project_ids=None, material_ids=None, dry_run=False):
+    """
+    Recalcula el libro de gasto desde las entradas y corrige las diferencias.
+
+    Se puede limitar a ciertos proyectos o materiales. Devuelve un dict con
+    las desviaciones encontradas::
+
+        {"proyectos": [(project_id, guardado, real), ...],
+         "materiales": [(project_id, material_id, guardado, real), ...]}
+
+    Con ``dry_run=True`` solo informa, sin escribir.
+    """
+    from .models import EntradaMaterial, Project, ProyectoMaterial
+
+    entradas = EntradaMaterial.objects.all()
+    proyecto_materiales = ProyectoMaterial.objects.all()
+    if project_ids is not None:
+        entradas = entradas.filter(proyecto_id__in=project_ids)
+        proyecto_materiales = proyecto_materiales.filter(proyecto_id__in=project_ids)
+    if material_ids is not None:
+        entradas = entradas.filter(material_id__in=material_ids)
+        proyecto_materiales = proyecto_materiales.filter(
+            material_id__in=material_ids
+        )
+
+    # Gasto real por (proyecto, material) en una consulta agrupada
+    real = {
+        (row["proyecto_id"], row["material_id"]): _redondear(row["total"])
+        for row in costo_entradas(entradas)
+        .values("proyecto_id", "material_id")
+        .annotate(total=Sum("costo"))
+        .order_by()
+    }
+
+    desviacion = {"proyectos": [], "materiales": []}
+    cambiados = []
+    existentes = set()
+    campos = ("id", "proyecto_id", "material_id", "gasto_acumulado")
+    for pm in proyecto_materiales.only(*campos):
+        clave = (pm.proyecto_id, pm.material_id)
+        existentes.add(clave)
+        esperado = real.get(clave, Decimal("0"))
+        if pm.gasto_acumulado != esperado:
+            desviacion["materiales"].append(
+                (pm.proyecto_id, pm.material_id, pm.gasto_acumulado, esperado)
+            )
+            pm.gasto_acumulado = esperado
+            cambiados.append(pm)
+
+    # Compras sin fila de stock por proyecto (no debería ocurrir)
+    faltantes = [
+        ProyectoMaterial(
+            proyecto_id=proyecto_id, material_id=material_id, gasto_acumulado=total
+        )
+        for (proyecto_id, material_id), total in real.items()
+        if (proyecto_id, material_id) not in existentes
+    ]
+    for pm in faltantes:
+        desviacion["materiales"].append(
+            (pm.proyecto_id, pm.material_id, Decimal("0"), pm.gasto_acumulado)
+        )
+
+    # Totales por proyecto: el del material se recalcula sobre todos sus materiales
+    afectados = {proyecto_id for proyecto_id, _ in real} | {
+        pm.proyecto_id for pm in cambiados
+    }
+    proyectos = Project.objects.all()
+    if project_ids is not None:
+        proyectos = proyectos.filter(pk__in=project_ids)
+    elif material_ids is not None:
+        proyectos = proyectos.filter(pk__in=afectados)
+
+    totales = {
+        row["proyecto_id"]: _redondear(row["total"])
+        for row in costo_entradas(
+            EntradaMaterial.objects.filter(proyecto__in=proyectos.values("pk"))
+        )
+        .values("proyecto_id")
+        .annotate(total=Sum("costo"))
+        .order_by()
+    }
+    proyectos_cambiados = []
+    for project in proyectos.only("id", "gasto_materiales"):
+        esperado = totales.get(project.pk, Decimal("0"))
+        if project.gasto_materiales != esperado:
+            desviacion["proyectos"].append(
+                (project.pk, project.gasto_materiales, esperado)
+            )
+            project.gasto_materiales = esperado
+            proyectos_cambiados.append(project)
+
+    if not dry_run:
+        with transaction.atomic():
+            ProyectoMaterial.objects.bulk_update(
+                cambiados, ["gasto_acumulado"], batch_size=500
+            )
+            ProyectoMaterial.objects.bulk_create(faltantes, batch_size=500)
+            if faltantes:
+                # Filas nuevas con stock 0: entran al índice de alertas
+                from .stock_alerts import sincronizar_alertas
+
+                sincronizar_alertas(
+                    proyecto_material_ids=[pm.pk for pm in faltantes if pm.pk]
+                )
+            Project.objects.bulk_update(
+                proyectos_cambiados, ["gasto_materiales"], batch_size=500
+            )
+
+    return desviacion
@@ -0,0 +1,186 @@
+"""
+Paginación del listado de proyectos (``project_list``).
+
+El listado agrupado por estado trae la página de todos los grupos en una
+sola consulta: ``ROW_NUMBER()`` particionado por estado y ordenado por fecha
+de creación deja en cada grupo solo ``PAGE_SIZE`` proyectos después de su
+cursor. La paginación es por llave (fecha de creación e id del último
+proyecto mostrado), así que la página 100 cuesta lo mismo que la primera.
+Los totales por estado salen de una consulta agrupada aparte.
+
+Los filtros del listado se normalizan con ``filtros_lista`` y se aplican con
+``filtrar_proyectos``; los conteos por faceta (``projects.facets``) usan los
+mismos.
+"""
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils.dateparse import parse_datetime
+
+from .search import buscar_proyectos
+
+PAGE_SIZE = 24
+
+# Orden en que se muestran los grupos
+ESTADOS = ("en_proceso", "terminado", "futuro")
+
+# Rangos del filtro de trabajadores: valor del parámetro → (mínimo, máximo)
+RANGOS_TRABAJADORES = {"0": (0, 0), "1-3": (1, 3), "4-6": (4, 6), "7+": (7, None)}
+
+
+def _monto(valor):
+    """Presupuesto escrito con separadores de miles (``"1.000.000"``), o ``None``."""
+    try:
+        monto = float((valor or "").replace(".", "").replace(",", ""))
+    except ValueError:
+        return None
+    return monto if monto > 0 else None
+
+
+def filtros_lista(params):
+    """
+    Filtros del listado desde ``request.GET``, normalizados; los inválidos
+    quedan en ``None``. ``estado`` no incluye ``"todos"`` (es un modo de vista).
+    """
+    from .models import Project
+
+    def _texto(nombre):
+        return (params.get(nombre) or "").strip() or None
+
+    estado = _texto("status")
+    creador = _texto("creador")
+    trabajadores = _texto("trabajadores")
+    ciudad = (_texto("ciudad") or "").lower()
+    ciudades = {valor.lower() for valor, _ in Project.UBICACION_CHOICES}
+    return {
+        "search": _texto("search"),
+        "estado": estado if estado in ESTADOS else None,
+        "trabajadores": trabajadores if trabajadores in RANGOS_TRABAJADORES else None,
+        "creador": int(creador) if creador and creador.isdigit() else None,
+        "fecha_desde": _texto("fecha_desde"),
+        "fecha_hasta": _texto("fecha_hasta"),
+        "ubicacion": _texto("ubicacion"),
+        "ciudad": ciudad if ciudad in ciudades else None,
+        "presupuesto_min": _monto(params.get("presupuesto_min")),
+        "presupuesto_max": _monto(params.get("presupuesto_max")),
+    }
+
+
+def filtrar_proyectos(projects, filtros, excluir=()):
+    """
+    Aplica ``filtros`` (de ``filtros_lista``) salvo las claves en ``excluir``.
+    """
+    filtros = {clave: valor for clave, valor in filtros.items() if clave not in excluir}
+
+    # Búsqueda en nombre, descripción y ubicación (projects.search)
+    projects = buscar_proyectos(projects, filtros.get("search"))
+    if filtros.get("estado"):
+        projects = projects.filter(estado=filtros["estado"])
+    if filtros.get("trabajadores"):
+        # Conteo con una subconsulta agrupada
+        minimo, maximo = RANGOS_TRABAJADORES[filtros["trabajadores"]]
+        projects = projects.with_worker_count().filter(worker_count__gte=minimo)
+        if maximo is not None:
+            projects = projects.filter(worker_count__lte=maximo)
+    if filtros.get("creador"):
+        projects = projects.filter(creado_por_id=filtros["creador"])
+    if filtros.get("fecha_desde"):
+        projects = projects.filter(fecha_creacion__gte=filtros["fecha_desde"])
+    if filtros.get("fecha_hasta"):
+        projects = projects.filter(fecha_creacion__lte=filtros["fecha_hasta"])
+    if filtros.get("ubicacion"):
+        # Búsqueda de texto en la dirección
+        projects = projects.filter(location_address__icontains=filtros["ubicacion"])
+    if filtros.get("ciudad"):
+        # Ciudad del cuestionario (la que cuenta la faceta de ubicación); hay
+        # filas guardadas en minúsculas (el default del campo es "medellin")
+        projects = projects.filter(ubicacion_proyecto__iexact=filtros["ciudad"])
+    if filtros.get("presupuesto_min"):
+        projects = projects.filter(presupuesto__gte=filtros["presupuesto_min"])
+    if filtros.get("presupuesto_max"):
+        projects = projects.filter(presupuesto__lte=filtros["presupuesto_max"])
+    return projects
+
+
+def codificar_cursor(project):
+    """Cursor que apunta justo después de ``project``."""
+    return f"{project.fecha_creacion.isoformat()}_{project.pk}"
+
+
+def decodificar_cursor(valor):
+    """``(fecha_creacion, id)`` desde un cursor, o ``None`` si es inválido."""
+    fecha, _, pk = (valor or "").rpartition("_")
+    try:
+        fecha = parse_datetime(fecha)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if fecha is None:
+        return None
+    return fecha, pk
+
+
+def despues_de(cursor, ascendente=False):
+    """Filtro de los proyectos que siguen al cursor en el orden del listado."""
+    fecha, pk = cursor
+    if ascendente:
+        return Q(fecha_creacion__gt=fecha) | Q(fecha_creacion=fecha, id__gt=pk)
+    return Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=pk)
+
+
+def _orden(ascendente):
+    if ascendente:
+        return [F("fecha_creacion").asc(), F("id").asc()]
+    return [F("fecha_creacion").desc(), F("id").desc()]
+
+
+def _cortar(proyectos, tamano):
+    """``(página, cursor de la siguiente o None)`` desde ``tamano + 1`` filas."""
+    if len(proyectos) > tamano:
+        return proyectos[:tamano], codificar_cursor(proyectos[tamano - 1])
+    return proyectos, None
+
+
+def pagina_por_estado(projects, cursores, tamano=PAGE_SIZE):
+    """
+    Página de cada grupo de estado en una consulta.
+
+    ``cursores`` es ``{estado: cursor decodificado}``; devuelve
+    ``{estado: (proyectos, siguiente_cursor)}`` para todos los ``ESTADOS``.
+    """
+    condicion = Q()
+    for estado in ESTADOS:
+        grupo = Q(estado=estado)
+        if cursores.get(estado):
+            grupo &= despues_de(cursores[estado])
+        condicion |= grupo
+
+    filas = (
+        projects.filter(condicion)
+        .for_list()
+        .annotate(
+            fila=Window(RowNumber(), partition_by=F("estado"), order_by=_orden(False))
+        )
+        .filter(fila__lte=tamano + 1)
+        .order_by("estado", *_orden(False))
+    )
+
+    grupos = {estado: [] for estado in ESTADOS}
+    for project in filas:
+        grupos[project.estado].append(project)
+    return {estado: _cortar(proyectos, tamano) for estado, proyectos in grupos.items()}
+
+
+def pagina_cronologica(projects, cursor=None, ascendente=False, tamano=PAGE_SIZE):
+    """``(proyectos, siguiente_cursor)`` del listado de todos los estados."""
+    if cursor:
+        projects = projects.filter(despues_de(cursor, ascendente))
+    proyectos = list(projects.for_list().order_by(*_orden(ascendente))[: tamano + 1])
+    return _cortar(proyectos, tamano)
+
+
+def totales_por_estado(projects):
+    """``{estado: total}`` con una consulta agrupada."""
+    totales = dict.fromkeys(ESTADOS, 0)
+    for fila in projects.order_by().values("estado").annotate(total=Count("id")):
+        totales[fila["estado"]] = fila["total"]
+    return totales
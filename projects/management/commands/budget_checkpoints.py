@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from projects.budget_history import crear_checkpoint, proyectos_con_cambios
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda un punto de control del presupuesto detallado de los proyectos "
+        "con cambios desde el último (pensado para ejecutarse periódicamente)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-cambios",
+            type=int,
+            default=1,
+            help="Cambios mínimos desde el último punto de control",
+        )
+        parser.add_argument(
+            "--project-id",
+            type=int,
+            action="append",
+            help="Limitar a uno o varios proyectos (se puede repetir)",
+        )
+
+    def handle(self, *args, **options):
+        proyectos = proyectos_con_cambios(options["min_cambios"])
+        if options.get("project_id"):
+            proyectos = proyectos.filter(pk__in=options["project_id"])
+
+        creados = 0
+        for project in proyectos.order_by("pk").only("id", "name"):
+            checkpoint = crear_checkpoint(project.pk)
+            creados += 1
+            self.stdout.write(
+                f'   Proyecto "{project.name}" (ID: {project.pk}): '
+                f"{project.cambios_pendientes} cambios, ${checkpoint.total:,.0f}"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"🎉 {creados} puntos de control creados")
+        )
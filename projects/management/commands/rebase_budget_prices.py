@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+
+from projects.rebasing import rebase_budget_prices
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza el presupuesto detallado de los proyectos no terminados "
+        "con los precios vigentes de los ítems y recalcula su presupuesto"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project-id",
+            type=int,
+            action="append",
+            help="Limitar a uno o varios proyectos (se puede repetir)",
+        )
+        parser.add_argument(
+            "--item-id",
+            type=int,
+            action="append",
+            help="Limitar a uno o varios ítems de presupuesto (se puede repetir)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo reportar la diferencia por proyecto, sin guardar",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Filas por lote de actualización",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        resultado = rebase_budget_prices(
+            project_ids=options.get("project_id"),
+            budget_item_ids=options.get("item_id"),
+            dry_run=dry_run,
+            batch_size=options["batch_size"],
+        )
+
+        if not resultado:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "✅ Todos los proyectos abiertos tienen los precios vigentes"
+                )
+            )
+            return
+
+        total_delta = 0
+        for project_id, name, actual, nuevo in resultado:
+            delta = nuevo - actual
+            total_delta += delta
+            self.stdout.write(
+                f'   Proyecto "{name}" (ID: {project_id}): '
+                f"${actual:,.0f} → ${nuevo:,.0f} ({delta:+,.0f})"
+            )
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"🔍 {len(resultado)} proyectos cambiarían, diferencia total "
+                    f"${total_delta:+,.0f} (sin cambios, --dry-run)"
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"🎉 {len(resultado)} proyectos re-valorados, diferencia total "
+                    f"${total_delta:+,.0f}"
+                )
+            )
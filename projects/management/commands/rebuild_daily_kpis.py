@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from projects.rollup import rebuild_daily_kpis
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el resumen diario de compras y consumos por proyecto "
+        "desde los movimientos de materiales"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project-id",
+            type=int,
+            action="append",
+            help="Limitar a uno o varios proyectos (se puede repetir)",
+        )
+
+    def handle(self, *args, **options):
+        filas = rebuild_daily_kpis(project_ids=options.get("project_id"))
+        self.stdout.write(
+            self.style.SUCCESS(f"🎉 Resumen diario reconstruido: {filas} filas")
+        )
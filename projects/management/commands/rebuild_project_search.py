@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from projects.search import rebuild_search_vectors, usa_busqueda_completa
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el vector de búsqueda (nombre, dirección y descripción) "
+        "de todos los proyectos. Solo aplica en PostgreSQL"
+    )
+
+    def handle(self, *args, **options):
+        if not usa_busqueda_completa():
+            self.stdout.write(
+                self.style.WARNING(
+                    "⚠️ La base de datos no es PostgreSQL: se usa búsqueda simple"
+                )
+            )
+            return
+        total = rebuild_search_vectors()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🎉 Vectores de búsqueda recalculados: {total} proyectos"
+            )
+        )
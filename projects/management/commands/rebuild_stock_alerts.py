@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from projects.stock_alerts import rebuild_stock_alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice de alertas de stock bajo (global y por proyecto) "
+        "con los umbrales de settings.STOCK_ALERTAS"
+    )
+
+    def handle(self, *args, **options):
+        globales, por_proyecto = rebuild_stock_alerts()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🎉 Alertas de stock reconstruidas: {globales} globales, "
+                f"{por_proyecto} por proyecto"
+            )
+        )
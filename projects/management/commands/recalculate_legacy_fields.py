@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 from projects.models import Project
 
 
@@ -16,6 +17,12 @@ class Command(BaseCommand):
             action="store_true",
             help="Forzar recálculo incluso si los campos ya tienen valores",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Proyectos por lote de escritura (bulk_update)",
+        )
 
     def handle(self, *args, **options):
         project_id = options.get("project_id")
@@ -46,22 +53,16 @@ class Command(BaseCommand):
                 )
                 return
 
+            if not force:
+                # Omitir los que ya tienen valores calculados
+                projects = projects.exclude(self.already_calculated())
+
             self.stdout.write(f"🔄 Recalculando {total_projects} proyectos...")
 
-            updated_count = 0
-            for project in projects:
-                try:
-                    self.recalculate_project(project, force)
-                    updated_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(f"✅ {project.name} (ID: {project.id}) - OK")
-                    )
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f"❌ {project.name} (ID: {project.id}) - Error: {str(e)}"
-                        )
-                    )
+            # Una consulta agrupada para los totales y bulk_update por lotes
+            updated_count = projects.recalculate_budgets(
+                legacy_fields=True, batch_size=options["batch_size"]
+            )
 
             self.stdout.write(
                 self.style.SUCCESS(
@@ -69,25 +70,15 @@ class Command(BaseCommand):
                 )
             )
 
+    def already_calculated(self):
+        """Condición de proyectos que ya tienen los campos heredados"""
+        return Q(walls_area__gt=0, windows_area__gt=0, doors_count__gt=0)
+
     def recalculate_project(self, project, force=False):
         """Recalcula campos heredados de un proyecto específico"""
+        projects = Project.objects.filter(pk=project.pk)
         if not force:
             # Verificar si ya tiene valores calculados
-            if (
-                project.walls_area
-                and project.walls_area > 0
-                and project.windows_area
-                and project.windows_area > 0
-                and project.doors_count
-                and project.doors_count > 0
-            ):
-                return
-
-        # Calcular campos heredados
-        project.calculate_legacy_fields()
-
-        # Calcular presupuesto actualizado
-        project.presupuesto = project.calculate_detailed_budget()
+            projects = projects.exclude(self.already_calculated())
 
-        # Guardar cambios
-        project.save()
+        projects.recalculate_budgets(legacy_fields=True)
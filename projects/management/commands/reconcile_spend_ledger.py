@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from projects.ledger import rebuild_spend_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el libro de gasto en materiales desde las entradas "
+        "y reporta las diferencias encontradas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project-id",
+            type=int,
+            action="append",
+            help="Limitar a uno o varios proyectos (se puede repetir)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo reportar las diferencias, sin corregirlas",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        desviacion = rebuild_spend_ledger(
+            project_ids=options.get("project_id"), dry_run=dry_run
+        )
+
+        for project_id, guardado, real in desviacion["proyectos"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"⚠️ Proyecto {project_id}: libro ${guardado:,.2f} "
+                    f"→ real ${real:,.2f} (diferencia ${real - guardado:,.2f})"
+                )
+            )
+        for project_id, material_id, guardado, real in desviacion["materiales"]:
+            self.stdout.write(
+                f"   Proyecto {project_id} / material {material_id}: "
+                f"${guardado:,.2f} → ${real:,.2f}"
+            )
+
+        total = len(desviacion["proyectos"])
+        if total == 0 and not desviacion["materiales"]:
+            self.stdout.write(self.style.SUCCESS("✅ El libro de gasto está al día"))
+        elif dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"🔍 {total} proyectos con diferencias (sin cambios, --dry-run)"
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"🎉 {total} proyectos corregidos")
+            )
@@ -0,0 +1,170 @@
+"""
+Autocompletado de materiales.
+
+``search_materials`` se consulta en cada tecla de los formularios de compra
+y consumo. En lugar de ir a la base de datos se responde con un índice de
+prefijos en memoria del proceso (``MaterialIndex``): el SKU y las palabras
+del nombre normalizadas (minúsculas y sin tildes), ordenadas para buscar
+cada prefijo con bisección. Se construye con una consulta la primera vez y
+se reconstruye en la siguiente lectura después de que un material o una
+unidad se guarda o elimina (ver ``projects.signals``), o cuando la copia
+caduca (``versioning.MAX_EDAD_LOCAL``).
+
+``buscar_materiales`` es la búsqueda en base de datos (listado del
+catálogo): en PostgreSQL usa los índices trigram de nombre y SKU
+(``catalog/migrations/0010_material_trigram``) y ordena por similitud.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from heapq import nsmallest
+from typing import NamedTuple
+
+from django.db import connections
+from django.db.models import Q
+
+from .versioning import CopiaLocal, bump_version
+
+VERSION_KEY = "material_index"
+LIMITE = 20
+
+_TERMINO = re.compile(r"\w+")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: ``"Adoquín"`` → ``"adoquin"``."""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def terminos(texto):
+    """Palabras normalizadas de ``texto``."""
+    return _TERMINO.findall(normalizar(texto))
+
+
+class MaterialIndex(NamedTuple):
+    """Materiales y sus claves de búsqueda, ya ordenadas."""
+
+    version: int
+    # ({"id", "sku", "name", "unit", "unit_name"}, ...) en orden alfabético
+    materiales: tuple
+    # (sku, nombre) normalizados de cada material, para ordenar resultados
+    normalizados: tuple
+    # Claves ordenadas y, alineado, el índice del material de cada una
+    claves: tuple
+    posiciones: tuple
+
+    def _coincidencias(self, prefijo):
+        """Posiciones de los materiales con alguna clave que empieza por ``prefijo``."""
+        inicio = bisect_left(self.claves, prefijo)
+        fin = bisect_left(self.claves, prefijo + "\uffff", inicio)
+        return set(self.posiciones[inicio:fin])
+
+    def buscar(self, texto, limite=LIMITE):
+        """
+        Materiales en los que cada palabra de ``texto`` es prefijo de alguna
+        palabra del nombre o del SKU. Primero el SKU exacto, luego los que
+        empiezan por el texto buscado, luego el resto; en orden alfabético
+        dentro de cada grupo.
+        """
+        palabras = terminos(texto)
+        if not palabras:
+            return []
+
+        # Empezar por la palabra más larga: suele dejar menos candidatos
+        palabras.sort(key=len, reverse=True)
+        candidatos = self._coincidencias(palabras[0])
+        for palabra in palabras[1:]:
+            if not candidatos:
+                break
+            candidatos &= self._coincidencias(palabra)
+
+        buscado = normalizar(texto).strip()
+
+        def orden(posicion):
+            sku, nombre = self.normalizados[posicion]
+            return (
+                sku != buscado,
+                not (sku.startswith(buscado) or nombre.startswith(buscado)),
+                posicion,
+            )
+
+        return [self.materiales[p] for p in nsmallest(limite, candidatos, key=orden)]
+
+
+def compilar_indice(filas, version=0):
+    """
+    Construye el índice desde ``(id, sku, name, unit_symbol, unit_name)``
+    ordenadas por nombre.
+    """
+    materiales = []
+    normalizados = []
+    pares = []
+    for posicion, (material_id, sku, name, unit, unit_name) in enumerate(filas):
+        materiales.append({
+            "id": material_id,
+            "sku": sku,
+            "name": name,
+            "unit": unit,
+            "unit_name": unit_name,
+        })
+        normalizados.append((normalizar(sku), normalizar(name)))
+        claves = {normalizar(sku)} | set(terminos(sku)) | set(terminos(name))
+        pares.extend((clave, posicion) for clave in claves)
+    pares.sort()
+    return MaterialIndex(
+        version=version,
+        materiales=tuple(materiales),
+        normalizados=tuple(normalizados),
+        claves=tuple(clave for clave, _ in pares),
+        posiciones=tuple(posicion for _, posicion in pares),
+    )
+
+
+_copia = CopiaLocal(VERSION_KEY)
+
+
+def _leer(version):
+    from catalog.models import Material
+
+    filas = Material.objects.order_by("name", "id").values_list(
+        "id", "sku", "name", "unit__symbol", "unit__name"
+    )
+    return compilar_indice(filas, version=version)
+
+
+def get_material_index():
+    """
+    Devuelve el índice vigente.
+
+    Solo consulta la BD cuando la versión cambió o la copia caducó.
+    """
+    return _copia.get(_leer)
+
+
+def invalidate_material_index():
+    """Marca el índice como obsoleto; se reconstruye en la próxima lectura."""
+    bump_version(VERSION_KEY)
+
+
+def buscar_materiales(materiales, texto):
+    """
+    Filtra ``materiales`` por nombre o SKU. En PostgreSQL la coincidencia
+    usa los índices trigram y el resultado se ordena por similitud.
+    """
+    texto = (texto or "").strip()
+    if not texto:
+        return materiales
+
+    materiales = materiales.filter(Q(name__icontains=texto) | Q(sku__icontains=texto))
+    if connections[materiales.db].vendor != "postgresql":
+        return materiales
+
+    from django.contrib.postgres.search import TrigramSimilarity
+    from django.db.models.functions import Greatest
+
+    return materiales.annotate(
+        similitud=Greatest(
+            TrigramSimilarity("name", texto), TrigramSimilarity("sku", texto)
+        )
+    ).order_by("-similitud", "name")
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.5 on 2026-10-17 20:48
+
+from django.db import migrations, models
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce
+
+
+def poblar_libro_de_gasto(apps, schema_editor):
+    """Calcula el gasto acumulado inicial a partir de las entradas existentes"""
+    EntradaMaterial = apps.get_model("projects", "EntradaMaterial")
+    Project = apps.get_model("projects", "Project")
+    ProyectoMaterial = apps.get_model("projects", "ProyectoMaterial")
+    MaterialSupplier = apps.get_model("catalog", "MaterialSupplier")
+
+    money = DecimalField(max_digits=15, decimal_places=2)
+    supplier_price = MaterialSupplier.objects.filter(
+        material_id=OuterRef("material_id"),
+        supplier_id=OuterRef("proveedor_id"),
+    ).values("price")[:1]
+    entradas = EntradaMaterial.objects.annotate(
+        precio_unitario=Coalesce(
+            Subquery(supplier_price), F("material__unit_cost"), output_field=money
+        ),
+        costo=ExpressionWrapper(
+            F("cantidad") * F("precio_unitario"), output_field=money
+        ),
+    )
+
+    por_proyecto = {}
+    for row in (
+        entradas.values("proyecto_id", "material_id")
+        .annotate(total=Sum("costo"))
+        .order_by()
+    ):
+        total = row["total"] or 0
+        ProyectoMaterial.objects.filter(
+            proyecto_id=row["proyecto_id"], material_id=row["material_id"]
+        ).update(gasto_acumulado=total)
+        por_proyecto[row["proyecto_id"]] = por_proyecto.get(row["proyecto_id"], 0) + total
+
+    for proyecto_id, total in por_proyecto.items():
+        Project.objects.filter(pk=proyecto_id).update(gasto_materiales=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0023_worker_arl_worker_blood_type_and_more"),
+        ("catalog", "0009_category_and_migrate_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="gasto_materiales",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=15,
+                verbose_name="Gasto acumulado en materiales",
+            ),
+        ),
+        migrations.AddField(
+            model_name="proyectomaterial",
+            name="gasto_acumulado",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=15,
+                verbose_name="Gasto acumulado en el proyecto",
+            ),
+        ),
+        migrations.RunPython(poblar_libro_de_gasto, migrations.RunPython.noop),
+    ]
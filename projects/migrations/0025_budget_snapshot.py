@@ -0,0 +1,121 @@
+# Generated by Django 5.2.5 on 2026-10-17 20:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0024_spend_ledger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectBudgetSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "administration_percentage",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Porcentaje con el que se calculó la administración automática",
+                        max_digits=5,
+                    ),
+                ),
+                (
+                    "costo_directo",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "administracion_manual",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "administracion_automatica",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "items_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Ítems configurados"
+                    ),
+                ),
+                ("fecha_actualizacion", models.DateTimeField(auto_now=True)),
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="budget_snapshot",
+                        to="projects.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Resumen de Presupuesto del Proyecto",
+                "verbose_name_plural": "Resúmenes de Presupuesto del Proyecto",
+            },
+        ),
+        migrations.CreateModel(
+            name="ProjectBudgetSectionTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "items_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Ítems configurados"
+                    ),
+                ),
+                ("items_con_cantidad", models.PositiveIntegerField(default=0)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="budget_section_totals",
+                        to="projects.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+                (
+                    "section",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="project_totals",
+                        to="projects.budgetsection",
+                        verbose_name="Sección",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Total de Sección del Proyecto",
+                "verbose_name_plural": "Totales de Sección del Proyecto",
+                "unique_together": {("project", "section")},
+            },
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def crear_checkpoints_iniciales(apps, schema_editor):
+    """Punto de control inicial con el presupuesto actual de cada proyecto"""
+    from decimal import Decimal
+    from django.utils import timezone
+
+    ProjectBudgetItem = apps.get_model("projects", "ProjectBudgetItem")
+    ProjectBudgetCheckpoint = apps.get_model("projects", "ProjectBudgetCheckpoint")
+
+    items_por_proyecto = {}
+    for project_id, budget_item_id, quantity, unit_price, total_price in (
+        ProjectBudgetItem.objects.values_list(
+            "project_id", "budget_item_id", "quantity", "unit_price", "total_price"
+        ).iterator()
+    ):
+        items_por_proyecto.setdefault(project_id, {})[str(budget_item_id)] = [
+            str(quantity), str(unit_price), str(total_price)
+        ]
+
+    ahora = timezone.now()
+    ProjectBudgetCheckpoint.objects.bulk_create(
+        [
+            ProjectBudgetCheckpoint(
+                project_id=project_id,
+                fecha=ahora,
+                items=items,
+                total=sum((Decimal(v[2]) for v in items.values()), Decimal("0")),
+            )
+            for project_id, items in items_por_proyecto.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0025_budget_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectBudgetChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=12),
+                ),
+                (
+                    "unit_price",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "total_price",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                ("eliminado", models.BooleanField(default=False)),
+                ("fecha", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "budget_item",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="projects.budgetitem",
+                        verbose_name="Ítem de Presupuesto",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="budget_changes",
+                        to="projects.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cambio de Presupuesto",
+                "verbose_name_plural": "Cambios de Presupuesto",
+                "indexes": [
+                    models.Index(
+                        fields=["project", "fecha"],
+                        name="projects_pr_project_b44c12_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProjectBudgetCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fecha", models.DateTimeField(default=django.utils.timezone.now)),
+                ("ultimo_cambio_id", models.PositiveBigIntegerField(default=0)),
+                ("items", models.JSONField(default=dict)),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="budget_checkpoints",
+                        to="projects.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Punto de Control de Presupuesto",
+                "verbose_name_plural": "Puntos de Control de Presupuesto",
+                "indexes": [
+                    models.Index(
+                        fields=["project", "fecha"],
+                        name="projects_pr_project_b2bd9c_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(crear_checkpoints_iniciales, migrations.RunPython.noop),
+    ]
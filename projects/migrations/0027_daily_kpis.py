@@ -0,0 +1,127 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce
+
+
+def poblar_resumen_diario(apps, schema_editor):
+    """Construye el resumen diario inicial desde las compras y consumos existentes"""
+    EntradaMaterial = apps.get_model("projects", "EntradaMaterial")
+    ConsumoMaterial = apps.get_model("projects", "ConsumoMaterial")
+    ProjectDailyKpi = apps.get_model("projects", "ProjectDailyKpi")
+    MaterialSupplier = apps.get_model("catalog", "MaterialSupplier")
+
+    money = DecimalField(max_digits=15, decimal_places=2)
+    supplier_price = MaterialSupplier.objects.filter(
+        material_id=OuterRef("material_id"),
+        supplier_id=OuterRef("proveedor_id"),
+    ).values("price")[:1]
+    entradas = EntradaMaterial.objects.annotate(
+        precio_unitario=Coalesce(
+            Subquery(supplier_price), F("material__unit_cost"), output_field=money
+        ),
+        costo=ExpressionWrapper(
+            F("cantidad") * F("precio_unitario"), output_field=money
+        ),
+    )
+
+    resumen = {}
+    for row in (
+        entradas.values("proyecto_id", "fecha_ingreso")
+        .annotate(costo=Sum("costo"), cantidad=Sum("cantidad"))
+        .order_by()
+    ):
+        kpi = resumen.setdefault(
+            (row["proyecto_id"], row["fecha_ingreso"]),
+            ProjectDailyKpi(proyecto_id=row["proyecto_id"], fecha=row["fecha_ingreso"]),
+        )
+        kpi.costo_compras = row["costo"] or 0
+        kpi.cantidad_compras = row["cantidad"] or 0
+
+    for row in (
+        ConsumoMaterial.objects.values("proyecto_id", "fecha_consumo")
+        .annotate(
+            costo=Sum(ExpressionWrapper(
+                F("cantidad_consumida") * F("material__unit_cost"), output_field=money
+            )),
+            cantidad=Sum("cantidad_consumida"),
+        )
+        .order_by()
+    ):
+        kpi = resumen.setdefault(
+            (row["proyecto_id"], row["fecha_consumo"]),
+            ProjectDailyKpi(proyecto_id=row["proyecto_id"], fecha=row["fecha_consumo"]),
+        )
+        kpi.costo_consumos = row["costo"] or 0
+        kpi.cantidad_consumida = row["cantidad"] or 0
+
+    ProjectDailyKpi.objects.bulk_create(resumen.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0026_budget_history"),
+        ("catalog", "0009_category_and_migrate_data"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectDailyKpi",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fecha", models.DateField()),
+                (
+                    "costo_compras",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "cantidad_compras",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                (
+                    "costo_consumos",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "cantidad_consumida",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                (
+                    "proyecto",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="kpis_diarios",
+                        to="projects.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "KPI Diario del Proyecto",
+                "verbose_name_plural": "KPIs Diarios del Proyecto",
+                "indexes": [
+                    models.Index(fields=["fecha"], name="projects_pr_fecha_e7f1f5_idx")
+                ],
+                "unique_together": {("proyecto", "fecha")},
+            },
+        ),
+        migrations.RunPython(poblar_resumen_diario, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:15
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def poblar_alertas(apps, schema_editor):
+    """Construye el índice inicial de alertas desde el stock actual"""
+    Material = apps.get_model("catalog", "Material")
+    ProyectoMaterial = apps.get_model("projects", "ProyectoMaterial")
+    AlertaStock = apps.get_model("projects", "AlertaStock")
+
+    config = getattr(settings, "STOCK_ALERTAS", {})
+    porcentaje = Decimal(str(config.get("PORCENTAJE_PRESENTACION", 10)))
+    minimo = Decimal(str(config.get("STOCK_PROYECTO_MINIMO", 10)))
+
+    alertas = [
+        AlertaStock(material_id=material_id)
+        for material_id in Material.objects.filter(
+            stock__lte=F("presentation_qty") * porcentaje / Decimal("100")
+        ).values_list("id", flat=True)
+    ]
+    alertas += [
+        AlertaStock(proyecto_material_id=pk, proyecto_id=proyecto_id, material_id=material_id)
+        for pk, proyecto_id, material_id in ProyectoMaterial.objects.filter(
+            stock_proyecto__lt=minimo
+        ).values_list("id", "proyecto_id", "material_id")
+    ]
+    AlertaStock.objects.bulk_create(alertas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_category_and_migrate_data"),
+        ("projects", "0027_daily_kpis"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertaStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fecha", models.DateTimeField(auto_now_add=True)),
+                (
+                    "material",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alertas_stock",
+                        to="catalog.material",
+                        verbose_name="Material",
+                    ),
+                ),
+                (
+                    "proyecto",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alertas_stock",
+                        to="projects.project",
+                        verbose_name="Proyecto",
+                    ),
+                ),
+                (
+                    "proyecto_material",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alerta_stock",
+                        to="projects.proyectomaterial",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Alerta de Stock",
+                "verbose_name_plural": "Alertas de Stock",
+                "indexes": [
+                    models.Index(
+                        fields=["proyecto", "fecha"],
+                        name="projects_al_proyect_19766b_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("proyecto__isnull", True)),
+                        fields=("material",),
+                        name="alerta_stock_global_unica",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(poblar_alertas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0028_stock_alerts"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["estado", "-fecha_creacion", "-id"],
+                name="project_estado_fecha_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["fecha_creacion", "id"], name="project_fecha_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:20
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+CREAR_BUSQUEDA = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'spanish_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION spanish_unaccent (COPY = spanish);
+        ALTER TEXT SEARCH CONFIGURATION spanish_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END
+$$;
+CREATE INDEX IF NOT EXISTS project_search_vector_idx
+    ON projects_project USING gin (search_vector);
+UPDATE projects_project SET search_vector =
+    setweight(to_tsvector('spanish_unaccent', coalesce(name, '')), 'A')
+    || setweight(to_tsvector('spanish_unaccent', coalesce(location_address, '')), 'B')
+    || setweight(to_tsvector('spanish_unaccent', coalesce(description, '')), 'C');
+"""
+
+BORRAR_BUSQUEDA = """
+DROP INDEX IF EXISTS project_search_vector_idx;
+DROP TEXT SEARCH CONFIGURATION IF EXISTS spanish_unaccent;
+"""
+
+
+def crear_busqueda(apps, schema_editor):
+    """Configuración en español sin tildes, índice GIN y vectores iniciales (solo PostgreSQL)"""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREAR_BUSQUEDA)
+
+
+def borrar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(BORRAR_BUSQUEDA)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0029_project_list_indexes"),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name="project",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(crear_busqueda, borrar_busqueda),
+    ]
@@ -1,10 +1,14 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings  # Para usar el modelo de usuario personalizado
 from django.core.validators import MinValueValidator, MaxValueValidator
 from catalog.models import Material, Supplier
 from django.db.models import F
 from django.db import transaction
-from django.db.models import Sum, F, DecimalField, ExpressionWrapper
+from django.db.models import Sum, Max, Q, Value
+from django.dispatch import Signal
+from decimal import Decimal
+from django.utils import timezone
 
 
 # MODELOS DE ROLES Y TRABAJADORES
@@ -139,6 +143,183 @@ class UnitPrice(models.Model):
         return f"{self.item_name} - ${self.price:,.0f}/{self.unit}"
 
 
+# Presupuesto mínimo razonable cuando el cálculo no arroja un valor positivo
+PRESUPUESTO_MINIMO = Decimal("1000000")
+
+# Orden de la sección "Administración" cargada manualmente en el presupuesto
+ORDEN_SECCION_ADMINISTRACION = 21
+
+# Campos que calcula Project.calculate_legacy_fields
+LEGACY_FIELDS = [
+    "area_construida_total",
+    "area_exterior_intervenir",
+    "columns_count",
+    "walls_area",
+    "windows_area",
+    "doors_count",
+    "doors_height",
+    "metros_mueble_cocina",
+    "area_adoquin",
+    "area_zonas_verdes",
+]
+
+# Enviada con ``project_ids`` tras escrituras en bloque que no emiten
+# post_save (``bulk_update``, ``update()``, upserts): los receptores de
+# ``projects.signals`` y ``dashboard.signals`` invalidan las cachés.
+proyectos_actualizados_en_bloque = Signal()
+
+
+class ProjectQuerySet(models.QuerySet):
+    """Operaciones en bloque sobre conjuntos de proyectos."""
+
+    def budget_totals(self):
+        """
+        Totales del presupuesto detallado de todos los proyectos del queryset
+        en una sola consulta agrupada sobre ProjectBudgetItem.
+
+        Devuelve ``{project_id: {"costo_directo", "administracion_manual",
+        "administracion_automatica"}}``; los proyectos sin ítems detallados no
+        aparecen en el diccionario.
+        """
+        es_admin = Q(budget_item__section__order=ORDEN_SECCION_ADMINISTRACION)
+
+        rows = (
+            ProjectBudgetItem.objects.filter(project__in=self.values("pk"))
+            .values("project_id")
+            .annotate(
+                costo_directo=Sum("total_price", filter=~es_admin),
+                administracion_manual=Sum("total_price", filter=es_admin),
+                # Constante dentro de cada grupo; se trae para no releer el proyecto
+                administration_percentage=Max("project__administration_percentage"),
+            )
+            .order_by()
+        )
+
+        totals = {}
+        for row in rows:
+            costo_directo = row["costo_directo"] or Decimal("0")
+            admin_percentage = row["administration_percentage"] / Decimal("100")
+            totals[row["project_id"]] = {
+                "costo_directo": costo_directo,
+                "administracion_manual": row["administracion_manual"] or Decimal("0"),
+                "administracion_automatica": costo_directo * admin_percentage,
+            }
+        return totals
+
+    def with_spend(self):
+        """
+        Anota ``gasto_calculado`` en cada proyecto: el gasto en materiales
+        (precio del proveedor con respaldo en ``Material.unit_cost``)
+        calculado con una subconsulta agrupada, sin consultas por proyecto.
+        """
+        from django.db.models import OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+        from .ledger import MONEY, costo_entradas
+
+        gasto = (
+            costo_entradas(EntradaMaterial.objects.filter(proyecto=OuterRef("pk")))
+            .order_by()
+            .values("proyecto")
+            .annotate(total=Sum("costo"))
+            .values("total")
+        )
+        return self.annotate(
+            gasto_calculado=Coalesce(
+                Subquery(gasto, output_field=MONEY), Value(Decimal("0")),
+                output_field=MONEY,
+            )
+        )
+
+    def with_worker_count(self):
+        """
+        Anota ``worker_count`` con una subconsulta agrupada sobre la tabla de
+        trabajadores asignados, sin agregar un JOIN ni GROUP BY a la consulta
+        de proyectos.
+        """
+        from django.db.models import Count, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+
+        asignados = (
+            Project.workers.through.objects.filter(project_id=OuterRef("pk"))
+            .order_by()
+            .values("project_id")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return self.annotate(worker_count=Coalesce(Subquery(asignados), 0))
+
+    def for_list(self):
+        """
+        Solo las columnas que muestran las tarjetas del listado de proyectos,
+        con el creador en el mismo JOIN y ``tiene_presupuesto_detallado``
+        anotado (en lugar de ``has_detailed_budget_items()`` por tarjeta).
+        """
+        from django.db.models import Exists, OuterRef
+
+        return (
+            self.select_related("creado_por")
+            .only(
+                "id", "name", "estado", "fecha_creacion", "location_address",
+                "ubicacion_proyecto", "numero_pisos", "presupuesto",
+                "imagen_proyecto", "created_by_ai", "area_construida_total",
+                "built_area", "creado_por__id", "creado_por__first_name",
+                "creado_por__last_name",
+            )
+            .annotate(
+                tiene_presupuesto_detallado=Exists(
+                    ProjectBudgetItem.objects.filter(project_id=OuterRef("pk"))
+                )
+            )
+        )
+
+    def recalculate_budgets(self, legacy_fields=False, batch_size=500):
+        """
+        Recalcula ``presupuesto`` para todos los proyectos del queryset.
+
+        Equivale a asignar ``calculate_final_budget()`` a cada proyecto, pero
+        con una consulta agrupada para los totales detallados y escrituras
+        por lotes con ``bulk_update`` en vez de un ``save()`` por proyecto.
+        Con ``legacy_fields=True`` también recalcula los campos heredados.
+
+        Devuelve el número de proyectos actualizados.
+        """
+        from django.utils import timezone
+
+        totals = self.budget_totals()
+        fields = ["presupuesto", "fecha_actualizacion"]
+        if legacy_fields:
+            fields += LEGACY_FIELDS
+
+        now = timezone.now()
+        updated = 0
+        batch = []
+        project_ids = []
+        with transaction.atomic():
+            for project in self.iterator(chunk_size=batch_size):
+                project_ids.append(project.pk)
+                if legacy_fields:
+                    project.calculate_legacy_fields()
+                project.presupuesto = project.final_budget_from_totals(
+                    totals.get(project.pk)
+                )
+                project.fecha_actualizacion = now
+                batch.append(project)
+                if len(batch) >= batch_size:
+                    self.model.objects.bulk_update(batch, fields)
+                    updated += len(batch)
+                    batch = []
+
+            if batch:
+                self.model.objects.bulk_update(batch, fields)
+                updated += len(batch)
+
+        if project_ids:
+            proyectos_actualizados_en_bloque.send(
+                sender=self.model, project_ids=project_ids
+            )
+        return updated
+
+
 class Project(models.Model):
     """
     Modelo Project - Configurado para PostgreSQL
@@ -365,34 +546,20 @@ class Project(models.Model):
     def presupuesto_actual(self):
         return self.presupuesto - self.presupuesto_gastado_calculado
 
+    # Gasto en materiales mantenido por EntradaMaterial.save/delete
+    # (ver projects.ledger); evita sumar todas las compras en cada lectura
+    gasto_materiales = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        verbose_name="Gasto acumulado en materiales",
+        default=0,
+        editable=False,
+    )
+
     @property
     def presupuesto_gastado_calculado(self):
-        from django.db.models import OuterRef, Subquery
-        from django.db.models.functions import Coalesce
-        from catalog.models import MaterialSupplier
-
-        supplier_price = MaterialSupplier.objects.filter(
-            material_id=OuterRef("material_id"),
-            supplier_id=OuterRef("proveedor_id")
-        ).values("price")[:1]
+        return self.gasto_materiales
 
-        total = (
-            EntradaMaterial.objects
-            .filter(proyecto=self)
-            .annotate(
-                precio_unitario=Coalesce(
-                    Subquery(supplier_price),
-                    F("material__unit_cost")
-                ),
-                costo=ExpressionWrapper(
-                    F("cantidad") * F("precio_unitario"),
-                    output_field=DecimalField(max_digits=15, decimal_places=2)
-                )
-            )
-            .aggregate(total=Sum("costo"))["total"]
-        )
-        return total or 0
-    
     # ===== NUEVOS CAMPOS DEL CUESTIONARIO DETALLADO =====
 
     # 1. Datos generales del proyecto
@@ -627,6 +794,13 @@ class Project(models.Model):
         verbose_name="Última actualización",
     )
 
+    # ===== BÚSQUEDA =====
+    # PostgreSQL: TSVECTOR con índice GIN - nombre, dirección y descripción en
+    # español y sin tildes (ver projects.search); vacío en otros motores
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
+
     # ===== CONFIGURACIÓN DEL MODELO =====
     class Meta:
         verbose_name = "Proyecto"
@@ -634,6 +808,14 @@ class Project(models.Model):
         ordering = [
             "-fecha_creacion"
         ]  # Ordena por fecha de creación descendente (más recientes primero)
+        indexes = [
+            # Páginas por llave del listado (projects.listing)
+            models.Index(
+                fields=["estado", "-fecha_creacion", "-id"],
+                name="project_estado_fecha_idx",
+            ),
+            models.Index(fields=["fecha_creacion", "id"], name="project_fecha_idx"),
+        ]
 
     def __str__(self):
         """Representación en string del proyecto (para admin y shell)"""
@@ -727,75 +909,15 @@ class Project(models.Model):
     def calculate_detailed_budget(self):
         """
         Calcula presupuesto detallado usando precios unitarios del admin
+
+        Los precios se leen de la tabla compilada en memoria
+        (``projects.pricing``), que solo se reconstruye cuando cambia un
+        UnitPrice; evaluar un proyecto no hace consultas.
         """
-        total = 0
+        from .pricing import get_pricing_table
 
         try:
-            # Obtener precios unitarios activos
-            precios = {
-                item.item_name: item.price
-                for item in UnitPrice.objects.filter(is_active=True)
-            }
-
-            # 1. Construcción básica por m²
-            if "construccion_m2" in precios:
-                total += float(self.area_construida_total) * float(
-                    precios["construccion_m2"]
-                )
-
-            # 2. Factores de ubicación
-            if self.ubicacion_proyecto == "bogota" and "factor_bogota" in precios:
-                total *= float(precios["factor_bogota"])
-            elif self.ubicacion_proyecto == "cali" and "factor_cali" in precios:
-                total *= float(precios["factor_cali"])
-
-            # 3. Factores de terreno
-            if self.tipo_terreno == "rocoso" and "factor_terreno_rocoso" in precios:
-                total *= float(precios["factor_terreno_rocoso"])
-            elif self.tipo_terreno == "blando" and "factor_terreno_blando" in precios:
-                total *= float(precios["factor_terreno_blando"])
-
-            # 4. Factores de acceso
-            if self.acceso_obra == "dificil" and "factor_acceso_dificil" in precios:
-                total *= float(precios["factor_acceso_dificil"])
-            elif self.acceso_obra == "medio" and "factor_acceso_medio" in precios:
-                total *= float(precios["factor_acceso_medio"])
-
-            # 5. Pisos adicionales
-            if self.numero_pisos == "2" and "factor_segundo_piso" in precios:
-                total *= float(precios["factor_segundo_piso"])
-            elif self.numero_pisos == "3_mas" and "factor_tres_pisos" in precios:
-                total *= float(precios["factor_tres_pisos"])
-
-            # 6. Acabados premium
-            if self.acabado_muros == "premium" and "factor_acabado_premium" in precios:
-                total *= float(precios["factor_acabado_premium"])
-
-            # 7. Elementos adicionales
-            if self.numero_banos > 1 and "bano_adicional" in precios:
-                total += (self.numero_banos - 1) * float(precios["bano_adicional"])
-
-            if self.metros_mueble_cocina > 0 and "mueble_cocina_ml" in precios:
-                total += float(self.metros_mueble_cocina) * float(
-                    precios["mueble_cocina_ml"]
-                )
-
-            # 8. Exteriores
-            if self.area_adoquin > 0 and "adoquin_m2" in precios:
-                total += float(self.area_adoquin) * float(precios["adoquin_m2"])
-
-            if self.area_zonas_verdes > 0 and "zonas_verdes_m2" in precios:
-                total += float(self.area_zonas_verdes) * float(
-                    precios["zonas_verdes_m2"]
-                )
-
-            # 9. Profesionales
-            if self.incluir_estudios_disenos and "estudios_disenos" in precios:
-                total += float(precios["estudios_disenos"])
-
-            if self.incluir_licencia_impuestos and "licencia_impuestos" in precios:
-                total += float(precios["licencia_impuestos"])
-
+            total = get_pricing_table().evaluate(self)
         except Exception as e:
             # Si hay error, usar cálculo básico
             total = (
@@ -818,31 +940,34 @@ class Project(models.Model):
         Si tiene ítems detallados, usa el cálculo detallado
         Si no, usa el cálculo tradicional
         """
-        from decimal import Decimal
-        from django.db.models import Sum, Q
-        from decimal import Decimal
+        # Los proyectos sin ítems detallados no aparecen en los totales
+        totals = type(self).objects.filter(pk=self.pk).budget_totals()
+        return self.final_budget_from_totals(totals.get(self.pk))
 
-        if self.has_detailed_budget_items():
-                # Cálculo detallado con ítems específicos
-                totals = self.budget_items.select_related('budget_item__section').aggregate(
-                    costo_directo=Sum('total_price', filter=~Q(budget_item__section__order=21)),
-                    administracion_manual=Sum('total_price', filter=Q(budget_item__section__order=21))
-                )
-                costo_directo = totals['costo_directo'] or Decimal('0')
-                administracion_manual = totals['administracion_manual'] or Decimal('0')
-                # Usar el porcentaje de administración del proyecto (default 12%)
-                admin_percentage = self.administration_percentage / Decimal('100')
-                administracion_automatica = costo_directo * admin_percentage
-                total = costo_directo + administracion_automatica + administracion_manual
+    def final_budget_from_totals(self, totals):
+        """
+        Combina los totales de ``ProjectQuerySet.budget_totals`` en el
+        presupuesto final. Sin totales (proyecto sin ítems detallados) usa el
+        cálculo tradicional por cuestionario.
+        """
+        if totals is not None:
+            # Administración automática según el porcentaje del proyecto
+            # (12% por defecto)
+            total = (
+                totals["costo_directo"]
+                + totals["administracion_automatica"]
+                + totals["administracion_manual"]
+            )
         else:
-                # Cálculo tradicional
-                total = self.calculate_detailed_budget()
+            # Cálculo tradicional
+            total = self.calculate_detailed_budget()
 
-            # Aseguramos un mínimo razonable
+        # Aseguramos un mínimo razonable
         if not total or total <= 0:
-                total = Decimal('1000000')
+            total = PRESUPUESTO_MINIMO
 
         return total
+
  #Modelos de proveeddores entradas y materiales
 
 class EntradaMaterial(models.Model):
@@ -883,8 +1008,14 @@ class EntradaMaterial(models.Model):
         Cuando se crea o edita una entrada:
         - Si es nueva: aumenta stock
         - Si se edita: ajusta stock en base a la diferencia
+        - En ambos casos actualiza el libro de gasto (projects.ledger) y las
+          alertas de stock bajo (projects.stock_alerts)
         """
+        from .ledger import aplicar_gasto, costo_entrada
+        from .stock_alerts import sincronizar_alertas
+
         with transaction.atomic():
+            old = None
             if self.pk:  
                 # Si ya existe, calculamos la diferencia
                 old = EntradaMaterial.objects.get(pk=self.pk)
@@ -908,12 +1039,30 @@ class EntradaMaterial(models.Model):
                     defaults={"stock_proyecto": 0}
                 )
                 pm.stock_proyecto = F("stock_proyecto") + diferencia
-                pm.save()
+                pm.save(update_fields=["stock_proyecto"])
+
+                sincronizar_alertas([self.material_id], [pm.pk])
+
+            # Libro de gasto: retirar el costo anterior y sumar el nuevo
+            if old is not None:
+                aplicar_gasto(
+                    old.proyecto_id,
+                    old.material_id,
+                    -costo_entrada(old.material_id, old.proveedor_id, old.cantidad),
+                )
+            aplicar_gasto(
+                self.proyecto_id,
+                self.material_id,
+                costo_entrada(self.material_id, self.proveedor_id, self.cantidad),
+            )
 
     def delete(self, *args, **kwargs):
         """
-        Al eliminar una entrada de material, descontar del stock
+        Al eliminar una entrada de material, descontar del stock y del gasto
         """
+        from .ledger import aplicar_gasto, costo_entrada
+        from .stock_alerts import sincronizar_alertas
+
         with transaction.atomic():
             # Descontar del stock global
             Material.objects.filter(pk=self.material.pk).update(
@@ -921,17 +1070,28 @@ class EntradaMaterial(models.Model):
             )
 
             # Descontar del stock del proyecto
+            pm_ids = []
             try:
                 pm = ProyectoMaterial.objects.select_for_update().get(
                     proyecto=self.proyecto,
                     material=self.material
                 )
                 pm.stock_proyecto = F("stock_proyecto") - self.cantidad
-                pm.save()
+                pm.save(update_fields=["stock_proyecto"])
                 pm.refresh_from_db()
+                pm_ids.append(pm.pk)
             except ProyectoMaterial.DoesNotExist:
                 pass  # Si no existe la relación, solo eliminar la entrada
 
+            sincronizar_alertas([self.material_id], pm_ids)
+
+            # Descontar del libro de gasto
+            aplicar_gasto(
+                self.proyecto_id,
+                self.material_id,
+                -costo_entrada(self.material_id, self.proveedor_id, self.cantidad),
+            )
+
             # Eliminar la entrada
             super().delete(*args, **kwargs)
 
@@ -955,6 +1115,13 @@ class ProyectoMaterial(models.Model):
         default=0,
         validators=[MinValueValidator(0)]
     )
+    gasto_acumulado = models.DecimalField(
+        "Gasto acumulado en el proyecto",
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         unique_together = ("proyecto", "material")
@@ -1102,9 +1269,12 @@ class ConsumoMaterial(models.Model):
 
                 # Descontar del stock del proyecto
                 pm.stock_proyecto = F("stock_proyecto") - diferencia
-                pm.save()
+                pm.save(update_fields=["stock_proyecto"])
                 pm.refresh_from_db()
 
+                from .stock_alerts import sincronizar_alertas
+                sincronizar_alertas(proyecto_material_ids=[pm.pk])
+
             except ProyectoMaterial.DoesNotExist:
                 from django.core.exceptions import ValidationError
                 raise ValidationError(
@@ -1125,9 +1295,12 @@ class ConsumoMaterial(models.Model):
 
                 # Restaurar el stock del proyecto
                 pm.stock_proyecto = F("stock_proyecto") + self.cantidad_consumida
-                pm.save()
+                pm.save(update_fields=["stock_proyecto"])
                 pm.refresh_from_db()
 
+                from .stock_alerts import sincronizar_alertas
+                sincronizar_alertas(proyecto_material_ids=[pm.pk])
+
                 # Eliminar el consumo
                 super().delete(*args, **kwargs)
 
@@ -1267,6 +1440,244 @@ class ProjectBudgetItem(models.Model):
         # Calcular total_price
         self.total_price = self.quantity * self.unit_price
         super().save(*args, **kwargs)
+
+        from .budget_history import registrar_cambios
+        from .snapshots import marcar_seccion
+        registrar_cambios([self])
+        marcar_seccion(self.project_id, self.budget_item.section_id)
+
+    def delete(self, *args, **kwargs):
+        from .budget_history import registrar_cambios
+        from .snapshots import marcar_seccion
+
+        project_id, section_id = self.project_id, self.budget_item.section_id
+        result = super().delete(*args, **kwargs)
+        registrar_cambios([self], eliminado=True)
+        marcar_seccion(project_id, section_id)
+        return result
     
     def __str__(self):
         return f"{self.project.name} - {self.budget_item.description[:30]}"
+
+
+class ProjectBudgetSnapshot(models.Model):
+    """
+    Totales precalculados del presupuesto detallado de un proyecto.
+
+    Se mantiene desde ``projects.snapshots``; las vistas del presupuesto lo
+    leen en lugar de recorrer todos los ProjectBudgetItem.
+    """
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="budget_snapshot",
+        verbose_name="Proyecto",
+    )
+    administration_percentage = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0,
+        help_text="Porcentaje con el que se calculó la administración automática",
+    )
+    costo_directo = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    administracion_manual = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0
+    )
+    administracion_automatica = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0
+    )
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    items_count = models.PositiveIntegerField("Ítems configurados", default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen de Presupuesto del Proyecto"
+        verbose_name_plural = "Resúmenes de Presupuesto del Proyecto"
+
+    def totals(self):
+        """
+        Los mismos totales que ``ProjectQuerySet.budget_totals`` para este
+        proyecto, o ``None`` si no tiene ítems detallados.
+        """
+        if not self.items_count:
+            return None
+        return {
+            "costo_directo": self.costo_directo,
+            "administracion_manual": self.administracion_manual,
+            "administracion_automatica": self.administracion_automatica,
+        }
+
+    def __str__(self):
+        return f"{self.project.name} - ${self.total:,.0f}"
+
+
+class ProjectBudgetSectionTotal(models.Model):
+    """Total precalculado de una sección del presupuesto detallado de un proyecto."""
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="budget_section_totals",
+        verbose_name="Proyecto",
+    )
+    section = models.ForeignKey(
+        BudgetSection,
+        on_delete=models.CASCADE,
+        related_name="project_totals",
+        verbose_name="Sección",
+    )
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    items_count = models.PositiveIntegerField("Ítems configurados", default=0)
+    items_con_cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Total de Sección del Proyecto"
+        verbose_name_plural = "Totales de Sección del Proyecto"
+        unique_together = ["project", "section"]
+
+    def __str__(self):
+        return f"{self.project.name} - {self.section.name}: ${self.total:,.0f}"
+
+
+class ProjectBudgetChange(models.Model):
+    """
+    Registro histórico (solo se agrega) de los cambios del presupuesto detallado.
+
+    Cada fila guarda el estado de un ítem del proyecto después del cambio;
+    junto con ``ProjectBudgetCheckpoint`` permite reconstruir el presupuesto
+    en cualquier fecha (ver ``projects.budget_history``).
+    """
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="budget_changes",
+        verbose_name="Proyecto",
+    )
+    # Sin restricción en BD: el historial sobrevive al borrado del ítem
+    budget_item = models.ForeignKey(
+        BudgetItem,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="Ítem de Presupuesto",
+    )
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    unit_price = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_price = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    eliminado = models.BooleanField(default=False)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Cambio de Presupuesto"
+        verbose_name_plural = "Cambios de Presupuesto"
+        indexes = [models.Index(fields=["project", "fecha"])]
+
+    def __str__(self):
+        return (
+            f"{self.project_id} - ítem {self.budget_item_id} "
+            f"({self.fecha:%Y-%m-%d %H:%M})"
+        )
+
+
+class ProjectBudgetCheckpoint(models.Model):
+    """
+    Estado completo del presupuesto detallado de un proyecto en una fecha.
+
+    ``items`` es ``{budget_item_id: [cantidad, precio_unitario, precio_total]}``
+    (como texto) e incluye todos los cambios hasta ``ultimo_cambio_id``.
+    """
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="budget_checkpoints",
+        verbose_name="Proyecto",
+    )
+    fecha = models.DateTimeField(default=timezone.now)
+    ultimo_cambio_id = models.PositiveBigIntegerField(default=0)
+    items = models.JSONField(default=dict)
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Punto de Control de Presupuesto"
+        verbose_name_plural = "Puntos de Control de Presupuesto"
+        indexes = [models.Index(fields=["project", "fecha"])]
+
+    def __str__(self):
+        return f"{self.project_id} - {self.fecha:%Y-%m-%d %H:%M}: ${self.total:,.0f}"
+
+
+class ProjectDailyKpi(models.Model):
+    """
+    Resumen diario de los movimientos de materiales de un proyecto.
+
+    Una fila por proyecto y día con el costo y la cantidad de las compras
+    (EntradaMaterial) y de los consumos (ConsumoMaterial). Se mantiene desde
+    ``projects.rollup``; los KPIs por período suman estas filas en vez de
+    recorrer los movimientos.
+    """
+    proyecto = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="kpis_diarios",
+        verbose_name="Proyecto",
+    )
+    fecha = models.DateField()
+    costo_compras = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cantidad_compras = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    costo_consumos = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cantidad_consumida = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+
+    class Meta:
+        verbose_name = "KPI Diario del Proyecto"
+        verbose_name_plural = "KPIs Diarios del Proyecto"
+        unique_together = ["proyecto", "fecha"]
+        indexes = [models.Index(fields=["fecha"])]
+
+    def __str__(self):
+        return f"{self.proyecto_id} - {self.fecha}: ${self.costo_compras:,.0f}"
+
+
+class AlertaStock(models.Model):
+    """
+    Índice de materiales con stock bajo.
+
+    Hay una fila por material con stock global bajo (``proyecto`` vacío) y
+    una por material con stock bajo en un proyecto. Solo se escribe cuando un
+    stock cruza el umbral (ver ``projects.stock_alerts``), así que listar las
+    alertas es una lectura indexada sin importar el tamaño del catálogo.
+    """
+    material = models.ForeignKey(
+        Material,
+        on_delete=models.CASCADE,
+        related_name="alertas_stock",
+        verbose_name="Material",
+    )
+    proyecto = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="alertas_stock",
+        verbose_name="Proyecto",
+    )
+    proyecto_material = models.OneToOneField(
+        "ProyectoMaterial",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="alerta_stock",
+    )
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Alerta de Stock"
+        verbose_name_plural = "Alertas de Stock"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["material"],
+                condition=Q(proyecto__isnull=True),
+                name="alerta_stock_global_unica",
+            ),
+        ]
+        indexes = [models.Index(fields=["proyecto", "fecha"])]
+
+    def __str__(self):
+        donde = self.proyecto_id or "global"
+        return f"{self.material_id} ({donde})"
@@ -0,0 +1,151 @@
+"""
+Tabla compilada de precios unitarios (UnitPrice).
+
+``Project.calculate_detailed_budget`` necesitaba leer todos los UnitPrice
+activos en cada llamada. Aquí se leen una sola vez, se compilan en una
+estructura inmutable (``PricingTable``) y se guardan en memoria del proceso
+hasta que un UnitPrice se guarda o elimina (ver ``projects.signals``), o
+como mucho ``versioning.MAX_EDAD_LOCAL`` segundos.
+"""
+from types import MappingProxyType
+from typing import NamedTuple
+
+from .versioning import CopiaLocal, bump_version
+
+VERSION_KEY = "unit_prices"
+
+# Factores multiplicativos: (campo del proyecto, {valor: item_name del UnitPrice}).
+# El orden importa: se aplican en este orden sobre el costo base.
+FACTOR_RULES = (
+    ("ubicacion_proyecto", {"bogota": "factor_bogota", "cali": "factor_cali"}),
+    (
+        "tipo_terreno",
+        {"rocoso": "factor_terreno_rocoso", "blando": "factor_terreno_blando"},
+    ),
+    (
+        "acceso_obra",
+        {"dificil": "factor_acceso_dificil", "medio": "factor_acceso_medio"},
+    ),
+    ("numero_pisos", {"2": "factor_segundo_piso", "3_mas": "factor_tres_pisos"}),
+    ("acabado_muros", {"premium": "factor_acabado_premium"}),
+)
+
+# Costos por cantidad: (campo del proyecto, item_name, cantidad mínima excluida).
+# Se suma (valor - descuento) * precio cuando valor > mínimo.
+QUANTITY_RULES = (
+    ("numero_banos", "bano_adicional", 1),
+    ("metros_mueble_cocina", "mueble_cocina_ml", 0),
+    ("area_adoquin", "adoquin_m2", 0),
+    ("area_zonas_verdes", "zonas_verdes_m2", 0),
+)
+
+# Costos fijos activados por un booleano del proyecto
+FLAG_RULES = (
+    ("incluir_estudios_disenos", "estudios_disenos"),
+    ("incluir_licencia_impuestos", "licencia_impuestos"),
+)
+
+BASE_PRICE_NAME = "construccion_m2"
+
+
+class PricingTable(NamedTuple):
+    """Reglas de precio ya resueltas contra los UnitPrice activos."""
+
+    version: int
+    base_m2: float | None
+    # ((campo, {valor: factor}), ...) solo con los factores que tienen precio
+    factors: tuple
+    # ((campo, precio, mínimo), ...)
+    quantities: tuple
+    # ((campo, precio), ...)
+    flags: tuple
+
+    def evaluate(self, project):
+        """Calcula el presupuesto tradicional de ``project`` sin consultar la BD."""
+        total = 0.0
+
+        # 1. Construcción básica por m²
+        if self.base_m2 is not None:
+            total += float(project.area_construida_total) * self.base_m2
+
+        # 2-6. Factores de ubicación, terreno, acceso, pisos y acabados
+        for field, by_value in self.factors:
+            factor = by_value.get(getattr(project, field))
+            if factor is not None:
+                total *= factor
+
+        # 7-8. Elementos adicionales y exteriores
+        for field, price, minimum in self.quantities:
+            value = getattr(project, field)
+            if value > minimum:
+                total += float(value - minimum) * price
+
+        # 9. Profesionales
+        for field, price in self.flags:
+            if getattr(project, field):
+                total += price
+
+        return total
+
+
+def compile_pricing_table(prices, version=0):
+    """
+    Compila un dict ``{item_name: price}`` en una ``PricingTable``.
+
+    Separado de la lectura de BD para poder reutilizarlo con precios
+    hipotéticos (p. ej. en simulaciones) sin tocar los UnitPrice reales.
+    """
+    base = prices.get(BASE_PRICE_NAME)
+
+    factors = []
+    for field, names in FACTOR_RULES:
+        by_value = {
+            value: float(prices[name])
+            for value, name in names.items()
+            if name in prices
+        }
+        if by_value:
+            factors.append((field, MappingProxyType(by_value)))
+
+    quantities = tuple(
+        (field, float(prices[name]), minimum)
+        for field, name, minimum in QUANTITY_RULES
+        if name in prices
+    )
+    flags = tuple(
+        (field, float(prices[name])) for field, name in FLAG_RULES if name in prices
+    )
+
+    return PricingTable(
+        version=version,
+        base_m2=float(base) if base is not None else None,
+        factors=tuple(factors),
+        quantities=quantities,
+        flags=flags,
+    )
+
+
+_copia = CopiaLocal(VERSION_KEY)
+
+
+def _compilar(version):
+    from .models import UnitPrice
+
+    prices = dict(
+        UnitPrice.objects.filter(is_active=True).values_list("item_name", "price")
+    )
+    return compile_pricing_table(prices, version=version)
+
+
+def get_pricing_table():
+    """
+    Devuelve la tabla compilada vigente.
+
+    Solo consulta la BD cuando la versión cambió o la copia caducó.
+    """
+    return _copia.get(_compilar)
+
+
+def invalidate_pricing_table():
+    """Marca la tabla como obsoleta; se recompila en la próxima lectura."""
+    bump_version(VERSION_KEY)
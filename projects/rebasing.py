@@ -0,0 +1,147 @@
+"""
+Re-valoración del presupuesto detallado con los precios vigentes.
+
+Al cambiar ``BudgetItem.unit_price`` los ``ProjectBudgetItem`` existentes
+conservan el precio con el que se guardaron. ``rebase_budget_prices`` lleva
+el precio vigente a los proyectos no terminados con UPDATE por lotes, y luego
+recalcula su ``presupuesto`` con una pasada agrupada
+(``ProjectQuerySet.recalculate_budgets``); los precios nuevos quedan en el
+historial del presupuesto. Con ``dry_run=True`` solo informa la diferencia
+por proyecto.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+)
+
+MONEY = DecimalField(max_digits=15, decimal_places=2)
+
+
+def _precio_vigente():
+    from .models import BudgetItem
+
+    return Subquery(
+        BudgetItem.objects.filter(pk=OuterRef("budget_item_id")).values(
+            "unit_price"
+        )[:1],
+        output_field=MONEY,
+    )
+
+
+def _desactualizados(project_ids=None, budget_item_ids=None):
+    """Ítems de proyectos no terminados cuyo precio difiere del vigente."""
+    from .models import Project, ProjectBudgetItem
+
+    proyectos = Project.objects.exclude(estado="terminado")
+    if project_ids is not None:
+        proyectos = proyectos.filter(pk__in=project_ids)
+
+    items = ProjectBudgetItem.objects.filter(
+        project__in=proyectos.values("pk")
+    ).exclude(unit_price=F("budget_item__unit_price"))
+    if budget_item_ids is not None:
+        items = items.filter(budget_item_id__in=budget_item_ids)
+    return items
+
+
+def rebase_budget_prices(project_ids=None, budget_item_ids=None, dry_run=False,
+                         batch_size=500):
+    """
+    Actualiza ``unit_price`` y ``total_price`` de los ProjectBudgetItem de
+    proyectos no terminados al precio vigente de su BudgetItem.
+
+    Se puede limitar a ciertos proyectos o ítems. Devuelve una lista con la
+    diferencia por proyecto afectado::
+
+        [(project_id, nombre, presupuesto_actual, presupuesto_nuevo), ...]
+
+    Con ``dry_run=True`` calcula la misma lista sin escribir.
+    """
+    from .budget_history import registrar_cambios
+    from .models import (
+        ORDEN_SECCION_ADMINISTRACION,
+        Project,
+        ProjectBudgetItem,
+        ProjectBudgetSectionTotal,
+        ProjectBudgetSnapshot,
+    )
+
+    items = _desactualizados(project_ids, budget_item_ids)
+
+    # Cambio del costo directo y de la administración manual por proyecto
+    es_admin = Q(budget_item__section__order=ORDEN_SECCION_ADMINISTRACION)
+    delta = ExpressionWrapper(
+        F("quantity") * (F("budget_item__unit_price") - F("unit_price")),
+        output_field=MONEY,
+    )
+    cambios = {
+        row["project_id"]: row
+        for row in items.values("project_id")
+        .annotate(
+            costo_directo=Sum(delta, filter=~es_admin),
+            administracion_manual=Sum(delta, filter=es_admin),
+        )
+        .order_by()
+    }
+    if not cambios:
+        return []
+
+    proyectos = Project.objects.filter(pk__in=cambios)
+    totales = proyectos.budget_totals()
+    resultado = []
+    for project in proyectos.order_by("pk"):
+        actual = totales[project.pk]
+        cambio = cambios[project.pk]
+        costo_directo = actual["costo_directo"] + (
+            cambio["costo_directo"] or Decimal("0")
+        )
+        nuevo = {
+            "costo_directo": costo_directo,
+            "administracion_manual": actual["administracion_manual"]
+            + (cambio["administracion_manual"] or Decimal("0")),
+            "administracion_automatica": costo_directo
+            * project.administration_percentage
+            / Decimal("100"),
+        }
+        resultado.append((
+            project.pk,
+            project.name,
+            project.presupuesto,
+            project.final_budget_from_totals(nuevo),
+        ))
+
+    if dry_run:
+        return resultado
+
+    precio = _precio_vigente()
+    ids = list(items.values_list("pk", flat=True))
+    with transaction.atomic():
+        for inicio in range(0, len(ids), batch_size):
+            lote = ProjectBudgetItem.objects.filter(
+                pk__in=ids[inicio:inicio + batch_size]
+            )
+            lote.update(
+                unit_price=precio,
+                total_price=ExpressionWrapper(
+                    F("quantity") * precio, output_field=MONEY
+                ),
+            )
+            registrar_cambios(lote.only(
+                "project_id", "budget_item_id", "quantity", "unit_price", "total_price"
+            ))
+
+        # Los resúmenes del presupuesto se reconstruyen en la próxima lectura
+        ProjectBudgetSectionTotal.objects.filter(project_id__in=cambios).delete()
+        ProjectBudgetSnapshot.objects.filter(project_id__in=cambios).delete()
+
+        proyectos.recalculate_budgets(batch_size=batch_size)
+
+    return resultado
@@ -0,0 +1,114 @@
+"""
+Resumen diario de movimientos de materiales por proyecto.
+
+``ProjectDailyKpi`` guarda por proyecto y día el costo y la cantidad de las
+compras (valoradas como en ``projects.ledger``) y de los consumos (a
+``Material.unit_cost``, como el avance por etapas). Los receptores de
+``projects.signals`` recalculan solo los días tocados por cada escritura, y
+``rebuild_daily_kpis`` (comando ``rebuild_daily_kpis``) reconstruye todo.
+
+Los KPIs de un período se obtienen con ``kpis_periodo``: una suma agrupada
+sobre pocas filas pequeñas en lugar de un recorrido de los movimientos.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+
+from .ledger import costo_entradas
+
+MONEY = DecimalField(max_digits=15, decimal_places=2)
+
+
+def _filtro_dias(campo_fecha, dias):
+    """Q que selecciona los pares (proyecto, fecha) de ``dias``."""
+    filtro = Q(pk__in=[])
+    for proyecto_id, fecha in dias:
+        filtro |= Q(proyecto_id=proyecto_id, **{campo_fecha: fecha})
+    return filtro
+
+
+def rebuild_daily_kpis(project_ids=None, dias=None):
+    """
+    Recalcula las filas diarias desde los movimientos.
+
+    Sin argumentos reconstruye todo; ``project_ids`` limita a esos proyectos
+    y ``dias`` (iterable de ``(proyecto_id, fecha)``) solo a esos días.
+    Devuelve el número de filas escritas.
+    """
+    from .models import ConsumoMaterial, EntradaMaterial, ProjectDailyKpi
+
+    entradas = EntradaMaterial.objects.all()
+    consumos = ConsumoMaterial.objects.all()
+    filas = ProjectDailyKpi.objects.all()
+    if project_ids is not None:
+        entradas = entradas.filter(proyecto_id__in=project_ids)
+        consumos = consumos.filter(proyecto_id__in=project_ids)
+        filas = filas.filter(proyecto_id__in=project_ids)
+    if dias is not None:
+        dias = set(dias)
+        if not dias:
+            return 0
+        entradas = entradas.filter(_filtro_dias("fecha_ingreso", dias))
+        consumos = consumos.filter(_filtro_dias("fecha_consumo", dias))
+        filas = filas.filter(_filtro_dias("fecha", dias))
+
+    resumen = {}
+
+    def fila(proyecto_id, fecha):
+        return resumen.setdefault((proyecto_id, fecha), ProjectDailyKpi(
+            proyecto_id=proyecto_id, fecha=fecha
+        ))
+
+    for row in (
+        costo_entradas(entradas)
+        .values("proyecto_id", "fecha_ingreso")
+        .annotate(costo=Sum("costo"), cantidad=Sum("cantidad"))
+        .order_by()
+    ):
+        kpi = fila(row["proyecto_id"], row["fecha_ingreso"])
+        kpi.costo_compras = row["costo"] or Decimal("0")
+        kpi.cantidad_compras = row["cantidad"] or Decimal("0")
+
+    for row in (
+        consumos.values("proyecto_id", "fecha_consumo")
+        .annotate(
+            costo=Sum(ExpressionWrapper(
+                F("cantidad_consumida") * F("material__unit_cost"), output_field=MONEY
+            )),
+            cantidad=Sum("cantidad_consumida"),
+        )
+        .order_by()
+    ):
+        kpi = fila(row["proyecto_id"], row["fecha_consumo"])
+        kpi.costo_consumos = row["costo"] or Decimal("0")
+        kpi.cantidad_consumida = row["cantidad"] or Decimal("0")
+
+    with transaction.atomic():
+        filas.delete()
+        ProjectDailyKpi.objects.bulk_create(resumen.values(), batch_size=500)
+    return len(resumen)
+
+
+def kpis_periodo(proyectos=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Totales de compras y consumos en el período (extremos incluidos) para
+    un queryset de proyectos, o todos::
+
+        {"costo_compras", "cantidad_compras", "costo_consumos", "cantidad_consumida"}
+    """
+    from .models import ProjectDailyKpi
+
+    filas = ProjectDailyKpi.objects.all()
+    if proyectos is not None:
+        filas = filas.filter(proyecto__in=proyectos.values("pk"))
+    if fecha_desde:
+        filas = filas.filter(fecha__gte=fecha_desde)
+    if fecha_hasta:
+        filas = filas.filter(fecha__lte=fecha_hasta)
+
+    campos = (
+        "costo_compras", "cantidad_compras", "costo_consumos", "cantidad_consumida"
+    )
+    totales = filas.aggregate(**{campo: Sum(campo) for campo in campos})
+    return {campo: totales[campo] or Decimal("0") for campo in campos}
@@ -0,0 +1,156 @@
+"""
+Simulación de escenarios ("what-if") sobre el cuestionario de un proyecto.
+
+Para cotizar, los comerciales cambian campos como ``acabado_muros`` o
+``ubicacion_proyecto`` y recalculan el presupuesto variante por variante.
+``evaluate_scenarios`` recibe un proyecto base y una grilla de valores por
+campo, y evalúa todas las combinaciones en una sola pasada vectorizada con
+NumPy usando la misma ``PricingTable`` que ``calculate_detailed_budget``.
+No crea ni guarda proyectos.
+"""
+import math
+
+import numpy as np
+
+from .pricing import get_pricing_table
+
+# Campos numéricos que también se pueden variar además de los de las reglas
+AREA_FIELD = "area_construida_total"
+
+# Límite de combinaciones por simulación
+MAX_ESCENARIOS = 20000
+
+
+def campos_simulables():
+    """Campos del proyecto que afectan el presupuesto tradicional."""
+    from .pricing import FACTOR_RULES, FLAG_RULES, QUANTITY_RULES
+
+    return (
+        {AREA_FIELD}
+        | {field for field, _ in FACTOR_RULES}
+        | {field for field, _, _ in QUANTITY_RULES}
+        | {field for field, _ in FLAG_RULES}
+    )
+
+
+def _clave_opcion(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _validar_grilla(grid):
+    """Valida campos y valores de la grilla contra el modelo Project."""
+    from django.core.exceptions import ValidationError
+    from .models import Project
+
+    permitidos = campos_simulables()
+    grilla = {}
+    for field, values in grid.items():
+        if field not in permitidos:
+            raise ValueError(f"El campo '{field}' no afecta el presupuesto")
+        if not isinstance(values, (list, tuple)):
+            raise ValueError(f"Los valores de '{field}' deben ser una lista")
+        if not values:
+            raise ValueError(f"El campo '{field}' no tiene valores a simular")
+
+        model_field = Project._meta.get_field(field)
+        try:
+            values = [model_field.to_python(value) for value in values]
+        except ValidationError as e:
+            raise ValueError(f"Valor inválido para '{field}': {e.messages[0]}")
+        if model_field.choices:
+            # Las opciones se aceptan sin distinguir mayúsculas y se simulan
+            # con el valor que se guarda ("bogota" -> "Bogota")
+            opciones = {
+                _clave_opcion(value): value for value, _ in model_field.flatchoices
+            }
+            invalidos = [
+                value for value in values if _clave_opcion(value) not in opciones
+            ]
+            if invalidos:
+                raise ValueError(f"Valores inválidos para '{field}': {invalidos}")
+            values = [opciones[_clave_opcion(value)] for value in values]
+        # Sin repetidos, en el orden recibido
+        grilla[field] = list(dict.fromkeys(values))
+    return grilla
+
+
+def evaluate_scenarios(project, grid, table=None):
+    """
+    Evalúa todas las combinaciones de ``grid`` sobre ``project``.
+
+    ``grid`` es ``{campo: [valores, ...]}``; los campos que no aparecen
+    conservan el valor del proyecto base. Devuelve las variantes ordenadas
+    de menor a mayor presupuesto::
+
+        [{"rank": 1, "parametros": {campo: valor}, "presupuesto": int,
+          "diferencia": int}, ...]
+
+    donde ``diferencia`` es contra el presupuesto tradicional del proyecto
+    base. ``table`` permite simular con una ``PricingTable`` hipotética.
+    """
+    from .models import PRESUPUESTO_MINIMO
+
+    grilla = _validar_grilla(grid)
+    table = table or get_pricing_table()
+
+    fields = list(grilla)
+    shape = tuple(len(grilla[field]) for field in fields)
+    # Enteros de Python: np.prod desborda int64 con grillas grandes
+    n = math.prod(shape)
+    if n > MAX_ESCENARIOS:
+        raise ValueError(
+            f"La simulación tiene {n} combinaciones (máximo {MAX_ESCENARIOS})"
+        )
+
+    # Índice de cada combinación en la grilla: una fila por campo
+    indices = np.indices(shape).reshape(len(fields), n) if fields else None
+    posicion = {field: i for i, field in enumerate(fields)}
+
+    def columna(field, convert):
+        """Valores del campo para cada variante, convertidos con ``convert``."""
+        if field in posicion:
+            valores = np.array([convert(v) for v in grilla[field]], dtype=float)
+            return valores[indices[posicion[field]]]
+        return np.full(n, convert(getattr(project, field)), dtype=float)
+
+    total = np.zeros(n)
+
+    # 1. Construcción básica por m²
+    if table.base_m2 is not None:
+        total += columna(AREA_FIELD, lambda v: float(v or 0)) * table.base_m2
+
+    # 2-6. Factores de ubicación, terreno, acceso, pisos y acabados
+    for field, by_value in table.factors:
+        total *= columna(field, lambda v: by_value.get(v, 1.0))
+
+    # 7-8. Elementos adicionales y exteriores
+    for field, price, minimum in table.quantities:
+        exceso = columna(field, lambda v: float(v or 0)) - minimum
+        total += np.maximum(exceso, 0) * price
+
+    # 9. Profesionales
+    for field, price in table.flags:
+        total += columna(field, bool) * price
+
+    # Mismo redondeo y mínimo que calculate_detailed_budget / final_budget_from_totals
+    presupuestos = np.trunc(total)
+    presupuestos[presupuestos <= 0] = float(PRESUPUESTO_MINIMO)
+
+    base = int(table.evaluate(project))
+    if base <= 0:
+        base = int(PRESUPUESTO_MINIMO)
+    orden = np.argsort(presupuestos, kind="stable")
+
+    resultado = []
+    for rank, i in enumerate(orden, start=1):
+        parametros = {
+            field: grilla[field][indices[posicion[field], i]] for field in fields
+        }
+        presupuesto = int(presupuestos[i])
+        resultado.append({
+            "rank": rank,
+            "parametros": parametros,
+            "presupuesto": presupuesto,
+            "diferencia": presupuesto - base,
+        })
+    return resultado
@@ -0,0 +1,99 @@
+"""
+Búsqueda de proyectos por texto.
+
+En PostgreSQL cada proyecto guarda ``search_vector``: nombre (peso A),
+dirección (B) y descripción (C) con la configuración ``spanish_unaccent``
+(lematización en español y sin tildes, creada en la migración
+``0030_project_search``), indexado con GIN. ``buscar_proyectos`` filtra
+con ese índice y puede ordenar por relevancia; cada término se busca
+también como prefijo, así que "medell" encuentra "Medellín".
+
+El vector se actualiza al guardar un proyecto (``projects.signals``) y
+``rebuild_search_vectors`` (comando ``rebuild_project_search``) lo
+recalcula para todos. En otros motores (SQLite en las pruebas) se usa la
+búsqueda con ``icontains`` de siempre.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, Q
+
+CONFIG = "spanish_unaccent"
+CAMPOS = ("name", "description", "location_address")
+
+_TERMINO = re.compile(r"\w+")
+
+
+def usa_busqueda_completa(using="default"):
+    """La base de datos soporta el vector de búsqueda (PostgreSQL)."""
+    return connections[using].vendor == "postgresql"
+
+
+def vector_busqueda():
+    """Expresión del vector de búsqueda de un proyecto."""
+    return (
+        SearchVector("name", weight="A", config=CONFIG)
+        + SearchVector("location_address", weight="B", config=CONFIG)
+        + SearchVector("description", weight="C", config=CONFIG)
+    )
+
+
+def consulta(texto):
+    """
+    ``SearchQuery`` con todos los términos de ``texto`` como prefijos
+    (``casa:* & medell:*``), o ``None`` si no hay términos.
+    """
+    terminos = _TERMINO.findall(texto or "")
+    if not terminos:
+        return None
+    return SearchQuery(
+        " & ".join(f"{termino}:*" for termino in terminos),
+        config=CONFIG,
+        search_type="raw",
+    )
+
+
+def buscar_proyectos(projects, texto, ordenar=False):
+    """
+    Filtra ``projects`` por ``texto`` en nombre, descripción y dirección.
+    Con ``ordenar=True`` y PostgreSQL, ordena por relevancia.
+    """
+    texto = (texto or "").strip()
+    if not texto:
+        return projects
+
+    query = consulta(texto) if usa_busqueda_completa(projects.db) else None
+    if query is None:
+        return projects.filter(
+            Q(name__icontains=texto)
+            | Q(description__icontains=texto)
+            | Q(location_address__icontains=texto)
+        )
+
+    projects = projects.filter(search_vector=query)
+    if ordenar:
+        projects = projects.annotate(
+            relevancia=SearchRank(F("search_vector"), query)
+        ).order_by("-relevancia", "-fecha_creacion")
+    return projects
+
+
+def actualizar_vector(project_ids, using="default"):
+    """Recalcula ``search_vector`` de los proyectos indicados."""
+    from .models import Project
+
+    if not usa_busqueda_completa(using):
+        return 0
+    return Project.objects.using(using).filter(pk__in=project_ids).update(
+        search_vector=vector_busqueda()
+    )
+
+
+def rebuild_search_vectors(using="default"):
+    """Recalcula ``search_vector`` de todos los proyectos."""
+    from .models import Project
+
+    if not usa_busqueda_completa(using):
+        return 0
+    return Project.objects.using(using).update(search_vector=vector_busqueda())
@@ -0,0 +1,222 @@
+"""
+Receptores de señales del app projects.
+
+Mantienen coherentes las cachés en proceso cuando cambian los datos de los
+que dependen.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from catalog.models import Material, MaterialSupplier, Supplier, Unit
+
+from .budget_template import invalidate_budget_template
+from .etags import CATALOGO_KEY, invalidar_versiones, version_proyecto
+from .facets import invalidate_facetas
+from .ledger import rebuild_spend_ledger
+from .material_index import invalidate_material_index
+from .models import (
+    BudgetItem,
+    BudgetSection,
+    ConsumoMaterial,
+    EntradaMaterial,
+    Project,
+    ProyectoMaterial,
+    UnitPrice,
+    proyectos_actualizados_en_bloque,
+)
+from .pricing import invalidate_pricing_table
+from .rollup import rebuild_daily_kpis
+from .search import CAMPOS as CAMPOS_BUSQUEDA, actualizar_vector
+from .stock_alerts import sincronizar_alertas
+
+# Campo de fecha de cada movimiento que alimenta el resumen diario
+_FECHA_MOVIMIENTO = {EntradaMaterial: "fecha_ingreso", ConsumoMaterial: "fecha_consumo"}
+
+# Campos que cambian la valoración de las compras de un material
+_CAMPOS_PRECIO = {
+    Material: ("unit_cost",),
+    MaterialSupplier: ("price", "material_id", "supplier_id"),
+}
+
+
+@receiver(post_save, sender=UnitPrice)
+@receiver(post_delete, sender=UnitPrice)
+def unit_price_changed(sender, **kwargs):
+    """Un precio unitario cambió: la tabla compilada debe reconstruirse."""
+    invalidate_pricing_table()
+
+
+@receiver(post_save, sender=BudgetSection)
+@receiver(post_delete, sender=BudgetSection)
+@receiver(post_save, sender=BudgetItem)
+@receiver(post_delete, sender=BudgetItem)
+def budget_template_changed(sender, instance, **kwargs):
+    """
+    Cambió una sección plantilla o un ítem (precio, estado, alta o baja): la
+    plantilla en memoria debe releerse. Las copias de secciones por proyecto
+    no forman parte de la plantilla.
+    """
+    if sender is BudgetSection and instance.project_id is not None:
+        return
+    invalidate_budget_template()
+
+
+@receiver(pre_save, sender=Material)
+@receiver(pre_save, sender=MaterialSupplier)
+def precio_por_guardar(sender, instance, update_fields=None, **kwargs):
+    """Recuerda el precio que tenía el material o el proveedor antes de editarlo."""
+    campos = _CAMPOS_PRECIO[sender]
+    instance._precio_anterior = None
+    if instance.pk and (update_fields is None or set(campos) & set(update_fields)):
+        instance._precio_anterior = (
+            sender.objects.filter(pk=instance.pk).values_list(*campos).first()
+        )
+
+
+def _revalorar(material_ids, con_consumos=False):
+    """Revalora con el precio vigente el gasto y el resumen diario de los materiales."""
+    rebuild_spend_ledger(material_ids=material_ids)
+
+    # El resumen diario también valora con el precio vigente
+    project_ids = set(
+        EntradaMaterial.objects.filter(material_id__in=material_ids).values_list(
+            "proyecto_id", flat=True
+        )
+    )
+    if con_consumos:
+        project_ids |= set(
+            ConsumoMaterial.objects.filter(material_id__in=material_ids).values_list(
+                "proyecto_id", flat=True
+            )
+        )
+    if project_ids:
+        rebuild_daily_kpis(project_ids=project_ids)
+
+
+@receiver(post_save, sender=MaterialSupplier)
+@receiver(post_save, sender=Material)
+def material_price_changed(sender, instance, created=False, **kwargs):
+    """
+    Cambió un precio de proveedor o el costo unitario de un material: el
+    gasto de las compras de ese material se revalora con el precio vigente.
+    Editar otros campos (nombre, stock, presentación) no revalora nada.
+    """
+    if created and sender is Material:
+        return  # Un material nuevo no tiene compras
+
+    material_ids = {instance.pk if sender is Material else instance.material_id}
+    if not created:
+        anterior = getattr(instance, "_precio_anterior", None)
+        actual = tuple(getattr(instance, campo) for campo in _CAMPOS_PRECIO[sender])
+        if anterior is None or anterior == actual:
+            return
+        if sender is MaterialSupplier:
+            material_ids.add(anterior[1])  # El precio pudo pasar a otro material
+
+    _revalorar(material_ids, con_consumos=sender is Material)
+
+
+@receiver(post_delete, sender=MaterialSupplier)
+def precio_proveedor_eliminado(sender, instance, **kwargs):
+    """Sin precio de proveedor, sus compras pasan a valorarse al costo del material."""
+    _revalorar({instance.material_id})
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def material_catalog_changed(sender, **kwargs):
+    """Cambió un material o una unidad: se reconstruye el índice de autocompletado."""
+    invalidate_material_index()
+
+
+@receiver(post_save, sender=Material)
+def material_stock_changed(sender, instance, **kwargs):
+    """
+    El stock o la presentación de un material se editaron a mano: su alerta
+    de stock global puede haber cambiado.
+    """
+    sincronizar_alertas(material_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Project)
+def proyecto_guardado(sender, instance, update_fields=None, using="default", **kwargs):
+    """Actualiza el vector de búsqueda si cambian nombre, descripción o dirección."""
+    if update_fields is None or set(update_fields) & set(CAMPOS_BUSQUEDA):
+        actualizar_vector([instance.pk], using=using)
+
+
+@receiver(pre_save, sender=EntradaMaterial)
+@receiver(pre_save, sender=ConsumoMaterial)
+def movimiento_por_guardar(sender, instance, **kwargs):
+    """Recuerda el día que tenía el movimiento antes de editarlo."""
+    campo = _FECHA_MOVIMIENTO[sender]
+    instance._dia_anterior = None
+    if instance.pk:
+        instance._dia_anterior = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("proyecto_id", campo)
+            .first()
+        )
+
+
+@receiver(post_save, sender=EntradaMaterial)
+@receiver(post_delete, sender=EntradaMaterial)
+@receiver(post_save, sender=ConsumoMaterial)
+@receiver(post_delete, sender=ConsumoMaterial)
+def movimiento_cambiado(sender, instance, **kwargs):
+    """Recalcula en el resumen diario solo los días tocados por el movimiento."""
+    dias = {(instance.proyecto_id, getattr(instance, _FECHA_MOVIMIENTO[sender]))}
+    if getattr(instance, "_dia_anterior", None):
+        dias.add(instance._dia_anterior)
+    rebuild_daily_kpis(dias=dias)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=EntradaMaterial)
+@receiver(post_delete, sender=EntradaMaterial)
+@receiver(post_save, sender=ConsumoMaterial)
+@receiver(post_delete, sender=ConsumoMaterial)
+@receiver(post_save, sender=ProyectoMaterial)
+@receiver(post_delete, sender=ProyectoMaterial)
+def datos_proyecto_cambiaron(sender, instance, **kwargs):
+    """Invalida las ETag de los endpoints JSON del proyecto (projects.etags)."""
+    project_id = instance.pk if sender is Project else instance.proyecto_id
+    nombres = {version_proyecto(project_id)}
+    if getattr(instance, "_dia_anterior", None):
+        # El movimiento cambió de proyecto
+        nombres.add(version_proyecto(instance._dia_anterior[0]))
+    invalidar_versiones(*nombres)
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+@receiver(post_save, sender=MaterialSupplier)
+@receiver(post_delete, sender=MaterialSupplier)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def catalogo_cambio(sender, **kwargs):
+    """Invalida las ETag que dependen de materiales, proveedores o precios."""
+    invalidar_versiones(CATALOGO_KEY)
+
+
+@receiver(proyectos_actualizados_en_bloque)
+def proyectos_actualizados(sender, project_ids, **kwargs):
+    """
+    Escritura en bloque sin post_save (presupuestos recalculados, precios
+    re-valorados): invalida las ETag de esos proyectos y los conteos por faceta.
+    """
+    invalidar_versiones(*(version_proyecto(pk) for pk in project_ids))
+    invalidate_facetas()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(m2m_changed, sender=Project.workers.through)
+def proyectos_cambiaron(sender, **kwargs):
+    """Los conteos por faceta del listado de proyectos deben recalcularse."""
+    invalidate_facetas()
@@ -0,0 +1,172 @@
+"""
+Resumen precalculado del presupuesto detallado.
+
+Las vistas del presupuesto (detalle, edición, exportaciones) necesitan los
+totales por sección y el costo directo / administración del proyecto. En vez
+de recorrer todos los ProjectBudgetItem en cada una, se mantienen en:
+
+- ``ProjectBudgetSectionTotal``: total e ítems por proyecto y sección
+- ``ProjectBudgetSnapshot``: costo directo, administración y total del proyecto
+
+``ProjectBudgetItem.save``/``delete`` refrescan solo la sección tocada; las
+ediciones en bloque usan ``snapshot_diferido`` para refrescar una vez al final.
+Los totales del proyecto se recalculan sobre las filas de sección (decenas de
+filas), por lo que un cambio de porcentaje de administración no relee ítems.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+_estado = threading.local()
+
+
+def refresh_budget_snapshot(project_id, section_ids=None):
+    """
+    Recalcula el resumen del presupuesto de un proyecto.
+
+    Con ``section_ids=None`` recalcula todas las secciones; con una lista solo
+    esas (una lista vacía recalcula únicamente los totales del proyecto, p. ej.
+    al cambiar el porcentaje de administración). Devuelve el snapshot.
+    """
+    from .models import (
+        ORDEN_SECCION_ADMINISTRACION,
+        Project,
+        ProjectBudgetItem,
+        ProjectBudgetSectionTotal,
+        ProjectBudgetSnapshot,
+    )
+
+    with transaction.atomic():
+        if section_ids is None or section_ids:
+            items = ProjectBudgetItem.objects.filter(project_id=project_id)
+            filas = ProjectBudgetSectionTotal.objects.filter(project_id=project_id)
+            if section_ids is not None:
+                items = items.filter(budget_item__section_id__in=section_ids)
+                filas = filas.filter(section_id__in=section_ids)
+
+            nuevas = [
+                ProjectBudgetSectionTotal(
+                    project_id=project_id,
+                    section_id=row["budget_item__section_id"],
+                    total=row["total"] or Decimal("0"),
+                    items_count=row["items_count"],
+                    items_con_cantidad=row["items_con_cantidad"],
+                )
+                for row in items.values("budget_item__section_id")
+                .annotate(
+                    total=Sum("total_price"),
+                    items_count=Count("id"),
+                    items_con_cantidad=Count("id", filter=Q(quantity__gt=0)),
+                )
+                .order_by()
+            ]
+            filas.delete()
+            ProjectBudgetSectionTotal.objects.bulk_create(nuevas)
+
+        es_admin = Q(section__order=ORDEN_SECCION_ADMINISTRACION)
+        agregados = ProjectBudgetSectionTotal.objects.filter(
+            project_id=project_id
+        ).aggregate(
+            costo_directo=Sum("total", filter=~es_admin),
+            administracion_manual=Sum("total", filter=es_admin),
+            items_count=Sum("items_count"),
+        )
+        porcentaje = Project.objects.values_list(
+            "administration_percentage", flat=True
+        ).get(pk=project_id)
+
+        costo_directo = agregados["costo_directo"] or Decimal("0")
+        administracion_manual = agregados["administracion_manual"] or Decimal("0")
+        administracion_automatica = costo_directo * porcentaje / Decimal("100")
+        snapshot, _ = ProjectBudgetSnapshot.objects.update_or_create(
+            project_id=project_id,
+            defaults={
+                "administration_percentage": porcentaje,
+                "costo_directo": costo_directo,
+                "administracion_manual": administracion_manual,
+                "administracion_automatica": administracion_automatica,
+                "total": (
+                    costo_directo + administracion_automatica + administracion_manual
+                ),
+                "items_count": agregados["items_count"] or 0,
+            },
+        )
+    return snapshot
+
+
+def get_budget_snapshot(project):
+    """
+    Snapshot del presupuesto del proyecto, construyéndolo si aún no existe
+    (proyectos anteriores a la tabla o creados con ``bulk_create``).
+
+    Si el porcentaje de administración del proyecto cambió desde el último
+    refresco solo se recalculan los totales del proyecto.
+    """
+    from .models import ProjectBudgetSnapshot
+
+    try:
+        snapshot = ProjectBudgetSnapshot.objects.get(project_id=project.pk)
+    except ProjectBudgetSnapshot.DoesNotExist:
+        return refresh_budget_snapshot(project.pk)
+
+    if snapshot.administration_percentage != project.administration_percentage:
+        snapshot = refresh_budget_snapshot(project.pk, section_ids=[])
+    return snapshot
+
+
+def get_section_totals(project):
+    """
+    Totales por sección del proyecto: ``{section_id: ProjectBudgetSectionTotal}``
+    con la sección ya cargada, ordenados por el orden de la sección.
+    """
+    from .models import ProjectBudgetSectionTotal
+
+    get_budget_snapshot(project)
+    filas = (
+        ProjectBudgetSectionTotal.objects.filter(project_id=project.pk)
+        .select_related("section")
+        .order_by("section__order")
+    )
+    return {fila.section_id: fila for fila in filas}
+
+
+def marcar_seccion(project_id, section_id):
+    """
+    Registra un cambio en una sección del presupuesto de un proyecto: la
+    refresca en el acto, o al salir de ``snapshot_diferido`` si está activo.
+    """
+    pendientes = getattr(_estado, "pendientes", None)
+    if pendientes is not None:
+        pendientes.setdefault(project_id, set()).add(section_id)
+    else:
+        refresh_budget_snapshot(project_id, [section_id])
+
+
+@contextmanager
+def snapshot_diferido():
+    """
+    Agrupa los refrescos del snapshot durante una edición en bloque: cada
+    proyecto tocado se refresca una sola vez, con las secciones modificadas.
+
+    Si el bloque falla, los ítems que alcanzaron a guardarse siguen escritos
+    (las ediciones no son atómicas), así que las secciones pendientes se
+    refrescan igual; solo se descartan si la transacción en curso se va a
+    revertir.
+    """
+    if getattr(_estado, "pendientes", None) is not None:
+        # Anidado: el contexto externo se encarga de refrescar
+        yield
+        return
+
+    _estado.pendientes = {}
+    try:
+        yield
+    finally:
+        pendientes = _estado.pendientes
+        _estado.pendientes = None
+        if not transaction.get_connection().needs_rollback:
+            for project_id, section_ids in pendientes.items():
+                refresh_budget_snapshot(project_id, list(section_ids))
@@ -0,0 +1,150 @@
+"""
+Índice de alertas de stock bajo.
+
+``AlertaStock`` tiene una fila por material cuyo stock global está bajo y
+una por (proyecto, material) cuyo stock asignado está bajo, con los umbrales
+de ``settings.STOCK_ALERTAS``. Los caminos que mueven stock
+(``EntradaMaterial``/``ConsumoMaterial`` ``save``/``delete``, edición de un
+material) llaman a ``sincronizar_alertas`` con lo que tocaron; solo se
+escribe cuando el stock cruza el umbral. ``rebuild_stock_alerts`` (comando
+``rebuild_stock_alerts``) reconstruye el índice completo.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+DEFAULTS = {"PORCENTAJE_PRESENTACION": 10, "STOCK_PROYECTO_MINIMO": 10}
+
+
+def umbrales():
+    """Umbrales vigentes: ``(porcentaje_presentacion, stock_proyecto_minimo)``."""
+    config = {**DEFAULTS, **getattr(settings, "STOCK_ALERTAS", {})}
+    return (
+        Decimal(str(config["PORCENTAJE_PRESENTACION"])),
+        Decimal(str(config["STOCK_PROYECTO_MINIMO"])),
+    )
+
+
+def material_bajo(stock, presentation_qty, porcentaje=None):
+    """Regla del stock global bajo (la misma del dashboard de KPIs)."""
+    if porcentaje is None:
+        porcentaje, _ = umbrales()
+    return (stock or 0) <= (presentation_qty or 0) * porcentaje / Decimal("100")
+
+
+def _aplicar(existentes, bajos, crear, borrar):
+    """Crea las alertas nuevas y borra las que dejaron de estar bajas."""
+    from .models import AlertaStock
+
+    nuevas = [crear(clave) for clave in bajos - existentes]
+    resueltas = existentes - bajos
+    if nuevas:
+        AlertaStock.objects.bulk_create(nuevas, batch_size=500)
+    if resueltas:
+        borrar(resueltas).delete()
+
+
+def sincronizar_alertas(material_ids=(), proyecto_material_ids=()):
+    """
+    Actualiza el índice para los materiales (stock global) y las filas de
+    ProyectoMaterial (stock por proyecto) indicadas.
+    """
+    from catalog.models import Material
+    from .models import AlertaStock, ProyectoMaterial
+
+    porcentaje, minimo = umbrales()
+    material_ids = set(material_ids)
+    proyecto_material_ids = set(proyecto_material_ids)
+
+    if material_ids:
+        bajos = {
+            material_id
+            for material_id, stock, presentation_qty in Material.objects.filter(
+                pk__in=material_ids
+            ).values_list("id", "stock", "presentation_qty")
+            if material_bajo(stock, presentation_qty, porcentaje)
+        }
+        existentes = set(
+            AlertaStock.objects.filter(
+                material_id__in=material_ids, proyecto__isnull=True
+            ).values_list("material_id", flat=True)
+        )
+        _aplicar(
+            existentes,
+            bajos,
+            lambda material_id: AlertaStock(material_id=material_id),
+            lambda ids: AlertaStock.objects.filter(
+                material_id__in=ids, proyecto__isnull=True
+            ),
+        )
+
+    if proyecto_material_ids:
+        filas = {
+            pk: (proyecto_id, material_id)
+            for pk, proyecto_id, material_id in ProyectoMaterial.objects.filter(
+                pk__in=proyecto_material_ids, stock_proyecto__lt=minimo
+            ).values_list("id", "proyecto_id", "material_id")
+        }
+        existentes = set(
+            AlertaStock.objects.filter(
+                proyecto_material_id__in=proyecto_material_ids
+            ).values_list("proyecto_material_id", flat=True)
+        )
+        _aplicar(
+            existentes,
+            set(filas),
+            lambda pk: AlertaStock(
+                proyecto_material_id=pk,
+                proyecto_id=filas[pk][0],
+                material_id=filas[pk][1],
+            ),
+            lambda ids: AlertaStock.objects.filter(proyecto_material_id__in=ids),
+        )
+
+
+def rebuild_stock_alerts():
+    """Reconstruye todo el índice. Devuelve ``(globales, por_proyecto)``."""
+    from catalog.models import Material
+    from .models import AlertaStock, ProyectoMaterial
+
+    porcentaje, minimo = umbrales()
+    globales = [
+        AlertaStock(material_id=material_id)
+        for material_id in Material.objects.filter(
+            stock__lte=F("presentation_qty") * porcentaje / Decimal("100")
+        ).values_list("id", flat=True)
+    ]
+    por_proyecto = [
+        AlertaStock(
+            proyecto_material_id=pk, proyecto_id=proyecto_id, material_id=material_id
+        )
+        for pk, proyecto_id, material_id in ProyectoMaterial.objects.filter(
+            stock_proyecto__lt=minimo
+        ).values_list("id", "proyecto_id", "material_id")
+    ]
+    with transaction.atomic():
+        AlertaStock.objects.all().delete()
+        AlertaStock.objects.bulk_create(globales + por_proyecto, batch_size=500)
+    return len(globales), len(por_proyecto)
+
+
+def alertas_stock(proyecto_id=None, nivel=None):
+    """
+    Alertas con todo lo necesario para mostrarlas cargado en la misma
+    consulta (material, unidad, proyecto y stock asignado). ``nivel`` es
+    ``"global"``, ``"proyecto"`` o ``None`` (ambos).
+    """
+    from .models import AlertaStock
+
+    alertas = AlertaStock.objects.select_related(
+        "material__unit", "proyecto", "proyecto_material"
+    ).order_by("-fecha", "-id")
+    if nivel == "global":
+        alertas = alertas.filter(proyecto__isnull=True)
+    elif nivel == "proyecto":
+        alertas = alertas.filter(proyecto__isnull=False)
+    if proyecto_id:
+        alertas = alertas.filter(proyecto_id=proyecto_id)
+    return alertas
@@ -0,0 +1,121 @@
+# projects/tests/test_board.py
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import MaterialSupplier, Supplier
+from projects.board import POR_PAGINA, construir_tablero, get_tablero
+from projects.models import BudgetSection, ConsumoMaterial, EntradaMaterial
+from projects.tests.test_ledger import crear_material
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+class ProjectBoardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username="tablero", email="tablero@example.com", password="x"
+        )
+        self.project = crear_proyecto(self.user)
+        self.etapa = BudgetSection.objects.create(name="Obra", order=1)
+        self.proveedor = Supplier.objects.create(name="Ferretería")
+
+    def comprar_materiales(self, cantidad):
+        for i in range(cantidad):
+            material = crear_material(f"MAT-{i}", f"Material {i:03d}", 1000)
+            EntradaMaterial.objects.create(
+                proyecto=self.project, material=material, cantidad=10,
+                lote="L", fecha_ingreso=date(2025, 1, 1), proveedor=self.proveedor,
+            )
+            ConsumoMaterial.objects.create(
+                proyecto=self.project, material=material,
+                cantidad_consumida=Decimal("4"), fecha_consumo=date(2025, 1, 2),
+                componente_actividad="Muros", etapa_presupuesto=self.etapa,
+                registrado_por=self.user,
+            )
+
+    def test_consultas_fijas(self):
+        self.comprar_materiales(3)
+        with self.assertNumQueries(3):  # compras, consumos y materiales
+            self.assertEqual(len(construir_tablero(self.project)), 3)
+
+        for i in range(3, 30):
+            material = crear_material(f"MAT-{i}", f"Material {i:03d}", 1000)
+            EntradaMaterial.objects.create(
+                proyecto=self.project, material=material, cantidad=1,
+                lote="L", fecha_ingreso=date(2025, 1, 1),
+            )
+        with self.assertNumQueries(3):
+            self.assertEqual(len(construir_tablero(self.project)), 30)
+
+    def test_precios_y_stock(self):
+        self.comprar_materiales(1)
+        material = self.project.entradas.get().material
+        MaterialSupplier.objects.create(
+            material=material, supplier=self.proveedor, price=800
+        )
+
+        grupo = construir_tablero(self.project)[0]
+        self.assertEqual(grupo["stock_proyecto"], Decimal("6"))
+        self.assertEqual(grupo["costo_total"], 8000)
+        self.assertEqual((grupo["compras"], grupo["consumos"]), (1, 1))
+
+    def test_cache_se_invalida_con_consumos(self):
+        self.comprar_materiales(2)
+        get_tablero(self.project)
+        with self.assertNumQueries(0):
+            get_tablero(self.project)
+
+        material = self.project.entradas.first().material
+        ConsumoMaterial.objects.create(
+            proyecto=self.project, material=material, cantidad_consumida=Decimal("1"),
+            fecha_consumo=date(2025, 1, 3), componente_actividad="Pisos",
+            etapa_presupuesto=self.etapa,
+        )
+        grupo = next(g for g in get_tablero(self.project) if g["material"] == material)
+        self.assertEqual(grupo["stock_proyecto"], Decimal("5"))
+
+    def test_vista_no_crece_con_materiales(self):
+        self.client.force_login(self.user)
+        url = reverse("projects:project_board", args=[self.project.id])
+        self.comprar_materiales(2)
+        cache.clear()
+        with self.assertNumQueries(6):  # sesión, usuario, proyecto y el tablero
+            response = self.client.get(url)
+        self.assertContains(response, "Material 001")
+        with self.assertNumQueries(3):  # tablero desde la caché
+            self.client.get(url)
+
+    def test_movimientos_paginados(self):
+        self.client.force_login(self.user)
+        self.comprar_materiales(1)
+        material = self.project.entradas.get().material
+        for dia in range(1, 25):
+            EntradaMaterial.objects.create(
+                proyecto=self.project, material=material, cantidad=1,
+                lote=f"L{dia}", fecha_ingreso=date(2025, 2, dia),
+            )
+        url = reverse(
+            "projects:tablero_movimientos", args=[self.project.id, material.id]
+        )
+
+        data = self.client.get(url, {"tipo": "compras"}).json()
+        self.assertEqual((data["total"], data["pagina"]), (25, 1))
+        self.assertIn("Lote:</strong> L24", data["html"])
+        self.assertEqual(data["html"].count("deleteModal"), 2 * POR_PAGINA)
+
+        data = self.client.get(data["siguiente"]).json()
+        self.assertEqual(data["pagina"], 2)
+        self.assertIsNone(data["siguiente"])
+        self.assertIn("Lote:</strong> L<", data["html"])
+
+        data = self.client.get(url, {"tipo": "consumos"}).json()
+        self.assertEqual(data["total"], 1)
+        self.assertIn("Muros", data["html"])
+        self.assertEqual(self.client.get(url, {"tipo": "otro"}).status_code, 400)
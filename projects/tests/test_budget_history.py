@@ -0,0 +1,112 @@
+# projects/tests/test_budget_history.py
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from projects.budget_history import (
+    crear_checkpoint,
+    diff_presupuesto,
+    presupuesto_en,
+    proyectos_con_cambios,
+)
+from projects.models import (
+    BudgetItem,
+    BudgetSection,
+    ProjectBudgetChange,
+    ProjectBudgetCheckpoint,
+    ProjectBudgetItem,
+)
+from projects.tests.test_pricing import crear_proyecto
+from projects.utils import guardar_cantidades_presupuesto
+
+User = get_user_model()
+
+
+class BudgetHistoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="historial", password="x", role=User.JEFE
+        )
+        self.project = crear_proyecto(self.user)
+        obra = BudgetSection.objects.create(name="Obra", order=1)
+        self.muro = BudgetItem.objects.create(
+            section=obra, description="Muro", unit="m2", unit_price=100
+        )
+        self.piso = BudgetItem.objects.create(
+            section=obra, description="Piso", unit="m2", unit_price=50, order=2
+        )
+
+    def _editar(self, cantidades, hace_dias):
+        """Edición en bloque con la fecha de sus cambios llevada al pasado."""
+        ultimo = (
+            ProjectBudgetChange.objects.order_by("-id")
+            .values_list("id", flat=True)
+            .first()
+        ) or 0
+        guardar_cantidades_presupuesto(self.project, cantidades)
+        ProjectBudgetChange.objects.filter(id__gt=ultimo).update(
+            fecha=timezone.now() - timedelta(days=hace_dias)
+        )
+
+    def test_edicion_en_bloque_registra_un_cambio_por_item(self):
+        self._editar({self.muro.pk: Decimal("10"), self.piso.pk: Decimal("4")}, 3)
+        self.assertEqual(ProjectBudgetChange.objects.count(), 2)
+
+        # Sin cambios: nada nuevo en el historial
+        self._editar({self.muro.pk: Decimal("10")}, 0)
+        self.assertEqual(ProjectBudgetChange.objects.count(), 2)
+
+    def test_presupuesto_en_fecha_con_checkpoint(self):
+        self._editar({self.muro.pk: Decimal("10"), self.piso.pk: Decimal("4")}, 10)
+        crear_checkpoint(self.project.pk, fecha=timezone.now() - timedelta(days=9))
+        self._editar({self.muro.pk: Decimal("12")}, 5)
+        ProjectBudgetItem.objects.get(
+            project=self.project, budget_item=self.piso
+        ).delete()
+
+        hace_7 = timezone.now() - timedelta(days=7)
+        with self.assertNumQueries(2):
+            antes = presupuesto_en(self.project, hace_7)
+        self.assertEqual(antes[self.muro.pk][2], Decimal("1000"))
+        self.assertEqual(antes[self.piso.pk][2], Decimal("200"))
+
+        ahora = presupuesto_en(self.project, timezone.now())
+        self.assertEqual(ahora[self.muro.pk][0], Decimal("12"))
+        self.assertNotIn(self.piso.pk, ahora)
+
+    def test_diff_entre_fechas(self):
+        self._editar({self.muro.pk: Decimal("10"), self.piso.pk: Decimal("4")}, 10)
+        self._editar({self.muro.pk: Decimal("12")}, 5)
+
+        diff = diff_presupuesto(
+            self.project, timezone.now() - timedelta(days=7), timezone.now()
+        )
+        self.assertEqual(diff["total_desde"], Decimal("1200"))
+        self.assertEqual(diff["total_hasta"], Decimal("1400"))
+        self.assertEqual(len(diff["items"]), 1)
+        self.assertEqual(diff["items"][0]["descripcion"], "Muro")
+        self.assertEqual(diff["items"][0]["diferencia"], Decimal("200"))
+
+        self.client.force_login(self.user)
+        desde = (timezone.localdate() - timedelta(days=7)).isoformat()
+        response = self.client.get(
+            reverse("projects:project_budget_diff", args=[self.project.pk]),
+            {"desde": desde},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()["diferencia"]), Decimal("200"))
+
+    def test_comando_checkpoints(self):
+        self._editar({self.muro.pk: Decimal("10")}, 1)
+        self.assertEqual(list(proyectos_con_cambios()), [self.project])
+
+        call_command("budget_checkpoints", stdout=StringIO())
+        checkpoint = ProjectBudgetCheckpoint.objects.get(project=self.project)
+        self.assertEqual(checkpoint.total, Decimal("1000"))
+        self.assertFalse(proyectos_con_cambios().exists())
@@ -0,0 +1,144 @@
+# projects/tests/test_budget_snapshot.py
+import io
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from openpyxl import load_workbook
+
+from projects.models import (
+    BudgetItem,
+    BudgetSection,
+    ProjectBudgetItem,
+    ProjectBudgetSectionTotal,
+)
+from projects.snapshots import get_budget_snapshot, snapshot_diferido
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+class BudgetSnapshotTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="snapshot", password="x")
+        self.obra = BudgetSection.objects.create(name="Obra", order=1)
+        self.admin = BudgetSection.objects.create(name="Administración", order=21)
+        self.excavacion = BudgetItem.objects.create(
+            section=self.obra, description="Excavación", unit="m3", unit_price=100
+        )
+        self.residente = BudgetItem.objects.create(
+            section=self.admin, description="Residente", unit="mes", unit_price=50
+        )
+        self.project = crear_proyecto(
+            self.user, administration_percentage=Decimal("10")
+        )
+
+    def test_save_y_delete_refrescan_la_seccion(self):
+        item = ProjectBudgetItem.objects.create(
+            project=self.project, budget_item=self.excavacion, quantity=10
+        )
+        ProjectBudgetItem.objects.create(
+            project=self.project, budget_item=self.residente, quantity=2
+        )
+
+        snapshot = get_budget_snapshot(self.project)
+        self.assertEqual(snapshot.costo_directo, Decimal("1000"))
+        self.assertEqual(snapshot.administracion_manual, Decimal("100"))
+        self.assertEqual(snapshot.administracion_automatica, Decimal("100"))
+        self.assertEqual(snapshot.total, self.project.calculate_final_budget())
+
+        item.delete()
+        snapshot = get_budget_snapshot(self.project)
+        self.assertEqual(snapshot.costo_directo, Decimal("0"))
+        self.assertFalse(
+            ProjectBudgetSectionTotal.objects.filter(
+                project=self.project, section=self.obra
+            ).exists()
+        )
+
+    def test_cambio_de_porcentaje_no_relee_los_items(self):
+        ProjectBudgetItem.objects.create(
+            project=self.project, budget_item=self.excavacion, quantity=10
+        )
+        self.project.administration_percentage = Decimal("20")
+        self.project.save()
+
+        snapshot = get_budget_snapshot(self.project)
+        self.assertEqual(snapshot.administracion_automatica, Decimal("200"))
+
+    def test_edicion_en_bloque_refresca_una_sola_vez(self):
+        items = [
+            BudgetItem.objects.create(
+                section=self.obra, description=f"Ítem {i}", unit="un", unit_price=10
+            )
+            for i in range(10)
+        ]
+        with snapshot_diferido():
+            for item in items:
+                ProjectBudgetItem.objects.create(
+                    project=self.project, budget_item=item, quantity=1
+                )
+            self.assertFalse(
+                ProjectBudgetSectionTotal.objects.filter(project=self.project).exists()
+            )
+
+        fila = ProjectBudgetSectionTotal.objects.get(
+            project=self.project, section=self.obra
+        )
+        self.assertEqual(fila.total, Decimal("100"))
+        self.assertEqual(fila.items_count, 10)
+
+    def test_error_en_el_bloque_refresca_lo_guardado(self):
+        with self.assertRaises(ValueError):
+            with snapshot_diferido():
+                ProjectBudgetItem.objects.create(
+                    project=self.project, budget_item=self.excavacion, quantity=10
+                )
+                raise ValueError("falla a mitad de la edición")
+
+        # El ítem quedó escrito: el snapshot debe reflejarlo
+        self.assertEqual(get_budget_snapshot(self.project).costo_directo, 1000)
+        fila = ProjectBudgetSectionTotal.objects.get(
+            project=self.project, section=self.obra
+        )
+        self.assertEqual(fila.items_count, 1)
+
+    def test_vistas_suman_solo_items_activos(self):
+        ProjectBudgetItem.objects.create(
+            project=self.project, budget_item=self.excavacion, quantity=10
+        )
+        inactivo = BudgetItem.objects.create(
+            section=self.obra, description="Relleno", unit="m3", unit_price=30,
+            is_active=False,
+        )
+        ProjectBudgetItem.objects.create(
+            project=self.project, budget_item=inactivo, quantity=10
+        )
+        self.user.role = User.CONSTRUCTOR
+        self.user.save()
+        self.client.force_login(self.user)
+
+        response = self.client.get(
+            reverse("projects:detailed_budget_view", args=[self.project.id])
+        )
+        obra = next(
+            data for data in response.context["section_data"]
+            if data["section"].id == self.obra.id
+        )
+        self.assertEqual([data["item"] for data in obra["items"]], [self.excavacion])
+        self.assertEqual(obra["total"], Decimal("1000"))
+        self.assertEqual(response.context["costo_directo"], Decimal("1000"))
+        self.assertEqual(response.context["administracion_automatica"], Decimal("100"))
+
+        self.user.role = User.JEFE
+        self.user.save()
+        response = self.client.get(
+            reverse("projects:export_budget_to_excel", args=[self.project.id])
+        )
+        resumen = load_workbook(io.BytesIO(response.content)).worksheets[0]
+        valores = {
+            fila[0]: fila[2] for fila in resumen.iter_rows(values_only=True) if fila[0]
+        }
+        self.assertEqual(valores["SUBTOTAL (Costos Directos)"], 1000)
+        self.assertEqual(valores["Administración (10.00%)"], 100)
@@ -0,0 +1,60 @@
+# projects/tests/test_budget_template.py
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from projects.budget_template import get_budget_template
+from projects.models import BudgetItem, BudgetSection
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+class BudgetTemplateCacheTest(TestCase):
+    def setUp(self):
+        self.obra = BudgetSection.objects.create(name="Obra", order=1)
+        self.admin = BudgetSection.objects.create(
+            name="Administración", order=21, is_percentage=True,
+            percentage_value=Decimal("12"),
+        )
+        self.muro = BudgetItem.objects.create(
+            section=self.obra, description="Muro", unit="m2", unit_price=10, order=2
+        )
+        self.piso = BudgetItem.objects.create(
+            section=self.obra, description="Piso", unit="m2", unit_price=20, order=1
+        )
+
+    def test_arbol_ordenado_y_sin_consultas_entre_ediciones(self):
+        template = get_budget_template()
+        self.assertEqual([s.order for s in template.sections], [1, 21])
+        self.assertEqual(
+            [i.description for i in template.section(1).active_items], ["Piso", "Muro"]
+        )
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_budget_template(), template)
+
+    def test_editar_precio_o_estado_invalida_la_plantilla(self):
+        get_budget_template()
+        self.muro.unit_price = 15
+        self.muro.is_active = False
+        self.muro.save()
+
+        seccion = get_budget_template().section(1)
+        self.assertEqual([i.description for i in seccion.active_items], ["Piso"])
+        self.assertEqual(seccion.items[1].unit_price, Decimal("15"))
+
+        self.admin.percentage_value = Decimal("10")
+        self.admin.save()
+        self.assertEqual(
+            get_budget_template().section(21).percentage_value, Decimal("10")
+        )
+
+    def test_copias_de_secciones_por_proyecto_no_invalidan(self):
+        user = User.objects.create_user(username="plantilla", password="x")
+        project = crear_proyecto(user)
+        template = get_budget_template()
+
+        BudgetSection.objects.create(project=project, name="Obra", order=1)
+        self.assertIs(get_budget_template(), template)
@@ -0,0 +1,248 @@
+# projects/tests/test_bulk_budget.py
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from projects.forms import BudgetSectionFormSet
+from projects.models import BudgetItem, BudgetSection, Project, ProjectBudgetItem
+from projects.pricing import get_pricing_table
+from projects.snapshots import get_budget_snapshot
+from projects.tests.test_pricing import crear_proyecto
+from projects.utils import guardar_cantidades_presupuesto
+
+User = get_user_model()
+
+
+class RecalculateBudgetsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="bulk", password="x")
+        obra = BudgetSection.objects.create(name="Obra", order=1)
+        admin = BudgetSection.objects.create(name="Administración", order=21)
+        self.item_obra = BudgetItem.objects.create(
+            section=obra, description="Excavación", unit="m3", unit_price=100
+        )
+        self.item_admin = BudgetItem.objects.create(
+            section=admin, description="Residente", unit="mes", unit_price=50
+        )
+
+        self.detallado = crear_proyecto(
+            self.user, name="Detallado", administration_percentage=Decimal("10")
+        )
+        ProjectBudgetItem.objects.create(
+            project=self.detallado, budget_item=self.item_obra, quantity=10000
+        )
+        ProjectBudgetItem.objects.create(
+            project=self.detallado, budget_item=self.item_admin, quantity=2
+        )
+        self.tradicional = crear_proyecto(self.user, name="Sin ítems")
+
+    def test_mismo_resultado_que_calculate_final_budget(self):
+        esperado = {
+            p.pk: p.calculate_final_budget() for p in Project.objects.all()
+        }
+        # costo directo 1.000.000 + 10% + administración manual 100
+        self.assertEqual(esperado[self.detallado.pk], Decimal("1100100"))
+
+        updated = Project.objects.all().recalculate_budgets()
+
+        self.assertEqual(updated, 2)
+        for project in Project.objects.all():
+            self.assertEqual(project.presupuesto, esperado[project.pk])
+
+    def test_numero_de_consultas_no_depende_de_los_proyectos(self):
+        for i in range(5):
+            crear_proyecto(self.user, name=f"Extra {i}")
+        get_pricing_table()
+
+        # totales agrupados + lectura de proyectos + bulk_update (+ savepoint)
+        with self.assertNumQueries(5):
+            Project.objects.all().recalculate_budgets(batch_size=100)
+
+
+class GuardarCantidadesPresupuestoTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="upsert", password="x")
+        self.project = crear_proyecto(self.user)
+        seccion = BudgetSection.objects.create(name="Obra", order=1)
+        self.items = [
+            BudgetItem.objects.create(
+                section=seccion, description=f"Ítem {i}", unit="un", unit_price=10
+            )
+            for i in range(50)
+        ]
+
+    def test_upsert_en_pocas_consultas_y_omite_filas_sin_cambios(self):
+        cantidades = {item.id: Decimal("2") for item in self.items}
+        guardar_cantidades_presupuesto(self.project, cantidades)
+        snapshot = get_budget_snapshot(self.project)
+        self.assertEqual(snapshot.costo_directo, Decimal("1000"))
+
+        cantidades[self.items[0].id] = Decimal("12.5")
+        # existentes + ítems + upsert + historial + refresco del resumen (una sección)
+        with self.assertNumQueries(15):
+            cambiados = guardar_cantidades_presupuesto(self.project, cantidades)
+
+        self.assertEqual(cambiados, 1)
+        item = ProjectBudgetItem.objects.get(
+            project=self.project, budget_item=self.items[0]
+        )
+        self.assertEqual(item.total_price, Decimal("125"))
+        snapshot = get_budget_snapshot(self.project)
+        self.assertEqual(snapshot.costo_directo, Decimal("1105"))
+
+        with self.assertNumQueries(2):
+            cambiados = guardar_cantidades_presupuesto(self.project, cantidades)
+        self.assertEqual(cambiados, 0)
+
+    def test_vista_ignora_cantidades_no_finitas_o_negativas(self):
+        self.user.role = User.CONSTRUCTOR
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("projects:detailed_budget_edit", args=[self.project.id]),
+            {
+                f"quantity_{self.items[0].id}": "NaN",
+                f"quantity_{self.items[1].id}": "Infinity",
+                f"quantity_{self.items[2].id}": "-3",
+                f"quantity_{self.items[3].id}": "4",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(
+                ProjectBudgetItem.objects.filter(project=self.project).values_list(
+                    "budget_item_id", "quantity"
+                )
+            ),
+            [(self.items[3].id, Decimal("4"))],
+        )
+
+    def test_cantidades_fuera_de_rango(self):
+        self.items[1].unit_price = Decimal("9999999999999")
+        self.items[1].save()
+        with self.assertRaises(ValueError):
+            guardar_cantidades_presupuesto(
+                self.project, {self.items[0].id: Decimal("1e30")}
+            )
+        with self.assertRaises(ValueError):
+            guardar_cantidades_presupuesto(
+                self.project, {self.items[1].id: Decimal("10")}
+            )
+        self.assertFalse(
+            ProjectBudgetItem.objects.filter(project=self.project).exists()
+        )
+
+        self.user.role = User.CONSTRUCTOR
+        self.user.save()
+        self.client.force_login(self.user)
+        url = reverse("projects:detailed_budget_edit", args=[self.project.id])
+        response = self.client.post(
+            url,
+            {
+                f"quantity_{self.items[0].id}": "1e30",
+                f"quantity_{self.items[2].id}": "1000000000",
+                f"quantity_{self.items[3].id}": "4",
+            },
+            follow=True,
+        )
+        self.assertContains(response, "Se omitieron 2 cantidades inválidas")
+        self.assertEqual(
+            list(
+                ProjectBudgetItem.objects.filter(project=self.project).values_list(
+                    "budget_item_id", "quantity"
+                )
+            ),
+            [(self.items[3].id, Decimal("4"))],
+        )
+
+        # El total no cabe en total_price: se avisa sin escribir nada
+        response = self.client.post(
+            url, {f"quantity_{self.items[1].id}": "10"}, follow=True
+        )
+        self.assertContains(response, "No se guardó el presupuesto")
+        self.assertEqual(
+            ProjectBudgetItem.objects.filter(project=self.project).count(), 1
+        )
+
+
+class BudgetSectionFormSetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="formset", password="x")
+        self.project = crear_proyecto(self.user)
+        self.sections = []
+        for order in range(1, 6):
+            section = BudgetSection.objects.create(name=f"Sección {order}", order=order)
+            for i in range(4):
+                BudgetItem.objects.create(
+                    section=section, description=f"Ítem {i}", unit="un", unit_price=10
+                )
+            self.sections.append(section)
+
+    def test_construye_todas_las_secciones_en_tres_consultas(self):
+        with self.assertNumQueries(3):
+            formset = BudgetSectionFormSet(
+                BudgetSection.objects.order_by("order"), self.project
+            )
+        self.assertEqual(len(formset), 5)
+        self.assertEqual([len(entry["items"]) for entry in formset], [4] * 5)
+
+    def test_guarda_todas_las_secciones_en_una_escritura(self):
+        data = {
+            f"quantity_{item_id}": "2"
+            for item_id in BudgetItem.objects.values_list("id", flat=True)
+        }
+        formset = BudgetSectionFormSet(self.sections, self.project, data)
+
+        self.assertEqual(formset.save(self.project), 5)
+        self.assertEqual(self.project.budget_items.count(), 20)
+        snapshot = get_budget_snapshot(self.project)
+        self.assertEqual(snapshot.costo_directo, Decimal("400"))
+
+        # Al editar, los valores iniciales salen del mapa pre-cargado
+        formset = BudgetSectionFormSet(self.sections, self.project)
+        form = formset.forms[0]["form"]
+        self.assertEqual(
+            [field.initial for field in form.fields.values()], [Decimal("2.000")] * 4
+        )
+
+    def test_secciones_invalidas_no_se_omiten_en_silencio(self):
+        items = list(BudgetItem.objects.filter(section=self.sections[1]))
+        data = {f"quantity_{items[0].id}": "-1", f"quantity_{items[1].id}": "3"}
+        formset = BudgetSectionFormSet(self.sections, self.project, data)
+
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(
+            [(section, item) for section, item, _ in formset.errors],
+            [(self.sections[1], items[0])],
+        )
+        with self.assertRaises(ValueError):
+            formset.save(self.project)
+        self.assertFalse(self.project.budget_items.exists())
+
+        # La vista no crea el proyecto y muestra el error con el valor enviado
+        self.user.role = User.CONSTRUCTOR
+        self.user.save()
+        self.client.force_login(self.user)
+        proyectos = Project.objects.count()
+        response = self.client.post(
+            reverse("projects:detailed_project_create"),
+            {"name": "Nuevo", "location_address": "Calle 1", "estado": "futuro", **data},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Project.objects.count(), proyectos)
+        self.assertContains(response, "2. Sección 2 - Ítem 0")
+        self.assertContains(response, 'value="-1"')
+
+        data[f"quantity_{items[0].id}"] = "1"
+        response = self.client.post(
+            reverse("projects:detailed_project_create"),
+            {"name": "Nuevo", "location_address": "Calle 1", "estado": "futuro", **data},
+        )
+        nuevo = Project.objects.get(name="Nuevo")
+        self.assertRedirects(
+            response, reverse("projects:detailed_budget_view", args=[nuevo.id]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(get_budget_snapshot(nuevo).costo_directo, Decimal("40"))
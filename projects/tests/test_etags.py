@@ -0,0 +1,91 @@
+# projects/tests/test_etags.py
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from projects.models import BudgetItem, BudgetSection, EntradaMaterial
+from projects.rebasing import rebase_budget_prices
+from projects.tests.test_ledger import crear_material
+from projects.tests.test_pricing import crear_proyecto
+from projects.utils import guardar_cantidades_presupuesto
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username="etag", email="etag@example.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.project = crear_proyecto(self.user)
+        self.cemento = crear_material("CEM-1", "Cemento", 1000)
+        self.url = reverse("projects:obtener_consumos_mes", args=[self.project.pk])
+        self.params = {"mes": 1, "anio": 2025}
+
+    def test_304_sin_cambios_y_200_tras_escribir(self):
+        primera = self.client.get(self.url, self.params)
+        etag = primera["ETag"]
+        self.assertIn("no-cache", primera["Cache-Control"])
+
+        # Sesión, usuario y permiso sobre el proyecto; la vista no se ejecuta
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        # Otro mes es otra URL
+        otra = self.client.get(
+            self.url, {"mes": 2, "anio": 2025}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(otra.status_code, 200)
+
+        EntradaMaterial.objects.create(
+            proyecto=self.project, material=self.cemento, cantidad=5,
+            lote="L", fecha_ingreso=date(2025, 1, 1),
+        )
+        respuesta = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta["ETag"], etag)
+
+    def test_catalogo(self):
+        url = reverse("projects:search_materials")
+        etag = self.client.get(url, {"q": "cem"})["ETag"]
+        respuesta = self.client.get(url, {"q": "cem"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        self.cemento.name = "Cemento gris"
+        self.cemento.save()
+        respuesta = self.client.get(url, {"q": "cem"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_escrituras_en_bloque_cambian_la_etag(self):
+        item = BudgetItem.objects.create(
+            section=BudgetSection.objects.create(name="Obra", order=1),
+            description="Muro", unit="m2", unit_price=1000,
+        )
+        graficos = reverse("projects:api_datos_graficos", args=[self.project.pk])
+        kpis = reverse("dashboard:kpis_data")
+
+        def etags():
+            return [self.client.get(url)["ETag"] for url in (graficos, kpis)]
+
+        antes = etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            guardar_cantidades_presupuesto(self.project, {item.pk: Decimal("10")})
+        despues = etags()
+        self.assertNotEqual(antes[0], despues[0])
+        self.assertNotEqual(antes[1], despues[1])
+
+        # Re-valorar con el precio vigente tampoco deja ETag viejas
+        item.unit_price = 1500
+        item.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(len(rebase_budget_prices()), 1)
+        final = etags()
+        self.assertNotEqual(despues[0], final[0])
+        self.assertNotEqual(despues[1], final[1])
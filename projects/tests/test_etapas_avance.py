@@ -0,0 +1,67 @@
+# projects/tests/test_etapas_avance.py
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from projects.budget_template import get_budget_template
+from projects.models import (
+    BudgetItem,
+    BudgetSection,
+    ConsumoMaterial,
+    EntradaMaterial,
+    ProjectBudgetItem,
+)
+from projects.tests.test_ledger import crear_material
+from projects.tests.test_pricing import crear_proyecto
+from projects.utils import get_etapas_con_avance
+
+User = get_user_model()
+
+
+class EtapasConAvanceAgrupadoTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="etapas", password="x")
+        self.project = crear_proyecto(self.user)
+        self.secciones = [
+            BudgetSection.objects.create(name=f"Etapa {i}", order=i)
+            for i in range(1, 6)
+        ]
+        cemento = crear_material("CEM-1", "Cemento", 10, stock=0)
+
+        item = BudgetItem.objects.create(
+            section=self.secciones[0], description="Muro", unit="m2", unit_price=10
+        )
+        ProjectBudgetItem.objects.create(
+            project=self.project, budget_item=item, quantity=100
+        )
+
+        # Stock del proyecto para poder consumir
+        EntradaMaterial.objects.create(
+            proyecto=self.project, material=cemento, cantidad=500, lote="L",
+            fecha_ingreso="2025-01-01",
+        )
+        ConsumoMaterial.objects.create(
+            proyecto=self.project, material=cemento, cantidad_consumida=Decimal("90"),
+            fecha_consumo="2025-01-02", componente_actividad="Muros",
+            etapa_presupuesto=self.secciones[0],
+        )
+
+    def test_valores_y_estados(self):
+        etapas = get_etapas_con_avance(self.project)
+
+        nombres = [e["nombre"] for e in etapas]
+        self.assertEqual(nombres, [s.name for s in self.secciones])
+        primera = etapas[0]
+        self.assertEqual(primera["presupuesto"], Decimal("1000"))
+        self.assertEqual(primera["gasto"], Decimal("900"))
+        self.assertEqual(primera["estado"], "En el límite")
+        self.assertEqual(etapas[1]["estado"], "Pendiente de inicio")
+
+    def test_consultas_constantes_y_memorizadas(self):
+        get_budget_template()
+        # planificado + ejecutado; las secciones salen de la plantilla en memoria
+        with self.assertNumQueries(2):
+            get_etapas_con_avance(self.project)
+        with self.assertNumQueries(0):
+            get_etapas_con_avance(self.project)
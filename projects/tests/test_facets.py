@@ -0,0 +1,101 @@
+# projects/tests/test_facets.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+
+from projects.facets import contar_facetas, get_facetas
+from projects.listing import filtros_lista
+from projects.models import Project, Worker
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+def filtros(query=""):
+    return filtros_lista(QueryDict(query))
+
+
+class FacetasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username="facetas", email="facetas@example.com", password="x"
+        )
+        self.otro = User.objects.create_user(username="otro", password="x")
+        for i in range(3):
+            crear_proyecto(
+                self.user, name=f"Casa {i}", estado="en_proceso", presupuesto=50_000_000
+            )
+        crear_proyecto(
+            self.user, name="Bodega", estado="terminado", presupuesto=200_000_000
+        )
+        self.futuro = crear_proyecto(
+            self.otro, name="Torre", estado="futuro", presupuesto=2_000_000_000
+        )
+        self.futuro.workers.add(Worker.objects.create(name="Ana", phone="1"))
+
+    def test_una_consulta_para_todas_las_facetas(self):
+        with self.assertNumQueries(1):
+            conteos = contar_facetas(filtros())
+        self.assertEqual(
+            conteos["estado"], {"en_proceso": 3, "terminado": 1, "futuro": 1}
+        )
+        self.assertEqual(conteos["trabajadores"], {"0": 4, "1-3": 1})
+        self.assertEqual(
+            conteos["creador"], {str(self.user.id): 4, str(self.otro.id): 1}
+        )
+        self.assertEqual(
+            conteos["presupuesto"], {"0-100M": 3, "100M-500M": 1, "1000M+": 1}
+        )
+
+    def test_faceta_ignora_su_propio_filtro(self):
+        conteos = contar_facetas(filtros("status=en_proceso"))
+        # Los demás estados siguen con su total
+        self.assertEqual(
+            conteos["estado"], {"en_proceso": 3, "terminado": 1, "futuro": 1}
+        )
+        # Las otras facetas sí se restringen al estado elegido
+        self.assertEqual(conteos["creador"], {str(self.user.id): 3})
+        self.assertEqual(conteos["trabajadores"], {"0": 3})
+
+    def test_cache_por_filtros(self):
+        get_facetas(filtros("search=casa"))
+        with self.assertNumQueries(0):
+            conteos = get_facetas(filtros("search=casa"))
+        self.assertEqual(conteos["estado"], {"en_proceso": 3})
+
+        # Guardar un proyecto invalida los conteos
+        Project.objects.filter(pk=self.futuro.pk).first().save()
+        with self.assertNumQueries(1):
+            get_facetas(filtros("search=casa"))
+
+    def test_faceta_de_ciudad_filtra_la_ciudad_que_cuenta(self):
+        Project.objects.filter(pk=self.futuro.pk).update(ubicacion_proyecto="Bogota")
+        conteos = contar_facetas(filtros("ciudad=bogota"))
+        # La faceta ignora su propio filtro; las demás se restringen a Bogotá
+        self.assertEqual(conteos["ubicacion"], {"medellin": 4, "bogota": 1})
+        self.assertEqual(conteos["estado"], {"futuro": 1})
+        self.assertIsNone(filtros("ciudad=Narnia")["ciudad"])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("projects:project_list"))
+        self.assertIn(
+            ("bogota", "Bogotá", 1, "ciudad=bogota"),
+            response.context["facetas_ubicacion"],
+        )
+        response = self.client.get(
+            reverse("projects:project_list"), {"ciudad": "bogota", "status": "todos"}
+        )
+        self.assertEqual(
+            [p.pk for p in response.context["projects_chronological"]], [self.futuro.pk]
+        )
+
+    def test_vista_muestra_conteos(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("projects:project_list"))
+        self.assertContains(response, "En Proceso (3)")
+        self.assertIn(
+            ("1-3", "1-3 trabajadores", 1), response.context["opciones_trabajadores"]
+        )
@@ -0,0 +1,116 @@
+# projects/tests/test_ledger.py
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from catalog.models import Category, Material, MaterialSupplier, Supplier, Unit
+from projects.ledger import rebuild_spend_ledger
+from projects.models import EntradaMaterial, Project, ProyectoMaterial
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+def crear_material(sku, name, unit_cost, **kwargs):
+    unit, _ = Unit.objects.get_or_create(name="Bulto", symbol="bto")
+    category, _ = Category.objects.get_or_create(name="Obra gris", code="GRIS")
+    return Material.objects.create(
+        sku=sku, name=name, unit=unit, category=category, unit_cost=unit_cost, **kwargs
+    )
+
+
+class SpendLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="gasto", password="x")
+        self.project = crear_proyecto(self.user)
+        self.cemento = crear_material("CEM-1", "Cemento", 30000)
+        self.arena = crear_material("ARE-1", "Arena", 5000)
+        self.proveedor = Supplier.objects.create(name="Ferretería")
+        MaterialSupplier.objects.create(
+            material=self.cemento, supplier=self.proveedor, price=28000
+        )
+
+    def comprar(self, material, cantidad, proveedor=None):
+        return EntradaMaterial.objects.create(
+            proyecto=self.project,
+            material=material,
+            cantidad=cantidad,
+            lote="L1",
+            proveedor=proveedor,
+            fecha_ingreso="2025-01-01",
+        )
+
+    def gasto(self):
+        return Project.objects.get(pk=self.project.pk).presupuesto_gastado_calculado
+
+    def test_entradas_actualizan_el_libro(self):
+        entrada = self.comprar(self.cemento, 10, self.proveedor)  # precio proveedor
+        self.comprar(self.arena, 4)  # sin proveedor: unit_cost
+        self.assertEqual(self.gasto(), Decimal("300000"))
+
+        pm = ProyectoMaterial.objects.get(proyecto=self.project, material=self.cemento)
+        self.assertEqual(pm.gasto_acumulado, Decimal("280000"))
+
+        entrada.cantidad = 5
+        entrada.save()
+        self.assertEqual(self.gasto(), Decimal("160000"))
+
+        entrada.delete()
+        self.assertEqual(self.gasto(), Decimal("20000"))
+
+    def test_lectura_del_gasto_no_consulta_la_bd(self):
+        self.comprar(self.arena, 4)
+        project = Project.objects.get(pk=self.project.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(project.presupuesto_actual, project.presupuesto - 20000)
+
+    def test_cambio_de_precio_revalora_las_compras(self):
+        self.comprar(self.cemento, 10, self.proveedor)
+        MaterialSupplier.objects.filter(material=self.cemento).get().delete()
+        # Sin precio de proveedor se usa el unit_cost del material
+        self.assertEqual(self.gasto(), Decimal("300000"))
+
+    def test_solo_revalora_si_cambia_el_precio(self):
+        self.comprar(self.cemento, 10, self.proveedor)
+        precio = MaterialSupplier.objects.get(material=self.cemento)
+        with mock.patch("projects.signals.rebuild_spend_ledger") as rebuild:
+            self.cemento.name = "Cemento gris"
+            self.cemento.stock = 5
+            self.cemento.save()
+            precio.save()
+            rebuild.assert_not_called()
+
+            self.cemento.unit_cost = 31000
+            self.cemento.save()
+            self.assertEqual(rebuild.call_count, 1)
+
+        precio.price = 29000
+        precio.save()
+        self.assertEqual(self.gasto(), Decimal("290000"))
+
+    def test_reconciliacion_reporta_y_corrige_la_desviacion(self):
+        self.comprar(self.arena, 4)
+        Project.objects.filter(pk=self.project.pk).update(gasto_materiales=1)
+
+        desviacion = rebuild_spend_ledger(dry_run=True)
+        self.assertEqual(
+            desviacion["proyectos"], [(self.project.pk, Decimal("1"), Decimal("20000"))]
+        )
+        self.assertEqual(self.gasto(), Decimal("1"))
+
+        rebuild_spend_ledger()
+        self.assertEqual(self.gasto(), Decimal("20000"))
+        self.assertEqual(rebuild_spend_ledger(), {"proyectos": [], "materiales": []})
+
+    def test_with_spend_anota_el_gasto_en_una_consulta(self):
+        self.comprar(self.cemento, 10, self.proveedor)
+        self.comprar(self.arena, 4)
+        otro = crear_proyecto(self.user, name="Sin compras")
+
+        with self.assertNumQueries(1):
+            gastos = {p.pk: p.gasto_calculado for p in Project.objects.with_spend()}
+
+        self.assertEqual(gastos[self.project.pk], Decimal("300000"))
+        self.assertEqual(gastos[otro.pk], Decimal("0"))
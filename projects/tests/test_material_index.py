@@ -0,0 +1,55 @@
+# projects/tests/test_material_index.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from projects.material_index import compilar_indice
+from projects.tests.test_ledger import crear_material
+
+User = get_user_model()
+
+
+class MaterialIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.indice = compilar_indice([
+            (1, "ADO-1", "Adoquín gris", "m2", "Metro cuadrado"),
+            (2, "ARE-1", "Arena de peña", "m3", "Metro cúbico"),
+            (3, "CEM-1", "Cemento gris", "bto", "Bulto"),
+            (4, "GRI-10", "Grifería lavamanos", "und", "Unidad"),
+        ])
+
+    def nombres(self, texto):
+        return [m["name"] for m in self.indice.buscar(texto)]
+
+    def test_prefijos_sin_tildes_y_varias_palabras(self):
+        self.assertEqual(self.nombres("adoqui"), ["Adoquín gris"])
+        self.assertEqual(self.nombres("gris"), ["Adoquín gris", "Cemento gris"])
+        self.assertEqual(self.nombres("gris cem"), ["Cemento gris"])
+        self.assertEqual(self.nombres("pena"), ["Arena de peña"])
+        self.assertEqual(self.nombres("xyz"), [])
+
+    def test_sku_exacto_primero(self):
+        self.assertEqual(
+            self.nombres("gri"), ["Grifería lavamanos", "Adoquín gris", "Cemento gris"]
+        )
+        self.assertEqual(self.nombres("cem-1"), ["Cemento gris"])
+
+
+class SearchMaterialsEndpointTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="autocompletar", password="x")
+        self.client.force_login(self.user)
+        crear_material("CEM-1", "Cemento", 1000)
+
+    def test_sin_consultas_con_el_indice_construido(self):
+        url = reverse("projects:search_materials")
+        self.client.get(url, {"q": "cem"})
+        with self.assertNumQueries(2):  # sesión y usuario
+            data = self.client.get(url, {"q": "ceme"}).json()
+        self.assertEqual([r["sku"] for r in data["results"]], ["CEM-1"])
+
+        crear_material("CEM-2", "Cemento blanco", 1200)
+        data = self.client.get(url, {"q": "cemento bla"}).json()
+        self.assertEqual([r["sku"] for r in data["results"]], ["CEM-2"])
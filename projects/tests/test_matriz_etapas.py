@@ -0,0 +1,64 @@
+# projects/tests/test_matriz_etapas.py
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from projects.budget_template import get_budget_template
+from projects.models import (
+    BudgetItem,
+    BudgetSection,
+    ConsumoMaterial,
+    EntradaMaterial,
+    Project,
+    ProjectBudgetItem,
+)
+from projects.tests.test_ledger import crear_material
+from projects.tests.test_pricing import crear_proyecto
+from projects.utils import get_matriz_etapas
+
+User = get_user_model()
+
+
+class MatrizEtapasTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="matriz", password="x")
+        self.secciones = [
+            BudgetSection.objects.create(name=f"Etapa {i}", order=i)
+            for i in range(1, 4)
+        ]
+        item = BudgetItem.objects.create(
+            section=self.secciones[0], description="Muro", unit="m2", unit_price=10
+        )
+        self.cemento = crear_material("CEM-1", "Cemento", 10, stock=0)
+        self.proyectos = [crear_proyecto(self.user, name=f"P{i}") for i in range(3)]
+        for proyecto in self.proyectos:
+            ProjectBudgetItem.objects.create(
+                project=proyecto, budget_item=item, quantity=100
+            )
+        EntradaMaterial.objects.create(
+            proyecto=self.proyectos[0], material=self.cemento, cantidad=500,
+            lote="L", fecha_ingreso="2025-01-01",
+        )
+        ConsumoMaterial.objects.create(
+            proyecto=self.proyectos[0], material=self.cemento,
+            cantidad_consumida=Decimal("120"), fecha_consumo="2025-01-02",
+            componente_actividad="Muros", etapa_presupuesto=self.secciones[0],
+        )
+
+    def test_celdas_por_seccion_y_proyecto(self):
+        matriz = get_matriz_etapas(Project.objects.order_by("name"))
+
+        self.assertEqual([p["name"] for p in matriz["proyectos"]], ["P0", "P1", "P2"])
+        self.assertEqual(len(matriz["secciones"]), 3)
+        primera = matriz["secciones"][0]["celdas"]
+        self.assertEqual(primera[0]["presupuesto"], 1000)
+        self.assertEqual(primera[0]["gasto"], 1200)
+        self.assertEqual(primera[0]["estado"], "Sobrecosto")
+        self.assertEqual(primera[1]["estado"], "Pendiente de inicio")
+
+    def test_consultas_no_dependen_del_numero_de_proyectos(self):
+        get_budget_template()
+        # proyectos + presupuesto agrupado + consumo agrupado
+        with self.assertNumQueries(3):
+            get_matriz_etapas(Project.objects.all())
@@ -0,0 +1,88 @@
+# projects/tests/test_pricing.py
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from projects.models import Project, UnitPrice
+from projects.pricing import compile_pricing_table, get_pricing_table
+from projects.versioning import MAX_EDAD_LOCAL
+
+User = get_user_model()
+
+
+def crear_proyecto(user, **kwargs):
+    datos = dict(
+        name="Proyecto Precios",
+        location_address="Calle 1",
+        description="Desc",
+        built_area=100,
+        exterior_area=0,
+        columns_count=4,
+        walls_area=100,
+        windows_area=10,
+        doors_count=2,
+        area_construida_total=100,
+        creado_por=user,
+    )
+    datos.update(kwargs)
+    return Project.objects.create(**datos)
+
+
+class PricingTableTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="precios", password="x")
+        UnitPrice.objects.create(
+            category="construccion", item_name="construccion_m2", unit="m²", price=1000
+        )
+        UnitPrice.objects.create(
+            category="construccion",
+            item_name="factor_cali",
+            unit="factor",
+            price=Decimal("1.10"),
+        )
+        UnitPrice.objects.create(
+            category="pisos", item_name="bano_adicional", unit="unidad", price=500
+        )
+
+    def test_evaluate_aplica_base_factores_y_adicionales(self):
+        project = crear_proyecto(self.user, ubicacion_proyecto="cali", numero_banos=3)
+        # 100 m² * 1000 * 1.10 + 2 baños adicionales * 500
+        self.assertEqual(project.calculate_detailed_budget(), 111000)
+
+    def test_tabla_en_cache_no_consulta_la_bd(self):
+        project = crear_proyecto(self.user)
+        get_pricing_table()
+        with self.assertNumQueries(0):
+            project.calculate_detailed_budget()
+
+    def test_guardar_unit_price_invalida_la_tabla(self):
+        project = crear_proyecto(self.user)
+        self.assertEqual(project.calculate_detailed_budget(), 100000)
+
+        precio = UnitPrice.objects.get(item_name="construccion_m2")
+        precio.price = 2000
+        precio.save()
+        self.assertEqual(project.calculate_detailed_budget(), 200000)
+
+        precio.delete()
+        self.assertEqual(project.calculate_detailed_budget(), 0)
+
+    def test_copia_caduca_aunque_la_version_no_cambie(self):
+        # Un cambio hecho en otro proceso no mueve el contador de una caché local
+        project = crear_proyecto(self.user)
+        self.assertEqual(project.calculate_detailed_budget(), 100000)
+        UnitPrice.objects.filter(item_name="construccion_m2").update(price=2000)
+        self.assertEqual(project.calculate_detailed_budget(), 100000)
+
+        despues = time.monotonic() + MAX_EDAD_LOCAL + 1
+        with mock.patch("projects.versioning.time.monotonic", return_value=despues):
+            self.assertEqual(project.calculate_detailed_budget(), 200000)
+
+    def test_compile_ignora_precios_inexistentes(self):
+        table = compile_pricing_table({"factor_bogota": Decimal("1.2")})
+        self.assertIsNone(table.base_m2)
+        self.assertEqual(table.quantities, ())
+        self.assertEqual(table.factors[0][0], "ubicacion_proyecto")
@@ -0,0 +1,83 @@
+# projects/tests/test_project_list.py
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from projects.listing import PAGE_SIZE
+from projects.models import Project, Worker
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+class ProjectListTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username="lista", email="lista@example.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("projects:project_list")
+
+    def crear(self, cantidad, estado):
+        inicio = timezone.now() - timedelta(days=cantidad)
+        for i in range(cantidad):
+            project = crear_proyecto(self.user, name=f"{estado} {i}", estado=estado)
+            # Fechas repetidas de a dos para probar el desempate por id
+            Project.objects.filter(pk=project.pk).update(
+                fecha_creacion=inicio + timedelta(days=i // 2)
+            )
+
+    def consultas(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
+
+    def test_consultas_constantes_y_cursor_por_grupo(self):
+        self.crear(3, "en_proceso")
+        _, pocas = self.consultas()
+
+        self.crear(PAGE_SIZE * 2, "en_proceso")
+        self.crear(2, "terminado")
+        response, muchas = self.consultas()
+        self.assertEqual(pocas, muchas)
+
+        ctx = response.context
+        self.assertEqual(ctx["totales"]["en_proceso"], PAGE_SIZE * 2 + 3)
+        self.assertEqual(len(ctx["projects_en_proceso"]), PAGE_SIZE)
+        self.assertEqual(len(ctx["projects_terminados"]), 2)
+        self.assertIsNone(ctx["siguientes"]["terminado"])
+
+        # Recorrer el grupo con el cursor no repite ni salta proyectos
+        vistos = [p.pk for p in ctx["projects_en_proceso"]]
+        siguiente = ctx["siguientes"]["en_proceso"]
+        while siguiente:
+            response = self.client.get(f"{self.url}?{siguiente}")
+            vistos += [p.pk for p in response.context["projects_en_proceso"]]
+            # Los demás grupos siguen en su primera página
+            self.assertEqual(len(response.context["projects_terminados"]), 2)
+            siguiente = response.context["siguientes"]["en_proceso"]
+        esperados = list(
+            Project.objects.filter(estado="en_proceso")
+            .order_by("-fecha_creacion", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+
+    def test_cronologico_y_filtro_de_trabajadores(self):
+        self.crear(PAGE_SIZE + 1, "futuro")
+        response = self.client.get(self.url, {"status": "todos", "order": "asc"})
+        self.assertEqual(response.context["total_chronological"], PAGE_SIZE + 1)
+        self.assertEqual(len(response.context["projects_chronological"]), PAGE_SIZE)
+        self.assertIsNotNone(response.context["siguiente_chronological"])
+
+        project = Project.objects.first()
+        project.workers.add(Worker.objects.create(name="Ana", phone="1"))
+        response = self.client.get(self.url, {"trabajadores": "1-3"})
+        self.assertEqual(response.context["totales"]["futuro"], 1)
+        response = self.client.get(self.url, {"trabajadores": "0"})
+        self.assertEqual(response.context["totales"]["futuro"], PAGE_SIZE)
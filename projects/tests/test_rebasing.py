@@ -0,0 +1,87 @@
+# projects/tests/test_rebasing.py
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from dashboard.services import VERSION_KEY as KPIS_KEY
+from projects.etags import version_proyecto
+from projects.facets import VERSION_KEY as FACETAS_KEY
+from projects.models import BudgetItem, BudgetSection, Project, ProjectBudgetItem
+from projects.rebasing import rebase_budget_prices
+from projects.snapshots import get_budget_snapshot
+from projects.tests.test_pricing import crear_proyecto
+from projects.versioning import get_version
+
+User = get_user_model()
+
+
+class RebaseBudgetPricesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rebase", password="x")
+        obra = BudgetSection.objects.create(name="Obra", order=1)
+        self.item = BudgetItem.objects.create(
+            section=obra, description="Muro", unit="m2", unit_price=1000
+        )
+        self.abierto = crear_proyecto(
+            self.user, name="Abierto", administration_percentage=Decimal("10")
+        )
+        self.terminado = crear_proyecto(self.user, name="Terminado", estado="terminado")
+        for project in (self.abierto, self.terminado):
+            ProjectBudgetItem.objects.create(
+                project=project, budget_item=self.item, quantity=2000
+            )
+        Project.objects.all().recalculate_budgets()
+        get_budget_snapshot(self.abierto)
+
+        self.item.unit_price = 1500
+        self.item.save()
+
+    def test_dry_run_reporta_sin_guardar(self):
+        resultado = rebase_budget_prices(dry_run=True)
+
+        self.assertEqual(
+            resultado,
+            [(self.abierto.pk, "Abierto", Decimal("2200000"), Decimal("3300000"))],
+        )
+        pbi = ProjectBudgetItem.objects.get(project=self.abierto)
+        self.assertEqual(pbi.unit_price, Decimal("1000"))
+
+    def test_actualiza_solo_proyectos_abiertos(self):
+        rebase_budget_prices()
+
+        abierto = ProjectBudgetItem.objects.get(project=self.abierto)
+        self.assertEqual(abierto.unit_price, Decimal("1500"))
+        self.assertEqual(abierto.total_price, Decimal("3000000"))
+        terminado = ProjectBudgetItem.objects.get(project=self.terminado)
+        self.assertEqual(terminado.unit_price, Decimal("1000"))
+
+        self.abierto.refresh_from_db()
+        self.assertEqual(self.abierto.presupuesto, Decimal("3300000"))
+        self.assertEqual(get_budget_snapshot(self.abierto).total, Decimal("3300000"))
+
+        # Segunda corrida: nada pendiente
+        self.assertEqual(rebase_budget_prices(), [])
+
+    def test_comando(self):
+        out = StringIO()
+        call_command("rebase_budget_prices", "--dry-run", stdout=out)
+        self.assertIn("+1,100,000", out.getvalue())
+
+    def test_invalida_caches_al_confirmar(self):
+        nombres = (KPIS_KEY, FACETAS_KEY, version_proyecto(self.abierto.pk))
+        antes = [get_version(nombre) for nombre in nombres]
+        with self.captureOnCommitCallbacks(execute=True):
+            rebase_budget_prices()
+        despues = [get_version(nombre) for nombre in nombres]
+        for nombre, version, nueva in zip(nombres, antes, despues):
+            self.assertGreater(nueva, version, nombre)
+
+        # Solo se invalidan los proyectos recalculados
+        terminado = version_proyecto(self.terminado.pk)
+        version = get_version(terminado)
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(pk=self.abierto.pk).recalculate_budgets()
+        self.assertEqual(get_version(terminado), version)
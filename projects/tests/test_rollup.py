@@ -0,0 +1,79 @@
+# projects/tests/test_rollup.py
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from projects.models import (
+    BudgetSection,
+    ConsumoMaterial,
+    EntradaMaterial,
+    ProjectDailyKpi,
+)
+from projects.rollup import kpis_periodo, rebuild_daily_kpis
+from projects.tests.test_ledger import crear_material
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+class DailyKpiRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rollup", password="x")
+        self.project = crear_proyecto(self.user)
+        self.cemento = crear_material("CEM-1", "Cemento", 1000, stock=0)
+
+    def comprar(self, cantidad, fecha):
+        return EntradaMaterial.objects.create(
+            proyecto=self.project, material=self.cemento, cantidad=cantidad,
+            lote="L", fecha_ingreso=fecha,
+        )
+
+    def fila(self, fecha):
+        return ProjectDailyKpi.objects.get(proyecto=self.project, fecha=fecha)
+
+    def test_senales_mantienen_el_dia(self):
+        entrada = self.comprar(10, date(2025, 1, 1))
+        self.comprar(5, date(2025, 1, 1))
+        ConsumoMaterial.objects.create(
+            proyecto=self.project, material=self.cemento,
+            cantidad_consumida=Decimal("4"), fecha_consumo=date(2025, 1, 2),
+            componente_actividad="Muros",
+            etapa_presupuesto=BudgetSection.objects.create(name="Obra", order=1),
+        )
+        self.assertEqual(self.fila(date(2025, 1, 1)).costo_compras, Decimal("15000"))
+        self.assertEqual(self.fila(date(2025, 1, 2)).costo_consumos, Decimal("4000"))
+
+        # Mover la compra de día actualiza ambos días
+        entrada.fecha_ingreso = date(2025, 1, 3)
+        entrada.save()
+        self.assertEqual(self.fila(date(2025, 1, 1)).cantidad_compras, Decimal("5"))
+        self.assertEqual(self.fila(date(2025, 1, 3)).cantidad_compras, Decimal("10"))
+
+        entrada.delete()
+        self.assertFalse(
+            ProjectDailyKpi.objects.filter(
+                proyecto=self.project, fecha=date(2025, 1, 3)
+            ).exists()
+        )
+
+    def test_periodo_y_reconstruccion(self):
+        self.comprar(10, date(2025, 1, 1))
+        self.comprar(20, date(2025, 2, 1))
+
+        with self.assertNumQueries(1):
+            periodo = kpis_periodo(
+                fecha_desde=date(2025, 1, 15), fecha_hasta=date(2025, 2, 28)
+            )
+        self.assertEqual(periodo["costo_compras"], Decimal("20000"))
+
+        ProjectDailyKpi.objects.all().delete()
+        self.assertEqual(rebuild_daily_kpis(), 2)
+        self.assertEqual(kpis_periodo()["costo_compras"], Decimal("30000"))
+
+    def test_cambio_de_precio_revalora(self):
+        self.comprar(10, date(2025, 1, 1))
+        self.cemento.unit_cost = 2000
+        self.cemento.save()
+        self.assertEqual(self.fila(date(2025, 1, 1)).costo_compras, Decimal("20000"))
@@ -0,0 +1,146 @@
+# projects/tests/test_scenarios.py
+import copy
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import BooleanField
+from django.test import TestCase
+from django.urls import reverse
+
+from projects.models import Project, UnitPrice
+from projects.pricing import get_pricing_table
+from projects.scenarios import campos_simulables, evaluate_scenarios
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+PRECIOS = {
+    "construccion_m2": 1000,
+    "factor_bogota": Decimal("1.10"),
+    "factor_acabado_premium": Decimal("1.25"),
+    "factor_terreno_rocoso": Decimal("1.15"),
+    "factor_terreno_blando": Decimal("1.05"),
+    "factor_acceso_dificil": Decimal("1.20"),
+    "factor_tres_pisos": Decimal("1.30"),
+    "bano_adicional": 5000,
+    "estudios_disenos": 20000,
+}
+
+
+class ScenarioEngineTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="escenarios", password="x")
+        for name, price in PRECIOS.items():
+            UnitPrice.objects.create(
+                category="construccion", item_name=name, unit="u", price=price
+            )
+        self.project = crear_proyecto(self.user, numero_banos=2)
+
+    def test_mismo_resultado_que_calculate_detailed_budget(self):
+        grid = {
+            "acabado_muros": ["basico", "estandar", "premium"],
+            "tipo_terreno": ["blando", "normal", "rocoso"],
+            "acceso_obra": ["facil", "dificil"],
+            "numero_banos": [1, 3],
+            "incluir_estudios_disenos": [False, True],
+        }
+        escenarios = evaluate_scenarios(self.project, grid)
+
+        self.assertEqual(len(escenarios), 3 * 3 * 2 * 2 * 2)
+        costos = [e["presupuesto"] for e in escenarios]
+        self.assertEqual(costos, sorted(costos))
+
+        for escenario in escenarios:
+            variante = copy.copy(self.project)
+            for field, value in escenario["parametros"].items():
+                setattr(variante, field, value)
+            self.assertEqual(
+                escenario["presupuesto"], variante.calculate_detailed_budget()
+            )
+        self.assertEqual(
+            escenarios[0]["diferencia"],
+            escenarios[0]["presupuesto"] - self.project.calculate_detailed_budget(),
+        )
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_mil_variantes_sin_consultas(self):
+        grid = {
+            "acabado_muros": ["basico", "estandar", "premium"],
+            "numero_pisos": ["1", "2", "3_mas"],
+            "area_construida_total": list(range(50, 161)),
+        }
+        get_pricing_table()
+
+        with self.assertNumQueries(0):
+            escenarios = evaluate_scenarios(self.project, grid)
+        self.assertEqual(len(escenarios), 999)
+        self.assertEqual(
+            escenarios[-1]["parametros"],
+            {
+                "acabado_muros": "premium",
+                "numero_pisos": "3_mas",
+                "area_construida_total": 160,
+            },
+        )
+
+    def test_ubicacion_igual_que_el_presupuesto_guardado(self):
+        # Las opciones se aceptan sin distinguir mayúsculas y se simulan con
+        # el valor que se guarda, igual que calculate_detailed_budget
+        escenarios = evaluate_scenarios(
+            self.project, {"ubicacion_proyecto": ["medellin", "BOGOTA"]}
+        )
+        presupuestos = {
+            e["parametros"]["ubicacion_proyecto"]: e["presupuesto"] for e in escenarios
+        }
+        self.assertEqual(set(presupuestos), {"Medellin", "Bogota"})
+        for ubicacion, presupuesto in presupuestos.items():
+            self.project.ubicacion_proyecto = ubicacion
+            self.assertEqual(self.project.calculate_detailed_budget(), presupuesto)
+
+    def test_campos_y_valores_invalidos(self):
+        with self.assertRaises(ValueError):
+            evaluate_scenarios(self.project, {"name": ["otro"]})
+        with self.assertRaises(ValueError):
+            evaluate_scenarios(self.project, {"tipo_terreno": ["pantano"]})
+        # Un texto no es una lista de valores
+        with self.assertRaises(ValueError):
+            evaluate_scenarios(self.project, {"tipo_terreno": "rocoso"})
+
+    def test_valores_repetidos_se_simulan_una_vez(self):
+        escenarios = evaluate_scenarios(
+            self.project, {"numero_banos": [1, "1", 2, 1], "acabado_muros": ["basico"]}
+        )
+        self.assertEqual(len(escenarios), 2)
+
+    def test_grilla_enorme_no_desborda_el_conteo(self):
+        # Más de 2**63 combinaciones: con int64 el conteo daba negativo
+        grid = {}
+        for field in campos_simulables():
+            model_field = Project._meta.get_field(field)
+            if model_field.choices:
+                grid[field] = [value for value, _ in model_field.flatchoices]
+            elif isinstance(model_field, BooleanField):
+                grid[field] = [False, True]
+            else:
+                grid[field] = list(range(1, 1501))
+        with self.assertRaisesMessage(ValueError, "combinaciones"):
+            evaluate_scenarios(self.project, grid)
+
+    def test_endpoint_permisos_y_cuerpo_invalido(self):
+        url = reverse("projects:project_scenarios", args=[self.project.id])
+        grid = {"grid": {"tipo_terreno": ["normal", "rocoso"]}}
+
+        otro = User.objects.create_user(
+            username="otro", password="x", role=User.CONSTRUCTOR
+        )
+        self.client.force_login(otro)
+        response = self.client.post(url, grid, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(
+            User.objects.create_user(username="jefe", password="x", role=User.JEFE)
+        )
+        response = self.client.post(url, [], content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, grid, content_type="application/json")
+        self.assertEqual(response.json()["total"], 2)
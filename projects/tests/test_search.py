@@ -0,0 +1,34 @@
+# projects/tests/test_search.py
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from projects.models import Project
+from projects.search import buscar_proyectos, consulta
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+class ProjectSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="busqueda", password="x")
+        self.casa = crear_proyecto(
+            self.user, name="Casa campestre", location_address="Vereda El Tablazo"
+        )
+        self.bodega = crear_proyecto(
+            self.user, name="Bodega", description="Ampliación de la casa"
+        )
+
+    def test_consulta_con_prefijos_sin_sintaxis_del_usuario(self):
+        _, valor = consulta("casa & medell:*!").get_source_expressions()
+        self.assertEqual(valor.value, "casa:* & medell:*")
+        self.assertIsNone(consulta("¡!"))
+
+    def test_busqueda_portatil(self):
+        # SQLite: coincidencia por subcadena en los tres campos
+        encontrados = buscar_proyectos(Project.objects.all(), "casa")
+        self.assertCountEqual(encontrados, [self.casa, self.bodega])
+        self.assertEqual(
+            list(buscar_proyectos(Project.objects.all(), "tablazo")), [self.casa]
+        )
+        self.assertEqual(buscar_proyectos(Project.objects.all(), "  ").count(), 2)
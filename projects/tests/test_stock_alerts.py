@@ -0,0 +1,78 @@
+# projects/tests/test_stock_alerts.py
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from projects.models import AlertaStock, BudgetSection, ConsumoMaterial, EntradaMaterial
+from projects.stock_alerts import rebuild_stock_alerts
+from projects.tests.test_ledger import crear_material
+from projects.tests.test_pricing import crear_proyecto
+
+User = get_user_model()
+
+
+class StockAlertsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username="alertas", email="alertas@example.com", password="x"
+        )
+        self.project = crear_proyecto(self.user)
+        self.cemento = crear_material(
+            "CEM-1", "Cemento", 1000, stock=0, presentation_qty=100
+        )
+
+    def alertas(self, **filtros):
+        return AlertaStock.objects.filter(material=self.cemento, **filtros)
+
+    def test_entradas_y_consumos_cruzan_umbrales(self):
+        # Stock global 0 <= 10% de la presentación
+        self.assertTrue(self.alertas(proyecto__isnull=True).exists())
+
+        entrada = EntradaMaterial.objects.create(
+            proyecto=self.project, material=self.cemento, cantidad=50,
+            lote="L", fecha_ingreso=date(2025, 1, 1),
+        )
+        self.assertFalse(self.alertas().exists())
+
+        consumo = ConsumoMaterial.objects.create(
+            proyecto=self.project, material=self.cemento,
+            cantidad_consumida=Decimal("45"), fecha_consumo=date(2025, 1, 2),
+            componente_actividad="Muros",
+            etapa_presupuesto=BudgetSection.objects.create(name="Obra", order=1),
+        )
+        alerta = self.alertas(proyecto=self.project).get()
+        self.assertEqual(alerta.proyecto_material.stock_proyecto, Decimal("5"))
+
+        consumo.delete()
+        self.assertFalse(self.alertas(proyecto=self.project).exists())
+
+        entrada.delete()
+        self.assertEqual(self.alertas().count(), 2)
+
+    @override_settings(
+        STOCK_ALERTAS={"PORCENTAJE_PRESENTACION": 60, "STOCK_PROYECTO_MINIMO": 1}
+    )
+    def test_reconstruir_con_otros_umbrales(self):
+        EntradaMaterial.objects.create(
+            proyecto=self.project, material=self.cemento, cantidad=50,
+            lote="L", fecha_ingreso=date(2025, 1, 1),
+        )
+        AlertaStock.objects.all().delete()
+        self.assertEqual(rebuild_stock_alerts(), (1, 0))
+
+    def test_endpoint_paginado(self):
+        otro = crear_material("ARE-1", "Arena", 500, stock=0, presentation_qty=100)
+        self.client.force_login(self.user)
+
+        with self.assertNumQueries(4):  # sesión, usuario, conteo y página
+            data = self.client.get(
+                reverse("dashboard:alertas_stock"), {"nivel": "global"}
+            ).json()
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(
+            {a["material_id"] for a in data["alertas"]}, {self.cemento.pk, otro.pk}
+        )
+        self.assertEqual(data["alertas"][0]["proyecto"], "")
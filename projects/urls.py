@@ -30,6 +30,11 @@ urlpatterns = [
     path('roles/<int:role_id>/update/', views.role_update, name='role_update'),
     path('workers/<int:worker_id>/delete/', views.worker_delete, name='worker_delete'),
     path('<int:project_id>/tablero/', views.project_board, name='project_board'),
+    path(
+        '<int:project_id>/tablero/materiales/<int:material_id>/',
+        views.tablero_movimientos,
+        name='tablero_movimientos',
+    ),
     path('roles/<int:role_id>/delete/', views.role_delete, name='role_delete'),
     path("proyectos/<int:project_id>/registrar_entrada_material/", views.registrar_entrada_material, name="registrar_entrada_material"),
     path('materials/search/', views.search_materials, name='search_materials'),
@@ -70,6 +75,16 @@ urlpatterns = [
     
     # URL para actualizar porcentaje de administración
     path('<int:project_id>/update-administration-percentage/', views.update_administration_percentage, name='update_administration_percentage'),
+    path(
+        '<int:project_id>/escenarios/',
+        views.project_scenarios,
+        name='project_scenarios',
+    ),
+    path(
+        '<int:project_id>/detailed-budget/diff/',
+        views.project_budget_diff,
+        name='project_budget_diff',
+    ),
     
     # URL para exportar presupuesto a Excel (solo JEFE)
     path('<int:project_id>/export-budget-excel/', views.export_budget_to_excel, name='export_budget_to_excel'),
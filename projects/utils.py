@@ -1,5 +1,13 @@
+from decimal import Decimal
+
 from django.db.models import Sum, F
 
+# Límites de las columnas de ProjectBudgetItem: quantity (max_digits=12,
+# decimal_places=3) y total_price (max_digits=15, decimal_places=2)
+CANTIDAD_MAXIMA = Decimal("999999999.999")
+TOTAL_MAXIMO = Decimal("9999999999999.99")
+
+
 def create_default_budget_sections(project):
     """
     Función segura que NO crea secciones nuevas.
@@ -160,6 +168,14 @@ def duplicate_project(project):
         ))
     if new_proyecto_materiales:
         ProyectoMaterial.objects.bulk_create(new_proyecto_materiales)
+
+        # El stock copiado puede estar bajo: alertas del nuevo proyecto
+        from .stock_alerts import sincronizar_alertas
+        sincronizar_alertas(
+            proyecto_material_ids=ProyectoMaterial.objects.filter(
+                proyecto=new_project
+            ).values_list("id", flat=True)
+        )
     
     # Forzar el cálculo de campos heredados y presupuesto
     new_project.calculate_legacy_fields()
@@ -171,8 +187,14 @@ def duplicate_project(project):
     # Recalcular el presupuesto final teniendo en cuenta todas las secciones
     try:
         # Actualizar primero todos los totales de ProjectBudgetItem
-        for item in ProjectBudgetItem.objects.filter(project=new_project):
-            item.save()  # Esto recalculará total_price
+        # (el resumen del presupuesto se refresca una vez al terminar)
+        from .budget_history import cambios_diferidos
+        from .snapshots import snapshot_diferido
+        with snapshot_diferido(), cambios_diferidos():
+            for item in ProjectBudgetItem.objects.filter(
+                project=new_project
+            ).select_related('budget_item'):
+                item.save()  # Esto recalculará total_price
         
         new_project.presupuesto = new_project.calculate_final_budget()
         new_project.presupuesto_gastado = 0  # Reiniciar el gasto ya que es un proyecto nuevo
@@ -180,9 +202,116 @@ def duplicate_project(project):
         
     except Exception as e:
         print(f"Warning: Error al recalcular presupuesto final: {str(e)}")
-    
+
+    # Las entradas copiadas con bulk_create no pasan por EntradaMaterial.save:
+    # reconstruir el libro de gasto y el resumen diario del proyecto nuevo
+    from .ledger import rebuild_spend_ledger
+    from .rollup import rebuild_daily_kpis
+    rebuild_spend_ledger(project_ids=[new_project.pk])
+    rebuild_daily_kpis(project_ids=[new_project.pk])
+    new_project.refresh_from_db(fields=["gasto_materiales"])
+
     return new_project
 
+
+def cantidad_valida(cantidad):
+    """
+    ``True`` si ``cantidad`` (Decimal) se puede guardar como cantidad de un
+    ProjectBudgetItem: finita, no negativa y dentro de ``CANTIDAD_MAXIMA``.
+    """
+    return cantidad.is_finite() and 0 <= cantidad <= CANTIDAD_MAXIMA
+
+
+def guardar_cantidades_presupuesto(project, cantidades):
+    """
+    Guarda en bloque las cantidades del presupuesto detallado de un proyecto.
+
+    ``cantidades`` es ``{budget_item_id: Decimal}``. Usa una consulta para los
+    BudgetItem referenciados, otra para los ítems ya guardados y un único
+    ``bulk_create(update_conflicts=True)`` con ``total_price`` ya calculado;
+    las filas sin cambios (misma cantidad y precio) se omiten. Al final
+    agrega los cambios al historial, refresca el resumen del presupuesto
+    solo en las secciones tocadas e invalida las cachés del proyecto
+    (``proyectos_actualizados_en_bloque``).
+
+    Devuelve el número de ítems creados o modificados. Lanza ``ValueError``
+    sin escribir nada si alguna cantidad no es válida (``cantidad_valida``)
+    o su total no cabe en ``total_price``.
+    """
+    from .budget_history import registrar_cambios
+    from .models import BudgetItem, ProjectBudgetItem, proyectos_actualizados_en_bloque
+    from .snapshots import refresh_budget_snapshot
+
+    milesimas = Decimal("0.001")
+    centavos = Decimal("0.01")
+
+    invalidas = sorted(
+        budget_item_id
+        for budget_item_id, cantidad in cantidades.items()
+        if not cantidad_valida(cantidad)
+    )
+    if invalidas:
+        raise ValueError(f"Cantidades fuera de rango para los ítems {invalidas}")
+
+    budget_items = BudgetItem.objects.filter(id__in=cantidades).values_list(
+        "id", "unit_price", "section_id"
+    )
+    existentes = {
+        budget_item_id: (quantity, unit_price)
+        for budget_item_id, quantity, unit_price in ProjectBudgetItem.objects.filter(
+            project=project, budget_item_id__in=cantidades
+        ).values_list("budget_item_id", "quantity", "unit_price")
+    }
+
+    filas = []
+    secciones = set()
+    for budget_item_id, unit_price, section_id in budget_items:
+        quantity = cantidades[budget_item_id].quantize(milesimas)
+        if existentes.get(budget_item_id) == (quantity, unit_price):
+            continue
+        total_price = quantity * unit_price
+        if total_price > TOTAL_MAXIMO:
+            raise ValueError(
+                f"El total del ítem {budget_item_id} supera {TOTAL_MAXIMO:,}"
+            )
+        filas.append(ProjectBudgetItem(
+            project=project,
+            budget_item_id=budget_item_id,
+            quantity=quantity,
+            unit_price=unit_price,
+            total_price=total_price.quantize(centavos),
+        ))
+        secciones.add(section_id)
+
+    if filas:
+        ProjectBudgetItem.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=["project", "budget_item"],
+            update_fields=["quantity", "unit_price", "total_price"],
+            batch_size=500,
+        )
+        registrar_cambios(filas)
+        refresh_budget_snapshot(project.pk, list(secciones))
+        # El upsert no emite post_save
+        proyectos_actualizados_en_bloque.send(
+            sender=type(project), project_ids=[project.pk]
+        )
+
+    return len(filas)
+
+
+def estado_avance(gasto, porcentaje):
+    """Estado visual de una etapa según su porcentaje ejecutado"""
+    if gasto == 0:
+        return "Pendiente de inicio"
+    elif porcentaje < 80:
+        return "Bajo presupuesto"
+    elif 80 <= porcentaje <= 100:
+        return "En el límite"
+    return "Sobrecosto"
+
+
 def get_etapas_con_avance(proyecto):
     """
     Devuelve la lista de las 23 secciones base del presupuesto (plantillas globales)
@@ -191,50 +320,119 @@ def get_etapas_con_avance(proyecto):
     - gasto ejecutado (ConsumoMaterial)
     - porcentaje ejecutado
     - estado visual
+
+    Usa una consulta agrupada para lo planificado y otra para lo ejecutado
+    (las secciones salen de la plantilla en memoria), y memoriza el resultado
+    en la instancia del proyecto: llamadas repetidas durante la misma petición
+    no consultan la BD.
     """
-    from django.db.models import Sum, F
-    from .models import BudgetSection, ProjectBudgetItem, ConsumoMaterial
+    cache = getattr(proyecto, "_etapas_con_avance", None)
+    if cache is not None:
+        return cache
 
-    # Usar las secciones globales (plantillas)
-    etapas = BudgetSection.objects.filter(project__isnull=True).order_by("order")
+    from django.db.models import Sum, F
+    from .budget_template import get_budget_template
+    from .models import ProjectBudgetItem, ConsumoMaterial
 
-    resultado = []
+    # Usar las secciones globales (plantillas), en memoria
+    etapas = get_budget_template().sections
 
-    for etapa in etapas:
-        # 🔹 Presupuesto planificado: suma de los ítems del proyecto en esa etapa
-        presupuesto = (
-            ProjectBudgetItem.objects.filter(
-                project=proyecto, budget_item__section=etapa
-            ).aggregate(total=Sum(F("quantity") * F("unit_price")))["total"]
-            or 0
-        )
+    # 🔹 Presupuesto planificado por sección: suma de los ítems del proyecto
+    planificado = dict(
+        ProjectBudgetItem.objects.filter(project=proyecto)
+        .values("budget_item__section_id")
+        .annotate(total=Sum(F("quantity") * F("unit_price")))
+        .order_by()
+        .values_list("budget_item__section_id", "total")
+    )
 
-        # 🔹 Gasto ejecutado: suma de consumos asociados a esa sección
-        gasto = (
-            ConsumoMaterial.objects.filter(
-                proyecto=proyecto, etapa_presupuesto=etapa
-            ).aggregate(total=Sum(F("cantidad_consumida") * F("material__unit_cost")))["total"]
-            or 0
-        )
+    # 🔹 Gasto ejecutado por sección: suma de consumos asociados
+    ejecutado = dict(
+        ConsumoMaterial.objects.filter(proyecto=proyecto)
+        .values("etapa_presupuesto_id")
+        .annotate(total=Sum(F("cantidad_consumida") * F("material__unit_cost")))
+        .order_by()
+        .values_list("etapa_presupuesto_id", "total")
+    )
 
+    resultado = []
+    for etapa in etapas:
+        presupuesto = planificado.get(etapa.id) or 0
+        gasto = ejecutado.get(etapa.id) or 0
         porcentaje = (gasto / presupuesto * 100) if presupuesto > 0 else 0
 
-        if gasto == 0:
-            estado = "Pendiente de inicio"
-        elif porcentaje < 80:
-            estado = "Bajo presupuesto"
-        elif 80 <= porcentaje <= 100:
-            estado = "En el límite"
-        else:
-            estado = "Sobrecosto"
-
         resultado.append({
             "id": etapa.id,
             "nombre": etapa.name,
             "presupuesto": presupuesto,
             "gasto": gasto,
             "porcentaje": porcentaje,
-            "estado": estado,
+            "estado": estado_avance(gasto, porcentaje),
         })
 
+    proyecto._etapas_con_avance = resultado
     return resultado
+
+
+def get_matriz_etapas(proyectos):
+    """
+    Matriz secciones × proyectos con el avance de cada etapa.
+
+    A diferencia de llamar ``get_etapas_con_avance`` por proyecto, usa una
+    sola consulta agrupada por (proyecto, sección) sobre ProjectBudgetItem y
+    otra sobre ConsumoMaterial para todo el portafolio.
+
+    Devuelve::
+
+        {
+            "proyectos": [{"id", "name", "estado"}, ...],
+            "secciones": [{"id", "nombre", "celdas": [celda por proyecto]}, ...],
+        }
+
+    donde cada celda es ``{"presupuesto", "gasto", "porcentaje", "estado"}``
+    en el mismo orden que ``proyectos``.
+    """
+    from django.db.models import Sum, F
+    from .budget_template import get_budget_template
+    from .models import ProjectBudgetItem, ConsumoMaterial
+
+    proyectos = list(proyectos.only("id", "name", "estado"))
+    ids = [p.id for p in proyectos]
+    etapas = get_budget_template().sections
+
+    planificado = {
+        (row["project_id"], row["budget_item__section_id"]): row["total"]
+        for row in ProjectBudgetItem.objects.filter(project_id__in=ids)
+        .values("project_id", "budget_item__section_id")
+        .annotate(total=Sum(F("quantity") * F("unit_price")))
+        .order_by()
+    }
+    ejecutado = {
+        (row["proyecto_id"], row["etapa_presupuesto_id"]): row["total"]
+        for row in ConsumoMaterial.objects.filter(proyecto_id__in=ids)
+        .values("proyecto_id", "etapa_presupuesto_id")
+        .annotate(total=Sum(F("cantidad_consumida") * F("material__unit_cost")))
+        .order_by()
+    }
+
+    secciones = []
+    for etapa in etapas:
+        celdas = []
+        for proyecto_id in ids:
+            presupuesto = float(planificado.get((proyecto_id, etapa.id)) or 0)
+            gasto = float(ejecutado.get((proyecto_id, etapa.id)) or 0)
+            porcentaje = (gasto / presupuesto * 100) if presupuesto > 0 else 0
+            celdas.append({
+                "presupuesto": presupuesto,
+                "gasto": gasto,
+                "porcentaje": round(porcentaje, 2),
+                "estado": estado_avance(gasto, porcentaje),
+            })
+        secciones.append({"id": etapa.id, "nombre": etapa.name, "celdas": celdas})
+
+    return {
+        "proyectos": [
+            {"id": p.id, "name": p.name, "estado": p.estado} for p in proyectos
+        ],
+        "secciones": secciones,
+    }
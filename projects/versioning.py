@@ -0,0 +1,88 @@
+"""
+Contadores de versión para cachés en proceso.
+
+Cada caché (precios unitarios, plantillas de presupuesto, KPIs, ...) se
+identifica por un nombre y guarda junto a su contenido la versión con la que
+se construyó. Las escrituras relevantes llaman a ``bump_version`` y la
+siguiente lectura detecta que la versión cambió y reconstruye.
+
+El contador vive en el framework de caché de Django. En producción
+``CACHES`` debe ser compartida (Redis, ``REDIS_URL`` en ``core.settings``)
+para que la invalidación llegue a todos los workers; ``check --deploy`` lo
+exige (``projects.checks``). Con la caché local al proceso de desarrollo, un
+cambio hecho en otro proceso no mueve el contador de este: por eso las
+copias en memoria (``CopiaLocal``) además caducan a los ``MAX_EDAD_LOCAL``
+segundos.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+# Edad máxima de una copia compilada en memoria del proceso aunque su versión
+# no haya cambiado
+MAX_EDAD_LOCAL = 60  # segundos
+
+_PREFIX = "inclusive:version:"
+
+
+def _initial_version():
+    # Si la clave se pierde (expulsión de la caché) arrancamos desde un valor
+    # nuevo para no coincidir nunca con una versión ya usada
+    return time.time_ns()
+
+
+def get_version(name):
+    """Devuelve la versión actual del recurso ``name``."""
+    key = _PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Incrementa la versión de ``name`` invalidando las copias en caché."""
+    key = _PREFIX + name
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # La clave no existe todavía: la inicializamos con un valor nuevo
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+class CopiaLocal:
+    """
+    Copia en memoria del proceso de un recurso versionado (tabla de precios,
+    plantilla de presupuesto, índice de materiales).
+
+    ``get(construir)`` devuelve la copia si se construyó con la versión
+    vigente hace menos de ``max_edad`` segundos; si no, la reconstruye con
+    ``construir(version)``, una sola vez aunque varios hilos la pidan.
+    """
+
+    def __init__(self, name, max_edad=MAX_EDAD_LOCAL):
+        self.name = name
+        self.max_edad = max_edad
+        self._lock = threading.Lock()
+        self._copia = None  # (versión, vence, valor)
+
+    def _vigente(self, copia, version):
+        return copia is not None and copia[0] == version and time.monotonic() < copia[1]
+
+    def get(self, construir):
+        version = get_version(self.name)
+        copia = self._copia
+        if self._vigente(copia, version):
+            return copia[2]
+
+        with self._lock:
+            copia = self._copia
+            if self._vigente(copia, version):
+                return copia[2]
+            valor = construir(version)
+            self._copia = (version, time.monotonic() + self.max_edad, valor)
+            return valor
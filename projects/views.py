@@ -4,10 +4,10 @@ from django.contrib import messages
 from django.http import JsonResponse, HttpResponse, Http404
 import io
 from django.core.paginator import Paginator
-from django.db.models import Q, Max, Sum, F, Count
+from django.db.models import Max, Sum, F, Exists, OuterRef
 from .models import Project, Worker, Role, BudgetSection, BudgetItem, ProjectBudgetItem
-from django.db.models import Q, Max, Sum, F, DecimalField, ExpressionWrapper
-from catalog.models import Material, Supplier, MaterialSupplier
+from django.db.models import Max, Sum, F, DecimalField, ExpressionWrapper
+from catalog.models import Supplier, MaterialSupplier
 from django.utils import timezone
 from zoneinfo import ZoneInfo
 import openpyxl
@@ -15,62 +15,62 @@ from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from openpyxl.utils import get_column_letter
 import io
 from .models import Project, Worker, Role, BudgetSection, BudgetItem, ProjectBudgetItem, ConsumoMaterial, ProyectoMaterial
-from .forms import ProjectForm, WorkerForm, RoleForm, ConsumoMaterialForm, DetailedProjectForm, BudgetSectionForm, BudgetManagementForm, BudgetItemCreateForm, BudgetItemEditForm
+from .forms import (
+    ProjectForm, WorkerForm, RoleForm, ConsumoMaterialForm, DetailedProjectForm,
+    BudgetSectionFormSet, BudgetManagementForm, BudgetItemCreateForm,
+    BudgetItemEditForm,
+)
 import json
+from django.template.loader import render_to_string
 from django.urls import reverse
 from .models import Project, EntradaMaterial, ConsumoMaterial
 from .forms import EntradaMaterialForm
 from users.decorators import role_required, project_owner_or_jefe_required
 from users.models import User
 from django.core.exceptions import PermissionDenied
-from decimal import Decimal
 from datetime import datetime, timedelta
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum, F, ExpressionWrapper, FloatField
 from django.shortcuts import render, get_object_or_404
 from projects.models import Project, BudgetSection, BudgetItem, ConsumoMaterial
 from django.http import HttpResponse
-from .utils import get_etapas_con_avance
+from .utils import (
+    CANTIDAD_MAXIMA,
+    cantidad_valida,
+    get_etapas_con_avance,
+    guardar_cantidades_presupuesto,
+)
+from .budget_history import registrar_cambios
+from .budget_template import get_budget_template
+from .etags import CATALOGO_KEY, etag_por_version, version_proyecto
+from .search import buscar_proyectos
+from .material_index import get_material_index
+from .snapshots import get_budget_snapshot, get_section_totals, refresh_budget_snapshot
 
 @login_required
 def budget_progress_report(request, project_id):
     project = get_object_or_404(Project, id=project_id)
-    # Usar las secciones específicas del proyecto si existen, sino usar las plantillas globales
-    secciones = BudgetSection.objects.filter(project=project)
-    if not secciones.exists():
-        secciones = BudgetSection.objects.filter(project__isnull=True)
+    # Avance por sección plantilla (árbol en memoria + dos consultas agrupadas)
+    secciones = get_budget_template().by_id
+    colores = {
+        "Pendiente de inicio": ("pendiente", "secondary"),
+        "Bajo presupuesto": ("ok", "success"),
+        "En el límite": ("medio", "warning"),
+        "Sobrecosto": ("sobrecosto", "danger"),
+    }
 
     reporte = []
-    for seccion in secciones:
-        items = BudgetItem.objects.filter(section=seccion)
-        presupuesto = sum(item.costo_unitario * item.cantidad for item in items)
-
-        consumos = ConsumoMaterial.objects.filter(etapa=seccion)
-        gasto = sum(c.cantidad * c.material.unit_cost for c in consumos)
-
-        porcentaje = round((gasto / presupuesto) * 100, 2) if presupuesto > 0 else 0
-
-        if gasto == 0:
-            estado = "pendiente"
-            color = "secondary"
-            alerta = None
-        elif porcentaje < 80:
-            estado = "ok"
-            color = "success"
-            alerta = None
-        elif porcentaje <= 100:
-            estado = "medio"
-            color = "warning"
-            alerta = None
-        else:
-            estado = "sobrecosto"
-            color = "danger"
+    for etapa in get_etapas_con_avance(project):
+        porcentaje = round(etapa["porcentaje"], 2)
+        estado, color = colores[etapa["estado"]]
+        alerta = None
+        if estado == "sobrecosto":
             alerta = f"+{round(porcentaje - 100, 2)}% sobre presupuesto"
 
         reporte.append({
-            "seccion": seccion,
-            "presupuesto": presupuesto,
-            "gastado": gasto,
+            "seccion": secciones[etapa["id"]],
+            "presupuesto": etapa["presupuesto"],
+            "gastado": etapa["gasto"],
             "porcentaje": porcentaje,
             "estado": estado,
             "color": color,
@@ -204,9 +204,21 @@ def registrar_entrada_material(request, project_id):
     return render(request, "projects/registrar_entrada_material.html", {"form": form, "project": project})
 
 
+def _versiones_catalogo(request, *args, **kwargs):
+    return [CATALOGO_KEY]
+
+
+def _versiones_proyecto(request, project_id):
+    return [version_proyecto(project_id), CATALOGO_KEY]
+
+
 @login_required
+@etag_por_version(_versiones_catalogo)
 def search_materials(request):
-    """Devuelve materiales filtrados por nombre o código para el buscador dinámico."""
+    """
+    Devuelve materiales filtrados por nombre o código para el buscador dinámico
+    (cada palabra como prefijo, ver ``projects.material_index``).
+    """
     term = request.GET.get("q", "").strip()
 
     if len(term) < 2:
@@ -216,24 +228,8 @@ def search_materials(request):
             "requires_more": True,
         })
 
-    materials = (
-        Material.objects.filter(
-            Q(name__icontains=term) | Q(sku__icontains=term)
-        )
-        .select_related("unit")
-        .order_by("name")[:20]
-    )
-
-    results = [
-        {
-            "id": material.id,
-            "sku": material.sku,
-            "name": material.name,
-            "unit": material.unit.symbol,
-            "unit_name": material.unit.name,
-        }
-        for material in materials
-    ]
+    # Índice de prefijos en memoria: sin consultas mientras el catálogo no cambie
+    results = get_material_index().buscar(term)
 
     return JsonResponse({
         "results": results,
@@ -243,6 +239,7 @@ def search_materials(request):
 
 
 @login_required
+@etag_por_version(_versiones_catalogo)
 def material_suppliers(request):
     """Lista proveedores disponibles para un material específico."""
     material_id = request.GET.get("material_id")
@@ -280,8 +277,13 @@ def project_list(request):
     - JEFE: Ve y puede editar todos los proyectos
     
     FUNCIONALIDAD DE ORDENAMIENTO:
-    - Sin filtro de estado: Agrupa por estado (En Proceso → Futuros → Terminados)
+    - Sin filtro de estado: Agrupa por estado (En Proceso → Terminados → Futuros)
     - "todos" (Todos los estados): Lista cronológica con ordenamiento toggleable
+
+    PAGINACIÓN (projects.listing):
+    - Por llave: ``despues_<estado>`` (agrupado) o ``despues`` (cronológico)
+      traen el cursor del último proyecto mostrado; "Ver más" avanza el grupo
+    - Una consulta para la página de todos los grupos y otra para los totales
     """
     # Obtener parámetros de búsqueda y ordenamiento
     search_query = request.GET.get("search", "")
@@ -291,152 +293,166 @@ def project_list(request):
     fecha_desde_filter = request.GET.get("fecha_desde", "")
     fecha_hasta_filter = request.GET.get("fecha_hasta", "")
     ubicacion_filter = request.GET.get("ubicacion", "")
+    ciudad_filter = request.GET.get("ciudad", "")
     presupuesto_min_filter = request.GET.get("presupuesto_min", "")
     presupuesto_max_filter = request.GET.get("presupuesto_max", "")
     order_by = request.GET.get("order", "desc")  # desc = descendente (más reciente primero), asc = ascendente
 
+    from .facets import RANGOS_PRESUPUESTO, get_facetas
+    from .listing import (
+        ESTADOS,
+        RANGOS_TRABAJADORES,
+        decodificar_cursor,
+        filtrar_proyectos,
+        filtros_lista,
+        pagina_cronologica,
+        pagina_por_estado,
+        totales_por_estado,
+    )
+
     # TODOS los usuarios ven TODOS los proyectos
-    projects = Project.objects.all()
-
-    # Filtro por búsqueda - Buscar en nombre, descripción y ubicación
-    if search_query:
-        projects = projects.filter(
-            Q(name__icontains=search_query)  # Buscar en nombre
-            | Q(description__icontains=search_query)  # Buscar en descripción
-            | Q(location_address__icontains=search_query)  # Buscar en dirección
+    filtros = filtros_lista(request.GET)
+    projects = filtrar_proyectos(Project.objects.all(), filtros)
+
+    def url_siguiente(parametro, cursor):
+        """Query string de la página siguiente de un grupo (o None)."""
+        if not cursor:
+            return None
+        params = request.GET.copy()
+        params[parametro] = cursor
+        return params.urlencode()
+
+    # Creadores para el filtro: semi-join indexado sobre creado_por
+    creadores = list(
+        User.objects.filter(
+            Exists(Project.objects.filter(creado_por_id=OuterRef("pk")))
         )
+        .only("id", "username", "first_name", "last_name")
+        .order_by('first_name', 'last_name')
+    )
 
-    # Filtro por estado
-    # Si status_filter es "todos", no filtramos, solo ordenamos cronológicamente
-    if status_filter and status_filter != "todos":
-        projects = projects.filter(estado=status_filter)
-
-    # Filtro por número de trabajadores
-    if trabajadores_filter:
-        if trabajadores_filter == "0":
-            projects = projects.filter(workers__isnull=True)
-        elif trabajadores_filter == "1-3":
-            projects = projects.annotate(worker_count=Count('workers')).filter(worker_count__gte=1, worker_count__lte=3)
-        elif trabajadores_filter == "4-6":
-            projects = projects.annotate(worker_count=Count('workers')).filter(worker_count__gte=4, worker_count__lte=6)
-        elif trabajadores_filter == "7+":
-            projects = projects.annotate(worker_count=Count('workers')).filter(worker_count__gte=7)
-
-    # Filtro por creador
+    # Nombre del creador seleccionado para mostrarlo en el filtro activo
+    creador_nombre = None
     if creador_filter:
-        try:
-            creador_id = int(creador_filter)
-            projects = projects.filter(creado_por_id=creador_id)
-        except ValueError:
-            pass
-
-    # Filtro por fecha desde
-    if fecha_desde_filter:
-        projects = projects.filter(fecha_creacion__gte=fecha_desde_filter)
-
-    # Filtro por fecha hasta
-    if fecha_hasta_filter:
-        projects = projects.filter(fecha_creacion__lte=fecha_hasta_filter)
-
-    # Filtro por ubicación (búsqueda de texto en dirección)
-    if ubicacion_filter:
-        projects = projects.filter(location_address__icontains=ubicacion_filter)
-        print(f"DEBUG: Filtro ubicación aplicado: {ubicacion_filter}")
+        for creador_obj in creadores:
+            if str(creador_obj.id) == creador_filter:
+                creador_nombre = (
+                    f"{creador_obj.first_name} {creador_obj.last_name}".strip()
+                )
+                if not creador_nombre:  # Si no tiene nombre, usar username
+                    creador_nombre = creador_obj.username
+
+    # Conteos por faceta: una consulta agrupada, en caché por combinación de filtros
+    facetas = get_facetas(filtros)
+    for creador_obj in creadores:
+        creador_obj.total_proyectos = facetas["creador"].get(str(creador_obj.id), 0)
+
+    def url_faceta(**valores):
+        """Query string con los filtros actuales y ``valores`` reemplazados."""
+        params = request.GET.copy()
+        for parametro in list(params):
+            if parametro.startswith("despues"):
+                del params[parametro]  # La paginación vuelve al inicio
+        for parametro, valor in valores.items():
+            params[parametro] = valor
+        return params.urlencode()
+
+    etiquetas_trabajadores = {
+        "0": "Sin trabajadores",
+        "1-3": "1-3 trabajadores",
+        "4-6": "4-6 trabajadores",
+        "7+": "7+ trabajadores",
+    }
+    ubicaciones = {
+        valor.lower(): etiqueta for valor, etiqueta in Project.UBICACION_CHOICES
+    }
 
-    # Filtro por presupuesto mínimo
-    if presupuesto_min_filter:
-        try:
-            # Limpiar puntos y convertir a float
-            presupuesto_min_clean = presupuesto_min_filter.replace('.', '').replace(',', '')
-            presupuesto_min = float(presupuesto_min_clean)
-            if presupuesto_min > 0:
-                projects = projects.filter(presupuesto__gte=presupuesto_min)
-                print(f"DEBUG: Filtro presupuesto mínimo aplicado: {presupuesto_min}")
-        except (ValueError, AttributeError) as e:
-            print(f"DEBUG: Error en filtro presupuesto mínimo: {e}")
-
-    # Filtro por presupuesto máximo
-    if presupuesto_max_filter:
-        try:
-            # Limpiar puntos y convertir a float
-            presupuesto_max_clean = presupuesto_max_filter.replace('.', '').replace(',', '')
-            presupuesto_max = float(presupuesto_max_clean)
-            if presupuesto_max > 0:
-                projects = projects.filter(presupuesto__lte=presupuesto_max)
-                print(f"DEBUG: Filtro presupuesto máximo aplicado: {presupuesto_max}")
-        except (ValueError, AttributeError) as e:
-            print(f"DEBUG: Error en filtro presupuesto máximo: {e}")
+    context = {
+        "facetas": facetas,
+        "opciones_trabajadores": [
+            (
+                valor,
+                etiquetas_trabajadores[valor],
+                facetas["trabajadores"].get(valor, 0),
+            )
+            for valor in RANGOS_TRABAJADORES
+        ],
+        "facetas_presupuesto": [
+            (
+                etiqueta,
+                facetas["presupuesto"].get(valor, 0),
+                url_faceta(
+                    presupuesto_min=f"{minimo:.0f}" if minimo else "",
+                    presupuesto_max=f"{maximo - 1:.0f}" if maximo else "",
+                ),
+            )
+            for valor, etiqueta, minimo, maximo in RANGOS_PRESUPUESTO
+        ],
+        "facetas_anio": [
+            (
+                anio,
+                total,
+                url_faceta(fecha_desde=f"{anio}-01-01", fecha_hasta=f"{anio}-12-31"),
+            )
+            for anio, total in sorted(facetas["anio"].items(), reverse=True)
+        ],
+        "facetas_ubicacion": [
+            (valor, ubicaciones.get(valor, valor), total, url_faceta(ciudad=valor))
+            for valor, total in sorted(
+                facetas["ubicacion"].items(), key=lambda item: -item[1]
+            )
+            if valor
+        ],
+        "search_query": search_query,
+        "status_filter": status_filter,
+        "trabajadores_filter": trabajadores_filter,
+        "creador_filter": creador_filter,
+        "creador_nombre": creador_nombre,
+        "fecha_desde_filter": fecha_desde_filter,
+        "fecha_hasta_filter": fecha_hasta_filter,
+        "ubicacion_filter": ubicacion_filter,
+        "ciudad_filter": ciudad_filter,
+        "ciudad_nombre": ubicaciones.get(ciudad_filter.lower(), ciudad_filter),
+        "presupuesto_min_filter": presupuesto_min_filter,
+        "presupuesto_max_filter": presupuesto_max_filter,
+        "creadores": creadores,
+    }
 
     # Determinar cómo organizar los proyectos
     show_chronological = (status_filter == "todos")
-    
+
     if show_chronological:
         # MODO CRONOLÓGICO: Todos los proyectos ordenados por fecha
-        if order_by == "asc":
-            projects_chronological = projects.order_by('fecha_creacion')  # Más antiguos primero
-        else:
-            projects_chronological = projects.order_by('-fecha_creacion')  # Más recientes primero (default)
-        
-        context = {
+        # (desc = más recientes primero, por defecto)
+        cursor = decodificar_cursor(request.GET.get("despues"))
+        proyectos, siguiente = pagina_cronologica(
+            projects, cursor, ascendente=(order_by == "asc")
+        )
+        context.update({
             "show_chronological": True,
-            "projects_chronological": projects_chronological,
+            "projects_chronological": proyectos,
+            "total_chronological": projects.count(),
+            "siguiente_chronological": url_siguiente("despues", siguiente),
             "order_by": order_by,
-            "search_query": search_query,
-            "status_filter": status_filter,
-            "trabajadores_filter": trabajadores_filter,
-            "creador_filter": creador_filter,
-            "creador_nombre": None,
-            "fecha_desde_filter": fecha_desde_filter,
-            "fecha_hasta_filter": fecha_hasta_filter,
-            "ubicacion_filter": ubicacion_filter,
-            "presupuesto_min_filter": presupuesto_min_filter,
-            "presupuesto_max_filter": presupuesto_max_filter,
-            "creadores": User.objects.filter(
-                id__in=Project.objects.values_list('creado_por_id', flat=True).distinct()
-            ).order_by('first_name', 'last_name'),
-        }
+        })
     else:
-        # MODO AGRUPADO POR ESTADO (default)
-        # Separar proyectos por estado sin ordenar por fecha
-        projects_en_proceso = projects.filter(estado='en_proceso')
-        projects_terminados = projects.filter(estado='terminado')
-        projects_futuros = projects.filter(estado='futuro')
-
-        # Obtener lista de creadores para el filtro
-        creadores = User.objects.filter(
-            id__in=Project.objects.values_list('creado_por_id', flat=True).distinct()
-        ).order_by('first_name', 'last_name')
-
-        # Obtener el nombre del creador seleccionado para mostrarlo en el filtro activo
-        creador_nombre = None
-        if creador_filter:
-            try:
-                creador_id = int(creador_filter)
-                creador_obj = User.objects.filter(id=creador_id).first()
-                if creador_obj:
-                    creador_nombre = f"{creador_obj.first_name} {creador_obj.last_name}".strip()
-                    if not creador_nombre:  # Si no tiene nombre, usar username
-                        creador_nombre = creador_obj.username
-            except ValueError:
-                pass
-
-        context = {
-            "show_chronological": False,
-            "projects_en_proceso": projects_en_proceso,
-            "projects_terminados": projects_terminados,
-            "projects_futuros": projects_futuros,
-            "search_query": search_query,
-            "status_filter": status_filter,
-            "trabajadores_filter": trabajadores_filter,
-            "creador_filter": creador_filter,
-            "creador_nombre": creador_nombre,
-            "fecha_desde_filter": fecha_desde_filter,
-            "fecha_hasta_filter": fecha_hasta_filter,
-            "ubicacion_filter": ubicacion_filter,
-            "presupuesto_min_filter": presupuesto_min_filter,
-            "presupuesto_max_filter": presupuesto_max_filter,
-            "creadores": creadores,
+        # MODO AGRUPADO POR ESTADO (default): una consulta para las tres páginas
+        cursores = {
+            estado: decodificar_cursor(request.GET.get(f"despues_{estado}"))
+            for estado in ESTADOS
         }
+        paginas = pagina_por_estado(projects, cursores)
+        context.update({
+            "show_chronological": False,
+            "projects_en_proceso": paginas["en_proceso"][0],
+            "projects_terminados": paginas["terminado"][0],
+            "projects_futuros": paginas["futuro"][0],
+            "totales": totales_por_estado(projects),
+            "siguientes": {
+                estado: url_siguiente(f"despues_{estado}", siguiente)
+                for estado, (_, siguiente) in paginas.items()
+            },
+        })
 
     return render(request, "projects/project_list.html", context)
 
@@ -455,13 +471,8 @@ def project_history(request):
     # Obtener todos los proyectos activos y finalizados
     projects = Project.objects.filter(estado__in=['en_proceso', 'terminado', 'futuro'])
     
-    # Filtro por búsqueda
-    if search_query:
-        projects = projects.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(location_address__icontains=search_query)
-        )
+    # Filtro por búsqueda (projects.search)
+    projects = buscar_proyectos(projects, search_query)
     
     # Filtro por estado
     if status_filter:
@@ -499,94 +510,20 @@ def project_board(request, project_id):
     - JEFE: Siempre accede al tablero (todos los proyectos)
     - CONSTRUCTOR: Solo accede al tablero si él creó el proyecto
     """
-    # Obtener proyecto con sus entradas relacionadas a material y proveedor
+    from .board import get_tablero
+
     project = get_object_or_404(
-        Project.objects.prefetch_related(
-            'entradas__material', 
-            'entradas__proveedor'
-        ),
-        id=project_id
+        Project.objects.select_related("creado_por"), id=project_id
     )
 
     # Verificar permisos: JEFE siempre puede, otros solo si crearon el proyecto
     if request.user.role != User.JEFE and not request.user.is_superuser:
-        if project.creado_por != request.user:
+        if project.creado_por_id != request.user.id:
             # Si no es JEFE y no creó el proyecto, redirigir a detalles
             return redirect('projects:project_detail', project_id=project.id)
 
-    # Entradas de materiales del proyecto
-    entradas_raw = project.entradas.all().order_by('material__name', '-fecha_ingreso')
-
-    # Pre-cargar precios por proveedor para evitar consultas repetidas
-    material_ids = {entrada.material_id for entrada in entradas_raw}
-    supplier_ids = {entrada.proveedor_id for entrada in entradas_raw if entrada.proveedor_id}
-    supplier_price_map = {}
-    if material_ids and supplier_ids:
-        supplier_price_map = {
-            (mp.material_id, mp.supplier_id): mp.price
-            for mp in MaterialSupplier.objects.filter(
-                material_id__in=material_ids,
-                supplier_id__in=supplier_ids
-            )
-        }
-
-    # Importar el modelo de consumos
-    from .models import ConsumoMaterial, ProyectoMaterial
-
-    # Agrupar por material
-    from collections import defaultdict
-    materiales_agrupados = defaultdict(lambda: {
-        'material': None,
-        'entradas': [],
-        'cantidad_total': 0,
-        'stock_proyecto': 0,
-        'consumos': [],
-        'cantidad_consumida': 0,
-        'costo_total': Decimal('0')
-    })
-
-    for entrada in entradas_raw:
-        material_id = entrada.material.id
-
-        if materiales_agrupados[material_id]['material'] is None:
-            materiales_agrupados[material_id]['material'] = entrada.material
-
-            # Obtener consumos de este material en este proyecto
-            consumos = ConsumoMaterial.objects.filter(
-                proyecto=project,
-                material=entrada.material
-            ).select_related('registrado_por').order_by('-fecha_consumo')
-
-            materiales_agrupados[material_id]['consumos'] = list(consumos)
-            materiales_agrupados[material_id]['cantidad_consumida'] = sum(
-                c.cantidad_consumida for c in consumos
-            )
-
-        materiales_agrupados[material_id]['entradas'].append(entrada)
-        materiales_agrupados[material_id]['cantidad_total'] += entrada.cantidad
-
-        # Determinar precio por unidad
-        unit_price = None
-        if entrada.proveedor_id:
-            unit_price = supplier_price_map.get((entrada.material_id, entrada.proveedor_id))
-        if unit_price is None and entrada.material.unit_cost is not None:
-            unit_price = entrada.material.unit_cost
-
-        entrada.unit_price_display = unit_price
-        if unit_price is not None:
-            total_price = unit_price * entrada.cantidad
-            entrada.total_price_display = total_price
-            materiales_agrupados[material_id]['costo_total'] += total_price
-        else:
-            entrada.total_price_display = None
-
-    # Calcular el stock correcto para cada material después de sumar todas las entradas
-    for material_id, data in materiales_agrupados.items():
-        # Stock = Total comprado - Total consumido
-        data['stock_proyecto'] = data['cantidad_total'] - data['cantidad_consumida']
-
-    # Convertir a lista para el template
-    compras = list(materiales_agrupados.values())
+    # Compras y consumos agrupados por material: consultas fijas, en caché por proyecto
+    compras = get_tablero(project)
 
     context = {
         "project": project,
@@ -599,6 +536,46 @@ def project_board(request, project_id):
     return render(request, "projects/project_board.html", context)
 
 
+@project_owner_or_jefe_required
+def tablero_movimientos(request, project_id, material_id):
+    """
+    API del tablero: una página de las compras (``tipo=compras``) o los
+    consumos (``tipo=consumos``) de un material, como fragmento HTML.
+    Se pide al desplegar el material y con "Ver más".
+    """
+    from .board import POR_PAGINA, compras_material, consumos_material
+
+    project = get_object_or_404(Project, id=project_id)
+    tipo = request.GET.get("tipo")
+    if tipo == "compras":
+        movimientos = compras_material(project, material_id)
+    elif tipo == "consumos":
+        movimientos = consumos_material(project, material_id)
+    else:
+        return JsonResponse({"error": "Tipo inválido"}, status=400)
+
+    page_obj = Paginator(movimientos, POR_PAGINA).get_page(request.GET.get("page"))
+    siguiente = None
+    if page_obj.has_next():
+        siguiente = "{}?tipo={}&page={}".format(
+            reverse("projects:tablero_movimientos", args=[project.id, material_id]),
+            tipo,
+            page_obj.next_page_number(),
+        )
+
+    html = render_to_string(
+        "projects/tablero_movimientos.html",
+        {"tipo": tipo, "movimientos": page_obj.object_list},
+        request=request,
+    )
+    return JsonResponse({
+        "html": html,
+        "total": page_obj.paginator.count,
+        "pagina": page_obj.number,
+        "siguiente": siguiente,
+    })
+
+
 @login_required
 def project_create(request):
     """
@@ -685,10 +662,13 @@ def project_detail(request, project_id):
     # Entradas de materiales del proyecto
     compras = project.entradas.select_related("material", "proveedor").all()
 
-    # Agregar stock por proyecto a cada entrada
+    # Agregar stock por proyecto a cada entrada (una sola consulta)
+    stock_por_material = dict(
+        ProyectoMaterial.objects.filter(proyecto=project)
+        .values_list("material_id", "stock_proyecto")
+    )
     for compra in compras:
-        pm = compra.material.proyectos.filter(proyecto=project).first()
-        compra.stock_proyecto = pm.stock_proyecto if pm else 0
+        compra.stock_proyecto = stock_por_material.get(compra.material_id, 0)
 
     # Calcular presupuesto estimado usando los datos del proyecto
     project.calculate_legacy_fields()
@@ -696,9 +676,6 @@ def project_detail(request, project_id):
 
     # Obtener avance por etapa del presupuesto
     etapas_con_avance = get_etapas_con_avance(project)
-    
-    avance_por_etapas = get_etapas_con_avance(project)
-    # print("DEBUG avance_por_etapas:", avance_por_etapas)
 
 
     context = {
@@ -1001,13 +978,8 @@ def project_view(request):
     # Filtrar proyectos del usuario actual
     projects = Project.objects.filter(creado_por=request.user)
 
-    # Aplicar búsqueda si se proporciona un término
-    if search_query:
-        projects = projects.filter(
-            Q(name__icontains=search_query)  # Buscar en nombre
-            | Q(description__icontains=search_query)  # Buscar en descripción
-            | Q(location_address__icontains=search_query)  # Buscar en dirección
-        )
+    # Aplicar búsqueda si se proporciona un término (los más relevantes primero)
+    projects = buscar_proyectos(projects, search_query, ordenar=True)
 
     context = {
         "projects": projects,
@@ -1411,6 +1383,7 @@ def listar_consumos_proyecto(request, project_id):
     return render(request, 'projects/listar_consumos.html', context)
 
 @project_owner_or_jefe_required
+@etag_por_version(_versiones_proyecto)
 def obtener_consumos_fecha(request, project_id):
     """
     API endpoint para obtener consumos de una fecha específica (para el calendario)
@@ -1445,6 +1418,7 @@ def obtener_consumos_fecha(request, project_id):
 
 
 @project_owner_or_jefe_required
+@etag_por_version(_versiones_proyecto)
 def obtener_consumos_mes(request, project_id):
     """
     API endpoint para obtener todos los consumos de un mes específico (RF17C)
@@ -1624,15 +1598,20 @@ def detailed_project_create(request):
     Crea proyectos con presupuesto detallado completo.
     Usa las 23 secciones predefinidas (plantillas globales) sin modificarlas.
     """
-    # Usar solo las secciones plantilla (sin proyecto asignado)
-    sections = BudgetSection.objects.filter(project__isnull=True).order_by('order')
+    # Usar solo las secciones plantilla (sin proyecto asignado), desde la caché
+    template = get_budget_template()
+    admin_section = template.section(21)
     workers = Worker.objects.all()
 
     if request.method == "POST":
         project_form = DetailedProjectForm(request.POST, request.FILES)
         selected_workers = request.POST.getlist("workers")
+        # Todas las secciones (las plantillas base) con los ítems pre-cargados;
+        # se validan antes de crear el proyecto para no perder cantidades
+        section_forms = BudgetSectionFormSet(data=request.POST)
+        secciones_validas = section_forms.is_valid()
 
-        if project_form.is_valid():
+        if project_form.is_valid() and secciones_validas:
             try:
                 from decimal import Decimal
 
@@ -1653,12 +1632,10 @@ def detailed_project_create(request):
                         project.administration_percentage = Decimal(str(admin_percentage))
                     except (ValueError, TypeError):
                         # Si hay error, usar el valor de la sección plantilla
-                        admin_section = sections.filter(order=21).first()
                         if admin_section and admin_section.percentage_value:
                             project.administration_percentage = admin_section.percentage_value
                 else:
                     # Si no se proporciona, usar el valor de la sección plantilla
-                    admin_section = sections.filter(order=21).first()
                     if admin_section and admin_section.percentage_value:
                         project.administration_percentage = admin_section.percentage_value
                 
@@ -1670,16 +1647,15 @@ def detailed_project_create(request):
                 if selected_workers:
                     project.workers.set(selected_workers)
 
-                # Procesar cada sección (las plantillas base)
-                items_processed = 0
-                for section in sections:
-                    section_form = BudgetSectionForm(section, project, request.POST)
-                    if section_form.is_valid():
-                        section_form.save(project)
-                        items_processed += 1
+                # Guardar las cantidades de todas las secciones en una sola
+                # escritura en bloque
+                section_forms.save(project)
 
                 # Calcular presupuesto final
-                presupuesto_calculado = project.calculate_final_budget()
+                snapshot = get_budget_snapshot(project)
+                presupuesto_calculado = project.final_budget_from_totals(
+                    snapshot.totals()
+                )
                 project.presupuesto = presupuesto_calculado
                 project.save()
 
@@ -1696,17 +1672,20 @@ def detailed_project_create(request):
 
         else:
             messages.error(request, "❌ Por favor corrige los errores en el formulario.")
+            for section, item, mensaje in section_forms.errors:
+                messages.error(
+                    request,
+                    f"❌ {section.order}. {section.name} - "
+                    f"{item.description}: {mensaje}",
+                )
     else:
         project_form = DetailedProjectForm()
         # Inicializar el porcentaje de administración con el valor de la sección plantilla
-        admin_section = sections.filter(order=21).first()
         if admin_section and admin_section.percentage_value:
             project_form.fields['administration_percentage'].initial = admin_section.percentage_value
 
-    # Generar formularios por sección (render inicial)
-    section_forms = [
-        {"section": s, "form": BudgetSectionForm(s, None)} for s in sections
-    ]
+        # Generar formularios por sección (render inicial)
+        section_forms = BudgetSectionFormSet()
 
     return render(
         request,
@@ -1727,72 +1706,55 @@ def detailed_budget_edit(request, project_id):
     """
     NUEVA VISTA SIMPLE: Editar presupuesto detallado
     """
-    print(f"🔍 DEBUG: ===== INICIANDO detailed_budget_edit =====")
-    print(f"🔍 DEBUG: Proyecto ID: {project_id}")
-    print(f"🔍 DEBUG: Usuario: {request.user}")
-    print(f"🔍 DEBUG: Rol usuario: {request.user.role}")
-    
     project = get_object_or_404(Project, id=project_id)
-    print(f"🔍 DEBUG: Proyecto encontrado: {project.name}")
     
     # Verificar permisos
     if request.user.role == User.CONSTRUCTOR and project.creado_por != request.user:
-        print(f"🔍 DEBUG: ❌ Permisos denegados")
         raise PermissionDenied("No tienes permisos para editar este proyecto")
     
-    print(f"🔍 DEBUG: ✅ Permisos verificados")
-    print(f"🔍 DEBUG: Nueva vista simple para proyecto {project.id}")
-    
     if request.method == "POST":
-        print("🔍 DEBUG: Procesando formulario POST")
-        
-        # Procesar solo las cantidades que vienen en el POST
-        items_updated = 0
+        # Leer todas las cantidades del POST y guardarlas en bloque
+        # (las filas sin cambios no se escriben)
+        from decimal import Decimal, InvalidOperation
+        cantidades = {}
+        invalidas = 0
         for key, value in request.POST.items():
             if key.startswith('quantity_'):
-                item_id = key.replace('quantity_', '')
                 try:
-                    from decimal import Decimal
-                    quantity = Decimal(str(value)) if value else Decimal('0')
-                    
-                    # Obtener el BudgetItem para usar su precio unitario
-                    try:
-                        budget_item = BudgetItem.objects.get(id=item_id)
-                        
-                        # Actualizar o crear ProjectBudgetItem (incluso con cantidad 0)
-                        project_item, created = ProjectBudgetItem.objects.get_or_create(
-                            project=project,
-                            budget_item=budget_item,
-                            defaults={
-                                'quantity': quantity,
-                                'unit_price': budget_item.unit_price
-                            }
-                        )
-                        if not created:
-                            project_item.quantity = quantity
-                            project_item.unit_price = budget_item.unit_price
-                            project_item.save()
-                        items_updated += 1
-                        print(f"✅ Actualizado ítem {item_id}: cantidad {quantity}, precio {budget_item.unit_price}")
-                    except BudgetItem.DoesNotExist:
-                        print(f"❌ BudgetItem {item_id} no existe")
-                        continue
-                except (ValueError, ProjectBudgetItem.DoesNotExist):
+                    item_id = int(key.replace('quantity_', ''))
+                    valor = Decimal(str(value)) if value else Decimal('0')
+                except (ValueError, InvalidOperation):
+                    continue
+                # NaN, Infinity, negativas o que no caben en la columna
+                if not cantidad_valida(valor):
+                    invalidas += 1
                     continue
+                cantidades[item_id] = valor
+        
+        if invalidas:
+            messages.error(
+                request,
+                f'❌ Se omitieron {invalidas} cantidades inválidas: deben ser números '
+                f'entre 0 y {CANTIDAD_MAXIMA:,}.',
+            )
+        
+        try:
+            items_updated = guardar_cantidades_presupuesto(project, cantidades)
+        except ValueError as e:
+            messages.error(request, f'❌ No se guardó el presupuesto: {e}')
+            return redirect("projects:detailed_budget_edit", project_id=project.id)
         
         # Recalcular presupuesto
-        presupuesto_calculado = project.calculate_final_budget()
+        snapshot = get_budget_snapshot(project)
+        presupuesto_calculado = project.final_budget_from_totals(snapshot.totals())
         project.presupuesto = presupuesto_calculado
         project.save()
         
-        print(f"🔍 DEBUG: {items_updated} ítems actualizados")
-        print(f"🔍 DEBUG: Presupuesto recalculado: ${presupuesto_calculado:,.0f}")
-        
         messages.success(request, f'✅ Presupuesto actualizado! {items_updated} ítems modificados.')
         return redirect("projects:detailed_budget_view", project_id=project.id)
     
-    # Obtener TODAS las secciones (las 23) - optimizar consulta
-    all_sections = BudgetSection.objects.select_related().prefetch_related('items').order_by('order')
+    # Obtener TODAS las secciones (las 23) con sus ítems activos, desde la caché
+    all_sections = get_budget_template().sections
     
     # Obtener ítems configurados del proyecto
     project_items = ProjectBudgetItem.objects.filter(project=project).select_related(
@@ -1802,32 +1764,22 @@ def detailed_budget_edit(request, project_id):
     # Crear diccionario de ítems por ID para búsqueda rápida
     project_items_dict = {item.budget_item.id: item for item in project_items}
     
-    # Preparar datos para TODAS las secciones - optimizar consultas
-    # Pre-cargar todos los ítems de una vez
-    all_budget_items = BudgetItem.objects.filter(
-        section__in=all_sections, 
-        is_active=True
-    ).select_related('section').order_by('section__order', 'order')
-    
-    # Crear diccionario de ítems por sección
-    items_by_section = {}
-    for item in all_budget_items:
-        section_id = item.section.id
-        if section_id not in items_by_section:
-            items_by_section[section_id] = []
-        items_by_section[section_id].append(item)
-    
     # Importar Decimal antes de usarlo
     from decimal import Decimal
     
+    # Totales precalculados por sección y del proyecto
+    snapshot = get_budget_snapshot(project)
+    section_totals = get_section_totals(project)
+    
     sections_data = {}
     for section in all_sections:
-        # Obtener ítems de esta sección del diccionario pre-cargado
-        section_items = items_by_section.get(section.id, [])
+        # Ítems activos de esta sección (árbol pre-cargado)
+        section_items = section.active_items
         
         # Preparar ítems para esta sección
         items_for_section = []
-        section_total = Decimal('0')  # Calcular total de la sección
+        section_row = section_totals.get(section.id)
+        section_total = section_row.total if section_row else Decimal('0')
         
         for budget_item in section_items:
             # Verificar si este ítem está configurado en el proyecto
@@ -1840,7 +1792,6 @@ def detailed_budget_edit(request, project_id):
                 # Convertir precio unitario a float y luego a string sin formato
                 unit_price_value = float(project_item.unit_price)
                 item_total = float(project_item.total_price)
-                section_total += Decimal(str(item_total))
                 
                 items_for_section.append({
                     'budget_item': budget_item,
@@ -1852,7 +1803,6 @@ def detailed_budget_edit(request, project_id):
                     'total_price': item_total,
                     'is_configured': True
                 })
-                print(f"🔍 DEBUG: Ítem configurado {budget_item.description[:30]}: cantidad={project_item.quantity}, cantidad_str={str(quantity_value).rstrip('0').rstrip('.') if quantity_value % 1 == 0 else str(quantity_value)}, precio={project_item.unit_price}")
             else:
                 # No está configurado, usar valores por defecto
                 unit_price_default = float(budget_item.unit_price)
@@ -1865,7 +1815,6 @@ def detailed_budget_edit(request, project_id):
                     'total_price': 0.0,
                     'is_configured': False
                 })
-                print(f"🔍 DEBUG: Ítem no configurado {budget_item.description[:30]}: precio={budget_item.unit_price}")
         
         sections_data[section.id] = {
             'section': section,
@@ -1873,49 +1822,22 @@ def detailed_budget_edit(request, project_id):
             'section_total': float(section_total)  # Total calculado de la sección
         }
     
-    print(f"🔍 DEBUG: {len(sections_data)} secciones totales (todas las 23)")
-    print(f"🔍 DEBUG: {len(project_items)} ítems configurados en el proyecto")
-    
-    # Debug: Verificar datos antes de enviar al template
-    print(f"🔍 DEBUG: Datos para el template:")
-    for section_id, data in sections_data.items():
-        print(f"  Sección {data['section'].order} ({data['section'].name}): {len(data['items'])} ítems")
-        for item in data['items']:
-            print(f"    - {item['budget_item'].description[:30]}: cantidad={item['quantity']}, precio={item['unit_price']}, total={item['total_price']}")
-    
-    # Calcular costo directo y administración para el contexto
-    costo_directo_total = Decimal('0')
-    for section_id, data in sections_data.items():
-        if not data['section'].is_percentage:
-            for item in data['items']:
-                if item['project_item']:
-                    costo_directo_total += Decimal(str(item['total_price']))
-    
-    admin_percentage = project.administration_percentage / Decimal('100')
-    administracion_automatica = costo_directo_total * admin_percentage
+    # Costo directo y administración desde el resumen precalculado
+    total_budget = project.final_budget_from_totals(snapshot.totals())
     
     try:
         context = {
             'project': project,
             'sections_data': sections_data,
-            'total_budget': project.calculate_final_budget(),
+            'total_budget': total_budget,
             'administration_percentage': project.administration_percentage,
-            'costo_directo': costo_directo_total,
-            'administracion_automatica': administracion_automatica
+            'costo_directo': snapshot.costo_directo,
+            'administracion_automatica': snapshot.administracion_automatica
         }
         
-        print(f"🔍 DEBUG: ===== RENDERIZANDO TEMPLATE =====")
-        print(f"🔍 DEBUG: Secciones en context: {len(sections_data)}")
-        print(f"🔍 DEBUG: Presupuesto total: ${project.calculate_final_budget():,.0f}")
-        
         return render(request, "projects/detailed_budget_edit.html", context)
         
     except Exception as e:
-        print(f"❌ ERROR en detailed_budget_edit: {str(e)}")
-        print(f"❌ Tipo de error: {type(e).__name__}")
-        import traceback
-        print(f"❌ Traceback: {traceback.format_exc()}")
-        
         messages.error(request, f"❌ Error al cargar el presupuesto: {str(e)}")
         return redirect("projects:project_detail", project_id=project.id)
 
@@ -1933,23 +1855,30 @@ def detailed_budget_view(request, project_id):
     if request.user.role == User.CONSTRUCTOR and project.creado_por != request.user:
         raise PermissionDenied("No tienes permisos para ver este proyecto")
     
-    # Obtener secciones con ítems configurados Y secciones porcentuales (como Administración)
-    # Usar Q objects para combinar ambas condiciones en una sola consulta
-    from django.db.models import Q
-    sections = BudgetSection.objects.filter(
-        Q(items__projectbudgetitem__project=project) | 
-        Q(is_percentage=True, project__isnull=True)
-    ).distinct().order_by('order')
-    
-    # Obtener todos los ProjectBudgetItem del proyecto de una vez
-    project_items_dict = {
-        item.budget_item_id: item 
-        for item in ProjectBudgetItem.objects.filter(project=project).select_related('budget_item')
+    # Totales precalculados: secciones con ítems configurados y resumen del proyecto
+    snapshot = get_budget_snapshot(project)
+    section_totals = get_section_totals(project)
+    
+    # Secciones con ítems configurados Y secciones porcentuales (como Administración)
+    template = get_budget_template()
+    sections = {
+        row.section_id: template.by_id.get(row.section_id, row.section)
+        for row in section_totals.values()
     }
+    for section in template.sections:
+        if section.is_percentage:
+            sections.setdefault(section.id, section)
+    sections = sorted(sections.values(), key=lambda section: section.order)
+    
+    # Ítems activos del proyecto agrupados por sección, en una sola consulta
+    items_by_section = {}
+    for project_item in ProjectBudgetItem.objects.filter(
+        project=project, budget_item__is_active=True
+    ).select_related('budget_item').order_by('budget_item__order'):
+        section_id = project_item.budget_item.section_id
+        items_by_section.setdefault(section_id, []).append(project_item)
     
     section_data = []
-    total_budget = 0
-    costo_directo_total = 0
     
     for section in sections:
         items = []
@@ -1965,38 +1894,35 @@ def detailed_budget_view(request, project_id):
                 'total': 0  # Se calcula automáticamente en el resumen
             })
         else:
-            # Solo obtener ítems que están configurados en el proyecto
-            section_items = BudgetItem.objects.filter(
-                section=section, 
-                is_active=True,
-                projectbudgetitem__project=project
-            ).order_by('order')
-            
-            for item in section_items:
-                project_item = project_items_dict.get(item.id)
-                item_total = project_item.total_price if project_item else 0
-                
+            # Solo los ítems que están configurados en el proyecto
+            for project_item in items_by_section.get(section.id, []):
                 items.append({
-                    'item': item,
+                    'item': project_item.budget_item,
                     'project_item': project_item,
-                    'total': item_total
+                    'total': project_item.total_price
                 })
-                section_total += item_total
+            
+            # Total de la sección: solo los ítems activos que se muestran
+            section_total = sum(item['total'] for item in items)
             
             section_data.append({
                 'section': section,
                 'items': items,
                 'total': section_total
             })
-            costo_directo_total += section_total
     
-    # Calcular administración automática usando el porcentaje del proyecto
+    # Costo directo y administración sobre los mismos ítems activos listados
     from decimal import Decimal
-    admin_percentage = project.administration_percentage / Decimal('100')
-    administracion_automatica = costo_directo_total * admin_percentage
+    costo_directo_total = sum(
+        (data['total'] for data in section_data if not data['section'].is_percentage),
+        Decimal('0'),
+    )
+    administracion_automatica = (
+        costo_directo_total * project.administration_percentage / Decimal('100')
+    )
     
     # ✅ USAR EL CÁLCULO CORRECTO QUE INCLUYE ADMINISTRACIÓN
-    total_budget = project.calculate_final_budget()
+    total_budget = project.final_budget_from_totals(snapshot.totals())
     
     # Agrupar secciones en macro-secciones lógicas
     macro_sections = {
@@ -2197,8 +2123,9 @@ def update_administration_percentage(request, project_id):
         project.administration_percentage = Decimal(str(percentage))
         project.save()
         
-        # Recalcular el presupuesto total
-        total_budget = project.calculate_final_budget()
+        # Recalcular los totales del proyecto (las secciones no cambian)
+        snapshot = refresh_budget_snapshot(project.pk, section_ids=[])
+        total_budget = project.final_budget_from_totals(snapshot.totals())
         
         return JsonResponse({
             'success': True,
@@ -2213,20 +2140,104 @@ def update_administration_percentage(request, project_id):
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+@project_owner_or_jefe_required
+def project_scenarios(request, project_id):
+    """
+    Simula variantes del cuestionario de un proyecto sin guardarlas.
+
+    Recibe por POST un JSON ``{"grid": {campo: [valores]}, "limit": 50}`` y
+    devuelve las combinaciones ordenadas de menor a mayor presupuesto
+    (ver ``projects.scenarios.evaluate_scenarios``).
+    """
+    from .scenarios import evaluate_scenarios
+    
+    if request.method != 'POST':
+        return JsonResponse(
+            {'success': False, 'error': 'Método no permitido'}, status=405
+        )
+    
+    project = get_object_or_404(Project, id=project_id)
+    
+    try:
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError('El cuerpo debe ser un objeto JSON')
+        grid = payload.get('grid') or {}
+        limit = int(payload.get('limit', 50))
+        if not isinstance(grid, dict):
+            raise ValueError('La grilla debe ser un objeto {campo: [valores]}')
+        escenarios = evaluate_scenarios(project, grid)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'total': len(escenarios),
+        'escenarios': escenarios[:max(limit, 0)],
+    })
+
+
+def _fecha_historial(valor):
+    """
+    Fecha de una consulta del historial: ``YYYY-MM-DD`` (hasta el final de
+    ese día) o fecha y hora ISO. Lanza ValueError si no es válida.
+    """
+    from django.utils.dateparse import parse_date, parse_datetime
+
+    fecha = parse_datetime(valor or '')
+    if fecha is None:
+        dia = parse_date(valor or '')
+        if dia is None:
+            raise ValueError(f"Fecha inválida: '{valor}'")
+        fecha = datetime.combine(dia, datetime.max.time())
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+@role_required(User.JEFE)
+@login_required
+def project_budget_diff(request, project_id):
+    """
+    Diferencia del presupuesto detallado entre dos fechas (solo JEFE).
+
+    ``?desde=YYYY-MM-DD&hasta=YYYY-MM-DD``; sin ``hasta`` compara contra el
+    presupuesto actual. Ver ``projects.budget_history.diff_presupuesto``.
+    """
+    from .budget_history import diff_presupuesto
+    
+    project = get_object_or_404(Project, id=project_id)
+    
+    try:
+        desde = _fecha_historial(request.GET.get('desde'))
+        hasta = timezone.now()
+        if request.GET.get('hasta'):
+            hasta = _fecha_historial(request.GET['hasta'])
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    diff = diff_presupuesto(project, desde, hasta)
+    return JsonResponse({
+        'success': True,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        **diff,
+    })
+
+
 @role_required(User.JEFE)
 @login_required
 def budget_management(request):
     """
     Vista para gestionar precios unitarios (solo JEFE)
     """
-    sections = BudgetSection.objects.filter(project__isnull=True).order_by('order')
+    # Secciones plantilla con todos sus ítems (activos e inactivos), desde la caché
     section_data = []
     
-    for section in sections:
-        items = BudgetItem.objects.filter(section=section).order_by('order')
+    for section in get_budget_template().sections:
         section_data.append({
             'section': section,
-            'items': items
+            'items': section.items
         })
     
     context = {
@@ -2418,7 +2429,17 @@ def budget_item_delete(request, item_id):
     
     if request.method == "POST":
         item_name = item.description[:50]
+        # El borrado en cascada de ProjectBudgetItem no pasa por su delete()
+        project_items = list(
+            ProjectBudgetItem.objects.filter(budget_item=item).only(
+                'project_id', 'budget_item_id', 'quantity', 'unit_price', 'total_price'
+            )
+        )
+        project_ids = [project_item.project_id for project_item in project_items]
         item.delete()
+        registrar_cambios(project_items, eliminado=True)
+        for project_id in project_ids:
+            refresh_budget_snapshot(project_id, [item.section_id])
         messages.success(request, f'✅ Ítem "{item_name}" eliminado exitosamente!')
         return redirect("projects:budget_items_list")
     
@@ -2452,28 +2473,9 @@ def calculate_detailed_budget_total(project):
     FUNCIÓN ESPECÍFICA PARA FORMULARIO DETALLADO
     Suma ítems del presupuesto + administración automática (usando porcentaje del proyecto)
     """
-    from decimal import Decimal
-    
-    costo_directo = Decimal('0')
-    administracion_manual = Decimal('0')
-    
-    # Separar costo directo de administración manual
-    project_items = ProjectBudgetItem.objects.filter(project=project)
-    for item in project_items:
-        # Si es de la sección 21 (Administración), contarlo por separado
-        if item.budget_item.section.order == 21:
-            administracion_manual += item.total_price
-        else:
-            costo_directo += item.total_price
-    
-    # Calcular administración automática usando el porcentaje del proyecto (default 12%)
-    admin_percentage = project.administration_percentage / Decimal('100')
-    administracion_automatica = costo_directo * admin_percentage
-    
-    # Total = Costo Directo + Administración Automática + Administración Manual
-    total = costo_directo + administracion_automatica + administracion_manual
-    
-    return total
+    # Total = Costo Directo + Administración Automática + Administración Manual,
+    # ya precalculado en el resumen del presupuesto
+    return get_budget_snapshot(project).total
 
 
 @role_required(User.JEFE, User.CONSTRUCTOR)
@@ -2547,6 +2549,7 @@ def project_graficos(request, project_id):
 
 
 @login_required
+@etag_por_version(_versiones_proyecto)
 def api_datos_graficos(request, project_id):
     """API que devuelve datos JSON para los gráficos"""
     try:
@@ -2715,33 +2718,33 @@ def export_budget_to_excel(request, project_id):
     # Eliminar la hoja por defecto
     workbook.remove(workbook.active)
     
-    # Obtener todas las secciones del presupuesto (no solo las que tienen items configurados)
-    all_sections = BudgetSection.objects.all().order_by('order')
-    print(f"🔍 DEBUG Excel Export - Total secciones en sistema: {all_sections.count()}")
-    
-    # Filtrar solo las secciones que tienen ítems configurados en este proyecto
+    # Resumen precalculado: solo las secciones con ítems de cantidad mayor a 0
+    snapshot = get_budget_snapshot(project)
+    section_totals = get_section_totals(project)
     sections_with_data = []
-    for section in all_sections:
-        items_in_section = ProjectBudgetItem.objects.filter(
-            project=project,
-            budget_item__section=section,
-            quantity__gt=0  # Solo ítems con cantidad mayor a 0
-        ).count()
-        if items_in_section > 0:
-            sections_with_data.append(section)
-            print(f"  ✅ Sección {section.order}: {section.name} - {items_in_section} ítems")
-        else:
-            print(f"  ❌ Sección {section.order}: {section.name} - Sin ítems configurados")
+    for section_row in section_totals.values():
+        if section_row.items_con_cantidad > 0:
+            sections_with_data.append(section_row.section)
+            print(
+                f"  ✅ Sección {section_row.section.order}: {section_row.section.name}"
+                f" - {section_row.items_con_cantidad} ítems"
+            )
     
     print(f"🔍 DEBUG Excel Export - Secciones con datos: {len(sections_with_data)}")
     
-    # Obtener todos los ProjectBudgetItem del proyecto
-    project_items = ProjectBudgetItem.objects.filter(project=project).select_related('budget_item', 'budget_item__section')
-    project_items_dict = {item.budget_item_id: item for item in project_items}
-    
-    print(f"🔍 DEBUG Excel Export - ProjectBudgetItems encontrados: {project_items.count()}")
+    # Obtener los ProjectBudgetItem activos con cantidad, agrupados por sección
+    project_items = list(
+        ProjectBudgetItem.objects.filter(
+            project=project, quantity__gt=0, budget_item__is_active=True
+        ).select_related('budget_item').order_by('budget_item__order')
+    )
+    items_by_section = {}
     for item in project_items:
-        print(f"  - {item.budget_item.code or 'Sin código'}: {item.budget_item.description[:50]} - Cantidad: {item.quantity} - Precio: {item.unit_price}")
+        items_by_section.setdefault(item.budget_item.section_id, []).append(item)
+    
+    print(
+        f"🔍 DEBUG Excel Export - ProjectBudgetItems encontrados: {len(project_items)}"
+    )
     
     # Variables para el resumen
     total_sections = {}
@@ -2749,7 +2752,10 @@ def export_budget_to_excel(request, project_id):
     
     # Verificar si hay secciones con datos
     if not sections_with_data:
-        print(f"❌ DEBUG Excel Export - No hay secciones con datos, pero el proyecto tiene {project_items.count()} items")
+        print(
+            "❌ DEBUG Excel Export - No hay secciones con datos, pero el proyecto "
+            f"tiene {snapshot.items_count} items"
+        )
         messages.warning(request, "⚠️ Este proyecto tiene presupuesto configurado pero sin cantidades. Por favor configure las cantidades primero.")
         return redirect("projects:detailed_budget_edit", project_id=project.id)
     
@@ -2792,70 +2798,63 @@ def export_budget_to_excel(request, project_id):
             cell.alignment = center_alignment
             cell.border = border
         
-        # Obtener ítems de la sección configurados en el proyecto
-        section_items = BudgetItem.objects.filter(
-            section=section, 
-            is_active=True,
-            projectbudgetitem__project=project
-        ).order_by('order')
+        # Ítems de la sección configurados en el proyecto (ya pre-cargados)
+        section_project_items = items_by_section.get(section.id, [])
         
-        print(f"🔍 DEBUG Excel Export - Ítems en sección {section.name}: {section_items.count()}")
+        print(
+            f"🔍 DEBUG Excel Export - Ítems en sección {section.name}: "
+            f"{len(section_project_items)}"
+        )
         
-        section_total = 0
+        # Total de la sección: solo los ítems activos que se listan en la hoja
+        section_total = sum(float(item.total_price) for item in section_project_items)
         row += 1
         items_added = 0
         
-        for item in section_items:
-            project_item = project_items_dict.get(item.id)
-            print(f"  🔍 DEBUG - Item {item.code or 'Sin código'}: {item.description[:30]}")
-            print(f"    - ProjectItem encontrado: {project_item is not None}")
-            if project_item:
-                print(f"    - Cantidad: {project_item.quantity}, Precio: {project_item.unit_price}")
+        for project_item in section_project_items:
+            item = project_item.budget_item
+            items_added += 1
             
-            if project_item and project_item.quantity > 0:
-                print(f"    ✅ Agregando ítem al Excel")
-                items_added += 1
-                
-                # Código
-                worksheet.cell(row=row, column=1).value = item.code or f"{section.order}.{item.order}"
-                worksheet.cell(row=row, column=1).font = normal_font
-                worksheet.cell(row=row, column=1).border = border
-                
-                # Descripción
-                worksheet.cell(row=row, column=2).value = item.description
-                worksheet.cell(row=row, column=2).font = normal_font
-                worksheet.cell(row=row, column=2).border = border
-                
-                # Unidad
-                worksheet.cell(row=row, column=3).value = item.unit
-                worksheet.cell(row=row, column=3).font = normal_font
-                worksheet.cell(row=row, column=3).alignment = center_alignment
-                worksheet.cell(row=row, column=3).border = border
-                
-                # Cantidad
-                worksheet.cell(row=row, column=4).value = float(project_item.quantity)
-                worksheet.cell(row=row, column=4).font = normal_font
-                worksheet.cell(row=row, column=4).alignment = right_alignment
-                worksheet.cell(row=row, column=4).border = border
-                worksheet.cell(row=row, column=4).number_format = '#,##0.000'
-                
-                # Precio Unitario
-                worksheet.cell(row=row, column=5).value = float(project_item.unit_price)
-                worksheet.cell(row=row, column=5).font = currency_font
-                worksheet.cell(row=row, column=5).alignment = right_alignment
-                worksheet.cell(row=row, column=5).border = border
-                worksheet.cell(row=row, column=5).number_format = '"$"#,##0'
-                
-                # Total
-                item_total = float(project_item.total_price)
-                worksheet.cell(row=row, column=6).value = item_total
-                worksheet.cell(row=row, column=6).font = currency_font
-                worksheet.cell(row=row, column=6).alignment = right_alignment
-                worksheet.cell(row=row, column=6).border = border
-                worksheet.cell(row=row, column=6).number_format = '"$"#,##0'
-                
-                section_total += item_total
-                row += 1
+            # Código
+            codigo = item.code or f"{section.order}.{item.order}"
+            worksheet.cell(row=row, column=1).value = codigo
+            worksheet.cell(row=row, column=1).font = normal_font
+            worksheet.cell(row=row, column=1).border = border
+            
+            # Descripción
+            worksheet.cell(row=row, column=2).value = item.description
+            worksheet.cell(row=row, column=2).font = normal_font
+            worksheet.cell(row=row, column=2).border = border
+            
+            # Unidad
+            worksheet.cell(row=row, column=3).value = item.unit
+            worksheet.cell(row=row, column=3).font = normal_font
+            worksheet.cell(row=row, column=3).alignment = center_alignment
+            worksheet.cell(row=row, column=3).border = border
+            
+            # Cantidad
+            worksheet.cell(row=row, column=4).value = float(project_item.quantity)
+            worksheet.cell(row=row, column=4).font = normal_font
+            worksheet.cell(row=row, column=4).alignment = right_alignment
+            worksheet.cell(row=row, column=4).border = border
+            worksheet.cell(row=row, column=4).number_format = '#,##0.000'
+            
+            # Precio Unitario
+            worksheet.cell(row=row, column=5).value = float(project_item.unit_price)
+            worksheet.cell(row=row, column=5).font = currency_font
+            worksheet.cell(row=row, column=5).alignment = right_alignment
+            worksheet.cell(row=row, column=5).border = border
+            worksheet.cell(row=row, column=5).number_format = '"$"#,##0'
+            
+            # Total
+            item_total = float(project_item.total_price)
+            worksheet.cell(row=row, column=6).value = item_total
+            worksheet.cell(row=row, column=6).font = currency_font
+            worksheet.cell(row=row, column=6).alignment = right_alignment
+            worksheet.cell(row=row, column=6).border = border
+            worksheet.cell(row=row, column=6).number_format = '"$"#,##0'
+            
+            row += 1
         
         # Total de la sección
         row += 1
@@ -2976,7 +2975,7 @@ def export_budget_to_excel(request, project_id):
     summary_sheet.cell(row=row, column=4).border = border
     
     # Administración automática (usando porcentaje del proyecto)
-    admin_percentage = float(project.administration_percentage)
+    admin_percentage = float(snapshot.administration_percentage)
     admin_auto = grand_total * (admin_percentage / 100)
     row += 1
     summary_sheet.merge_cells(f'A{row}:B{row}')
@@ -3325,36 +3324,18 @@ def export_comparativo_to_excel(request, project_id):
     print(f"🔍 DEBUG Export Comparativo - Iniciando para proyecto: {project.name}")
     
     # ===== OBTENER DATOS DEL PRESUPUESTO =====
-    presupuesto_items = ProjectBudgetItem.objects.filter(
-        project=project
-    ).select_related('budget_item', 'budget_item__section').order_by(
-        'budget_item__section__order', 'budget_item__order'
-    )
-    
-    # Agrupar presupuesto por sección
-    presupuesto_por_seccion = defaultdict(lambda: {
-        'items': [],
-        'total_presupuestado': Decimal('0'),
-        'seccion_nombre': '',
-        'seccion_order': 0
-    })
-    
+    # Totales por sección desde el resumen precalculado (una fila por sección)
+    presupuesto_por_seccion = {}
     total_presupuesto_proyecto = Decimal('0')
     
-    for item in presupuesto_items:
-        seccion_key = item.budget_item.section.name
-        seccion_data = presupuesto_por_seccion[seccion_key]
-        
-        seccion_data['seccion_nombre'] = item.budget_item.section.name
-        seccion_data['seccion_order'] = item.budget_item.section.order
-        seccion_data['items'].append({
-            'descripcion': item.budget_item.description,
-            'cantidad': item.quantity,
-            'precio_unitario': item.unit_price,
-            'total': item.total_price
-        })
-        seccion_data['total_presupuestado'] += item.total_price
-        total_presupuesto_proyecto += item.total_price
+    for section_row in get_section_totals(project).values():
+        presupuesto_por_seccion[section_row.section.name] = {
+            'items_count': section_row.items_count,
+            'total_presupuestado': section_row.total,
+            'seccion_nombre': section_row.section.name,
+            'seccion_order': section_row.section.order
+        }
+        total_presupuesto_proyecto += section_row.total
     
     print(f"🔍 DEBUG - Total presupuesto proyecto: ${total_presupuesto_proyecto:,.2f}")
     print(f"🔍 DEBUG - Secciones de presupuesto encontradas: {len(presupuesto_por_seccion)}")
@@ -3517,7 +3498,7 @@ def export_comparativo_to_excel(request, project_id):
             'desviacion_abs': desviacion_abs,
             'desviacion_pct': desviacion_pct,
             'estado': estado,
-            'items_presupuesto': len(seccion_data['items']),
+            'items_presupuesto': seccion_data['items_count'],
             'items_gastados': len(componentes_relacionados),
             'tipo': 'seccion'
         })